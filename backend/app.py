@@ -1,8 +1,5 @@
 from flask import Flask
-from flask_cors import CORS
-from flask_session import Session
 from database.db import db
-from backend.routes import main
 import os
 import sys
 
@@ -13,42 +10,69 @@ BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if BASE_DIR not in sys.path:
     sys.path.insert(0, BASE_DIR)
 
+# Schema changes on an existing database are an explicit release step
+# (python -m database.migrate). At boot, by default, an empty database is
+# created and migrated and an out-of-date one fails fast (ensure_schema);
+# AUTO_MIGRATE=1 always migrates, AUTO_MIGRATE=0 skips the check.
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "check")
 
-def create_app():
-    app = Flask(__name__)
-
-    # -------------------------------------------------
-    # BASIC CONFIG
-    # -------------------------------------------------
-    app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev-secret")
 
-    database_url = os.getenv("DATABASE_URL", "sqlite:///cinema.db")
+def database_url():
+    url = os.getenv("DATABASE_URL", "sqlite:///cinema.db")
 
     # Render provides deprecated postgres://
-    if database_url.startswith("postgres://"):
-        database_url = database_url.replace(
+    if url.startswith("postgres://"):
+        url = url.replace(
             "postgres://",
             "postgresql+psycopg://",
             1
         )
 
     # Explicit driver (THIS FIXES YOUR ERROR)
-    if database_url.startswith("postgresql://"):
-        database_url = database_url.replace(
+    if url.startswith("postgresql://"):
+        url = url.replace(
             "postgresql://",
             "postgresql+psycopg://",
             1
         )
 
-    app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+    return url
+
+
+def create_db_app():
+    """
+    Minimal app for scripts and jobs: config + database only.
+    No routes, sessions or CORS, so the web/recommendation stack is never imported.
+    """
+    app = Flask(__name__)
+
+    # -------------------------------------------------
+    # BASIC CONFIG
+    # -------------------------------------------------
+    app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev-secret")
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url()
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+    # -------------------------------------------------
+    # DATABASE INIT
+    # -------------------------------------------------
+    db.init_app(app)
+
+    return app
+
+
+def create_app(auto_migrate=None):
+    from flask_cors import CORS
+    from backend.routes import main
+    from backend.sessions import init_sessions
+
+    app = create_db_app()
+
     # -------------------------------------------------
     # SESSION CONFIG (REQUIRED FOR AUTH)
+    # Backend chosen by SESSION_BACKEND: filesystem (default) | sql | cookie
     # -------------------------------------------------
     app.config.update(
-        SESSION_TYPE="filesystem",
-        SESSION_FILE_DIR="/tmp/flask_session",
         SESSION_PERMANENT=False,
         SESSION_USE_SIGNER=True,
         SESSION_COOKIE_HTTPONLY=True,
@@ -58,15 +82,17 @@ def create_app():
         SESSION_COOKIE_SECURE=True,
     )
 
-    Session(app)
+    init_sessions(app)
 
-    # -------------------------------------------------
-    # DATABASE INIT
-    # -------------------------------------------------
-    db.init_app(app)
+    mode = AUTO_MIGRATE if auto_migrate is None else "1" if auto_migrate else "0"
+    if mode != "0":
+        from database.migrate import ensure_schema, migrate
 
-    with app.app_context():
-        db.create_all()
+        with app.app_context():
+            if mode == "1":
+                migrate()
+            else:
+                ensure_schema()
 
     # -------------------------------------------------
     # CORS CONFIG
@@ -93,6 +119,16 @@ def create_app():
 
 
 # -------------------------------------------------
-# Gunicorn entry point
+# Gunicorn entry point (backend.app:app)
+# Built on first access so importing this module stays cheap
 # -------------------------------------------------
-app = create_app()
+_app = None
+
+
+def __getattr__(name):
+    global _app
+    if name != "app":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if _app is None:
+        _app = create_app()
+    return _app
@@ -1,15 +1,14 @@
-from flask import Blueprint, jsonify, session
-from database.models import User
+from flask import Blueprint, jsonify
+from backend.current_user import get_current_user
 
 auth = Blueprint("auth", __name__)
 
 @auth.route("/me")
 def get_me():
-    user_id = session.get("user_id")
-    if not user_id:
+    user = get_current_user()
+    if not user:
         return jsonify(None), 200
 
-    user = User.query.get(user_id)
     return jsonify({
         "id": user.id,
         "username": user.username,
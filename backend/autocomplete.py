@@ -0,0 +1,242 @@
+"""
+Typeahead Prefix Index
+----------------------
+In-process autocomplete over movie titles and director/cast names.
+
+Every title and name is indexed under each of its word starts
+("the matrix" and "matrix"), normalised to lowercase ASCII words, in one
+sorted list of (key, entry) pairs searched with bisect. Results are ranked
+by Movie.popularity (a person takes the popularity of their most popular
+film). A prefix matching more than SCAN_LIMIT keys is answered from a
+precomputed top-HEAD_SIZE "head" list; any other prefix ranks its bisect
+range on the fly, so no answer looks at more than SCAN_LIMIT keys.
+
+Built from the movies table on first use; routes call add_movies() after
+inserting, and rows added by other processes are caught up every
+CATCH_UP_SECONDS, so it is kept current without a rebuild. Answers never touch the
+database or the network.
+"""
+
+import bisect
+import heapq
+import re
+import threading
+import time
+import unicodedata
+
+from database.db import db
+from database.models import Movie
+
+HEAD_SIZE = 20
+SCAN_LIMIT = 256
+DEFAULT_LIMIT = 8
+
+# Sorts after every other character, closing a prefix range
+_HIGH = "\U0010ffff"
+
+
+def normalise(s):
+    s = s or ""
+    if not s.isascii():
+        s = unicodedata.normalize("NFKD", s).encode("ascii", "ignore").decode()
+    return " ".join(re.findall(r"[a-z0-9]+", s.lower()))
+
+
+def word_starts(s):
+    words = normalise(s).split()
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+
+def split_names(cast):
+    return [name.strip() for name in (cast or "").split(",") if name.strip()]
+
+
+class PrefixIndex:
+    def __init__(self):
+        self.items = []           # sorted (key, entry id)
+        self.entries = []         # entry id -> result dict
+        self.popularity = []      # entry id -> rank score
+        self.heads = {}           # short prefix -> entry ids, best first
+        self.movie_ids = set()
+        self.max_movie_id = 0
+        self.people = {}          # name -> entry id
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    # -------------------------------------------------
+    # Building
+    # -------------------------------------------------
+    def _new_entry(self, entry, popularity):
+        self.entries.append(entry)
+        self.popularity.append(popularity)
+        return len(self.entries) - 1
+
+    def _stage_movie(self, movie_id, tmdb_id, title, poster_path, popularity, director, cast):
+        """Register a movie's entries; returns [(key, entry id)] to index."""
+        if movie_id in self.movie_ids:
+            return [], []
+        self.movie_ids.add(movie_id)
+        self.max_movie_id = max(self.max_movie_id, movie_id)
+        popularity = popularity or 0.0
+
+        entry = self._new_entry(
+            {"type": "movie", "tmdb_id": tmdb_id, "title": title, "poster_path": poster_path},
+            popularity
+        )
+        keys = [(key, entry) for key in word_starts(title)]
+        touched = [entry]
+
+        for name in ([director] if director else []) + split_names(cast):
+            person = self.people.get(name)
+            if person is None:
+                person = self._new_entry({"type": "person", "name": name}, popularity)
+                self.people[name] = person
+                keys.extend((key, person) for key in word_starts(name))
+            elif popularity > self.popularity[person]:
+                self.popularity[person] = popularity
+            else:
+                continue
+            touched.append(person)
+
+        return keys, touched
+
+    def build(self, rows):
+        """Bulk load (id, tmdb_id, title, poster_path, popularity, director, cast) rows."""
+        with self._lock:
+            for row in rows:
+                keys, _ = self._stage_movie(*row)
+                self.items.extend(keys)
+            self.items.sort()
+            self.heads = self._build_heads()
+
+    def _top(self, entries):
+        """Best HEAD_SIZE distinct entries, best first."""
+        return heapq.nlargest(HEAD_SIZE, set(entries), key=self.popularity.__getitem__)
+
+    def _build_heads(self):
+        """Head lists for every prefix matching more than SCAN_LIMIT keys."""
+        keys = [key for key, _ in self.items]
+        entries = [entry for _, entry in self.items]
+
+        heads = {}
+        # Ranges of keys sharing a prefix of length n - 1; sorted keys
+        # keep each longer prefix contiguous inside its parent's range
+        ranges, n = [(0, len(keys))], 1
+        while ranges:
+            wide = []
+            for start, stop in ranges:
+                lo = start
+                while lo < stop:
+                    prefix = keys[lo][:n]
+                    if len(prefix) < n:
+                        # Keys no longer than the parent prefix sort first
+                        lo = bisect.bisect_right(keys, prefix, lo, stop)
+                        continue
+                    hi = bisect.bisect_left(keys, prefix + _HIGH, lo, stop)
+                    if hi - lo > SCAN_LIMIT:
+                        heads[prefix] = self._top(entries[lo:hi])
+                        wide.append((lo, hi))
+                    lo = hi
+            ranges, n = wide, n + 1
+        return heads
+
+    def _offer(self, entry, keys):
+        """Re-rank `entry` into the head lists of its key prefixes."""
+        score = self.popularity
+        prefixes = {key[:n] for key in keys for n in range(1, len(key) + 1)}
+        for prefix in prefixes:
+            head = self.heads.get(prefix)
+            if head is None:
+                continue
+            head = [e for e in head if e != entry]
+            if len(head) < HEAD_SIZE or score[entry] > score[head[-1]]:
+                head.append(entry)
+                head.sort(key=lambda e: -score[e])
+                # Readers only ever see a complete list
+                self.heads[prefix] = head[:HEAD_SIZE]
+
+    def add_movie(self, movie_id, tmdb_id, title, poster_path, popularity, director, cast):
+        with self._lock:
+            keys, touched = self._stage_movie(
+                movie_id, tmdb_id, title, poster_path, popularity, director, cast
+            )
+            for item in keys:
+                bisect.insort(self.items, item)
+            for entry in touched:
+                entry_keys = [k for k, e in keys if e == entry]
+                if not entry_keys:
+                    # Existing person whose popularity went up
+                    entry_keys = word_starts(self.entries[entry]["name"])
+                self._offer(entry, entry_keys)
+
+    # -------------------------------------------------
+    # Queries
+    # -------------------------------------------------
+    def complete(self, prefix, limit=DEFAULT_LIMIT):
+        prefix = normalise(prefix)
+        if not prefix:
+            return []
+        limit = max(1, min(limit, HEAD_SIZE))
+
+        head = self.heads.get(prefix)
+        if head is None:
+            items = self.items
+            lo = bisect.bisect_left(items, (prefix,))
+            hi = bisect.bisect_left(items, (prefix + _HIGH,), lo)
+            if hi - lo > SCAN_LIMIT:
+                # Grew past the limit through inserts: keep a head from now on
+                with self._lock:
+                    head = self.heads[prefix] = self._top(e for _, e in items[lo:hi])
+            else:
+                head = heapq.nlargest(
+                    limit, {e for _, e in items[lo:hi]}, key=self.popularity.__getitem__
+                )
+
+        return [self.entries[e] for e in head[:limit]]
+
+
+# -------------------------------------------------
+# Process-wide instance
+# -------------------------------------------------
+COLUMNS = (
+    Movie.id, Movie.tmdb_id, Movie.title, Movie.poster_path, Movie.popularity,
+    Movie.director, Movie.cast,
+)
+# Rows inserted by other workers or the seeder are picked up this often
+CATCH_UP_SECONDS = 60.0
+
+_lock = threading.Lock()
+_index = None
+_next_catch_up = 0.0
+
+
+def get_autocomplete_index():
+    global _index, _next_catch_up
+
+    now = time.monotonic()
+    if _index is not None and now < _next_catch_up:
+        return _index
+
+    with _lock:
+        if _index is None:
+            index = PrefixIndex()
+            index.build(db.session.query(*COLUMNS).yield_per(2000))
+            _index = index
+        elif now >= _next_catch_up:
+            for row in (db.session.query(*COLUMNS)
+                        .filter(Movie.id > _index.max_movie_id).yield_per(2000)):
+                _index.add_movie(*row)
+        _next_catch_up = now + CATCH_UP_SECONDS
+        return _index
+
+
+def add_movies(movies):
+    """Register freshly inserted Movie rows (no-op until the index is built)."""
+    if _index is None:
+        return
+    for m in movies:
+        _index.add_movie(
+            m.id, m.tmdb_id, m.title, m.poster_path, m.popularity, m.director, m.cast
+        )
@@ -1,8 +1,29 @@
-from flask import session
+from flask import current_app, g, session
+from database.db import db
 from database.models import User
 
+_UNSET = object()
+
+
 def get_current_user():
-    user_id = session.get("user_id")
-    if not user_id:
-        return None
-    return User.query.get(user_id)
+    # Memoized on flask.g: at most one users lookup per request
+    user = g.get("_current_user", _UNSET)
+    if user is _UNSET:
+        user_id = session.get("user_id")
+        user = db.session.get(User, user_id) if user_id else None
+        g._current_user = user
+    return user
+
+
+def set_current_user(user):
+    """Log `user` in (or out with None) and refresh the per-request cache."""
+    if user is None:
+        session.clear()
+    elif session.get("user_id") != user.id:
+        session["user_id"] = user.id
+        # New session id for the new identity (no session fixation); the
+        # cookie backend has no server-side id to replace
+        regenerate = getattr(current_app.session_interface, "regenerate", None)
+        if regenerate:
+            regenerate(session)
+    g._current_user = user
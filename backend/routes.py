@@ -4,40 +4,109 @@
 # (No route mismatches, frontend-compatible, production-safe)
 # ======================================================
 
-from flask import Blueprint, request, jsonify, session
-from database.db import db
-from database.models import User, Movie, Review, Watchlist, Watched
-import requests
+import hmac
 import os
+import sys
 
-from recommendation.hybrid import hybrid_recommendation
-from recommendation.content_based import recommend_similar_movies
-from recommendation.collaborative import recommend_collaborative
-from recommendation.crew_based import recommend_by_crew
-from .tmdb_service import get_movie_full
+from flask import Blueprint, abort, request, jsonify
+from database.db import db
+from database.bulk import upsert_movies
+from database.models import RATING_SCALE, User, Movie, Review, Watchlist, Watched
+from database.rating_stats import apply_review, stats_for
+from recommendation import feeds
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from . import autocomplete
+from .search_service import search as search_movies
+from .tmdb_cache import get_cache
+from .tmdb_service import get_movie_full, tmdb_get
+from .current_user import get_current_user as current_user, set_current_user
 
 main = Blueprint("main", __name__)
 
-TMDB_API_KEY = os.getenv("TMDB_API_KEY")
-TMDB_BASE = "https://api.themoviedb.org/3"
+BATCH_SEED_STRATEGIES = ("content", "crew", "franchise", "hybrid")
+BATCH_USER_STRATEGIES = ("collaborative", "hybrid")
+BATCH_MAX_SEEDS = 20
+# Operational endpoints (/stats/*) answer only requests carrying this
+# token in X-Stats-Token; unset, they are disabled
+STATS_TOKEN = os.getenv("STATS_TOKEN")
 
 
 # ======================================================
 # HELPERS
 # ======================================================
 
-def current_user():
-    uid = session.get("user_id")
-    if not uid:
+def movie_card(m):
+    return {
+        "id": m.tmdb_id,
+        "title": m.title,
+        "poster_path": m.poster_path
+    }
+
+
+def tmdb_list_rows(results):
+    """Movie rows for the summary objects TMDB returns in list endpoints."""
+    return [
+        {
+            "tmdb_id": m["id"],
+            "title": m.get("title", ""),
+            "poster_path": m.get("poster_path", ""),
+            "popularity": m.get("popularity", 0)
+        }
+        for m in results
+    ]
+
+
+# The recommendation stack (numpy/scipy/scikit-learn) is imported by the
+# routes that use it, on first call. Until a module is loaded it holds no
+# in-memory state, so write paths only notify modules that already are.
+def loaded(module):
+    return sys.modules.get(f"recommendation.{module}")
+
+
+def index_new_movies(movies):
+    """Feed freshly inserted movies to the in-memory search and recommendation indexes."""
+    if not movies:
+        return
+    autocomplete.add_movies(movies)
+    if loaded("crew_index"):
+        loaded("crew_index").add_movies(movies)
+
+
+def sync_user_activity(user_id, movie_id, rating=None, watched=None):
+    """Push a rating (None = removed) or watched change to the loaded models."""
+    if loaded("rating_matrix"):
+        if watched is None:
+            loaded("rating_matrix").record_rating(user_id, movie_id, rating)
+        else:
+            loaded("rating_matrix").record_watched(user_id, movie_id, watched)
+    if loaded("hybrid"):
+        loaded("hybrid").invalidate_user(user_id)
+    feeds.user_activity(user_id)
+
+
+def parse_rating(value):
+    """The rating as an int in RATING_SCALE (whole-number strings allowed), else None."""
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or value not in RATING_SCALE:
         return None
-    return User.query.get(uid)
+    return value
 
 
-def tmdb_get(path, params=None):
-    params = params or {}
-    params["api_key"] = TMDB_API_KEY
-    res = requests.get(f"{TMDB_BASE}{path}", params=params)
-    return res.json() if res.ok else {}
+def feed_response(ids, feed):
+    """Movie cards for a feed, best first, with where it came from and how old it is."""
+    movies = {m.id: m for m in Movie.query.filter(Movie.id.in_(ids)).all()}
+    res = jsonify([movie_card(movies[m]) for m in ids if m in movies])
+    if feed is None:
+        res.headers["X-Feed-Source"] = "live"
+    else:
+        res.headers["X-Feed-Source"] = "precomputed"
+        res.headers["X-Feed-Computed-At"] = feed.computed_at.isoformat() + "Z"
+        res.headers["Age"] = str(feed.age_seconds)
+        if feed.stale:
+            res.headers["X-Feed-Stale"] = "1"
+    return res
 
 
 # ======================================================
@@ -70,7 +139,7 @@ def register():
 
     db.session.add(user)
     db.session.commit()
-    session["user_id"] = user.id
+    set_current_user(user)
 
     return jsonify({"id": user.id, "username": user.username}), 201
 
@@ -83,7 +152,7 @@ def login():
     if not user or not user.check_password(data.get("password")):
         return jsonify({"error": "Invalid credentials"}), 401
 
-    session["user_id"] = user.id
+    set_current_user(user)
     return jsonify({
         "id": user.id,
         "username": user.username,
@@ -96,7 +165,7 @@ def login():
 
 @main.route("/logout", methods=["POST"])
 def logout():
-    session.clear()
+    set_current_user(None)
     return jsonify({"message": "Logged out"})
 
 
@@ -123,32 +192,18 @@ def me():
 @main.route("/home")
 def home():
     res = tmdb_get("/trending/movie/week")
+    results = res.get("results", [])[:20]
 
-    movies = []
-    for m in res.get("results", [])[:20]:
-        movie = Movie.query.filter_by(tmdb_id=m["id"]).first()
-        if not movie:
-            movie = Movie(
-                tmdb_id=m["id"],
-                title=m.get("title", ""),
-                poster_path=m.get("poster_path", ""),
-                popularity=m.get("popularity", 0)
-            )
-            db.session.add(movie)
-        movies.append(movie)
+    stored, created = upsert_movies(tmdb_list_rows(results))
+    movies = [movie_card(stored[m["id"]]) for m in results]
 
+    # Serialise before commit: committing expires every loaded row
     db.session.commit()
-
-    def serialize(m):
-        return {
-            "id": m.tmdb_id,
-            "title": m.title,
-            "poster_path": m.poster_path
-        }
+    index_new_movies(created)
 
     return jsonify({
-        "hero": [serialize(m) for m in movies[:5]],
-        "popular": [serialize(m) for m in movies]
+        "hero": movies[:5],
+        "popular": movies
     })
 
 
@@ -171,10 +226,12 @@ def movie_detail(tmdb_id):
             overview=tmdb_data.get("overview", ""),
             poster_path=tmdb_data.get("poster_path", ""),
             genres=",".join(g["name"] for g in tmdb_data.get("genres", [])),
-            popularity=tmdb_data.get("popularity", 0)
+            popularity=tmdb_data.get("popularity", 0),
+            collection_id=(tmdb_data.get("belongs_to_collection") or {}).get("id")
         )
         db.session.add(movie)
         db.session.commit()
+        index_new_movies([movie])
 
     full_data = get_movie_full(tmdb_id)
     full_data["movie"]["internal_id"] = movie.id
@@ -216,7 +273,11 @@ def toggle_watchlist():
         return jsonify({"status": "removed"})
 
     db.session.add(Watchlist(user_id=u.id, movie_id=movie_id))
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent toggle added it first (unique user/movie index)
+        db.session.rollback()
     return jsonify({"status": "added"})
 
 
@@ -226,18 +287,25 @@ def toggle_watched():
     if not u:
         return jsonify({"error": "Unauthorized"}), 401
 
+    # Read before commit() expires the user, which would reload it
+    user_id = u.id
     movie_id = request.json.get("movie_id")
 
-    Watchlist.query.filter_by(user_id=u.id, movie_id=movie_id).delete()
-    watched = Watched.query.filter_by(user_id=u.id, movie_id=movie_id).first()
+    Watchlist.query.filter_by(user_id=user_id, movie_id=movie_id).delete()
+    watched = Watched.query.filter_by(user_id=user_id, movie_id=movie_id).first()
 
     if watched:
         db.session.delete(watched)
         db.session.commit()
+        sync_user_activity(user_id, movie_id, watched=False)
         return jsonify({"status": "removed"})
 
-    db.session.add(Watched(user_id=u.id, movie_id=movie_id))
-    db.session.commit()
+    db.session.add(Watched(user_id=user_id, movie_id=movie_id))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+    sync_user_activity(user_id, movie_id, watched=True)
     return jsonify({"status": "added"})
 
 
@@ -251,36 +319,83 @@ def add_review():
     if not u:
         return jsonify({"error": "Unauthorized"}), 401
 
+    user_id = u.id
     data = request.json
+    rating = parse_rating(data.get("rating"))
+    if rating is None:
+        return jsonify({
+            "error": f"rating must be a whole number from {RATING_SCALE[0]} to {RATING_SCALE[-1]}"
+        }), 400
+
     review = Review(
-        user_id=u.id,
+        user_id=user_id,
         movie_id=data["movie_id"],
-        rating=data["rating"],
+        rating=rating,
         comment=data.get("comment", "")
     )
     db.session.add(review)
+    apply_review(review.movie_id, rating, sign=1)
     db.session.commit()
+    sync_user_activity(user_id, data["movie_id"], rating=rating)
     return jsonify({"message": "Review added"}), 201
 
 
+def review_query():
+    """Reviews joined with their authors, selected in a single query."""
+    return db.session.query(
+        Review.id, Review.user_id, User.username, User.avatar,
+        Review.rating, Review.comment
+    ).join(User, User.id == Review.user_id)
+
+
+def review_row(r):
+    return {
+        "id": r.id,
+        "user_id": r.user_id,
+        "username": r.username,
+        "avatar": r.avatar,
+        "rating": r.rating,
+        "comment": r.comment
+    }
+
+
 @main.route("/movie/<int:tmdb_id>/reviews")
 def get_reviews(tmdb_id):
     movie = Movie.query.filter_by(tmdb_id=tmdb_id).first()
     if not movie:
         return jsonify([])
 
-    reviews = Review.query.filter_by(movie_id=movie.id).all()
-    return jsonify([
-        {
-            "id": r.id,
-            "user_id": r.user_id,
-            "username": r.user.username,
-            "avatar": r.user.avatar,
-            "rating": r.rating,
-            "comment": r.comment
-        }
-        for r in reviews
-    ])
+    reviews = review_query().filter(Review.movie_id == movie.id).all()
+    return jsonify([review_row(r) for r in reviews])
+
+
+@main.route("/movie/<int:tmdb_id>/reviews/page")
+def get_reviews_page(tmdb_id):
+    """
+    Newest-first reviews, keyset-paginated.
+
+    ?limit=20&before=<review id from the previous page's next_cursor>
+    """
+    limit = max(1, min(request.args.get("limit", 20, type=int), 100))
+    before = request.args.get("before", type=int)
+
+    movie = Movie.query.filter_by(tmdb_id=tmdb_id).first()
+    if not movie:
+        return jsonify({"items": [], "next_cursor": None, "stats": None})
+
+    query = review_query().filter(Review.movie_id == movie.id)
+    if before:
+        query = query.filter(Review.id < before)
+
+    items = [review_row(r) for r in query.order_by(Review.id.desc()).limit(limit + 1)]
+    has_more = len(items) > limit
+    items = items[:limit]
+
+    return jsonify({
+        "items": items,
+        "next_cursor": items[-1]["id"] if has_more else None,
+        "stats": stats_for(movie.id)
+    })
 
 
 @main.route("/review/<int:review_id>", methods=["DELETE"])
@@ -291,8 +406,11 @@ def delete_review(review_id):
     if not u or r.user_id != u.id:
         return jsonify({"error": "Forbidden"}), 403
 
+    user_id, movie_id = u.id, r.movie_id
     db.session.delete(r)
+    apply_review(movie_id, r.rating, sign=-1)
     db.session.commit()
+    sync_user_activity(user_id, movie_id, rating=None)
     return jsonify({"message": "Deleted"})
 
 
@@ -341,7 +459,8 @@ def profile_watchlist():
             "title": w.movie.title,
             "poster_path": w.movie.poster_path
         }
-        for w in u.watchlist
+        for w in Watchlist.query.options(joinedload(Watchlist.movie))
+        .filter_by(user_id=u.id)
     ])
 
 
@@ -357,7 +476,8 @@ def profile_watched():
             "title": w.movie.title,
             "poster_path": w.movie.poster_path
         }
-        for w in u.watched
+        for w in Watched.query.options(joinedload(Watched.movie))
+        .filter_by(user_id=u.id)
     ])
 
 
@@ -373,7 +493,8 @@ def profile_reviews():
             "rating": r.rating,
             "comment": r.comment
         }
-        for r in u.reviews
+        for r in Review.query.options(joinedload(Review.movie))
+        .filter_by(user_id=u.id)
     ])
 
 
@@ -387,36 +508,19 @@ def search():
     if not q:
         return jsonify([])
 
-    movies_map = {}
-
-    movie_res = tmdb_get("/search/movie", {"query": q})
-    for m in movie_res.get("results", []):
-        movies_map[m["id"]] = {
-            "tmdb_id": m["id"],
-            "title": m.get("title", ""),
-            "poster_path": m.get("poster_path", "")
-        }
-
-    person_res = tmdb_get("/search/person", {"query": q})
-    for p in person_res.get("results", [])[:3]:
-        credits = tmdb_get(f"/person/{p['id']}/movie_credits")
+    results, partial = search_movies(q)
 
-        for m in credits.get("cast", []):
-            movies_map.setdefault(m["id"], {
-                "tmdb_id": m["id"],
-                "title": m.get("title", ""),
-                "poster_path": m.get("poster_path", "")
-            })
+    res = jsonify(results)
+    if partial:
+        res.headers["X-Search-Partial"] = "1"
+    return res
 
-        for m in credits.get("crew", []):
-            if m.get("job") == "Director":
-                movies_map.setdefault(m["id"], {
-                    "tmdb_id": m["id"],
-                    "title": m.get("title", ""),
-                    "poster_path": m.get("poster_path", "")
-                })
 
-    return jsonify(list(movies_map.values())[:15])
+@main.route("/autocomplete")
+def autocomplete_route():
+    q = request.args.get("q", "")
+    limit = request.args.get("limit", autocomplete.DEFAULT_LIMIT, type=int)
+    return jsonify(autocomplete.get_autocomplete_index().complete(q, limit))
 
 
 # ======================================================
@@ -429,21 +533,13 @@ def recommend_collaborative_route():
     if not u:
         return jsonify([])
 
-    ids = recommend_collaborative(u.id, top_n=10)
-    movies = Movie.query.filter(Movie.id.in_(ids)).all()
-
-    return jsonify([
-        {
-            "id": m.tmdb_id,
-            "title": m.title,
-            "poster_path": m.poster_path
-        }
-        for m in movies
-    ])
+    return feed_response(*feeds.get_or_compute(u.id, "collaborative"))
 
 
 @main.route("/recommend/content/<int:tmdb_id>")
 def recommend_content(tmdb_id):
+    from recommendation.content_based import recommend_similar_movies
+
     movie = Movie.query.filter_by(tmdb_id=tmdb_id).first()
     if not movie:
         return jsonify([])
@@ -474,6 +570,8 @@ def recommend_content(tmdb_id):
 
 @main.route("/recommend/crew/<int:tmdb_id>")
 def recommend_crew(tmdb_id):
+    from recommendation.crew_based import recommend_by_crew
+
     seed = Movie.query.filter_by(tmdb_id=tmdb_id).first()
     if not seed:
         return jsonify([])
@@ -493,13 +591,19 @@ def recommend_crew(tmdb_id):
 
 @main.route("/recommend/hybrid")
 def recommend_hybrid():
+    from recommendation.hybrid import hybrid_recommendation
+
     tmdb_id = request.args.get("movie_id", type=int)
     u = current_user()
 
     if not tmdb_id and not u:
         return jsonify([])
 
-    movie = Movie.query.filter_by(tmdb_id=tmdb_id).first() if tmdb_id else None
+    # Personal feed: precomputed, see recommendation/feeds.py
+    if not tmdb_id:
+        return feed_response(*feeds.get_or_compute(u.id, "hybrid"))
+
+    movie = Movie.query.filter_by(tmdb_id=tmdb_id).first()
     ids = hybrid_recommendation(
         movie_id=movie.id if movie else None,
         user_id=u.id if u else None,
@@ -517,39 +621,139 @@ def recommend_hybrid():
     ])
 
 
+@main.route("/recommend/batch", methods=["POST"])
+def recommend_batch():
+    """
+    Every rail for a page in one round trip.
+
+    Body: {"seeds": [tmdb_id, ...],
+           "strategies": ["content", "crew", "franchise", "hybrid"],
+           "user_strategies": ["collaborative", "hybrid"],
+           "top_n": 10}
+    """
+    from recommendation import hybrid
+
+    data = request.get_json(silent=True) or {}
+    try:
+        top_n = max(1, min(int(data.get("top_n", 10)), 50))
+        tmdb_ids = [int(t) for t in data.get("seeds", [])][:BATCH_MAX_SEEDS]
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid JSON"}), 400
+
+    seed_strategies = [s for s in data.get("strategies", []) if s in BATCH_SEED_STRATEGIES]
+    user_strategies = [s for s in data.get("user_strategies", []) if s in BATCH_USER_STRATEGIES]
+
+    u = current_user()
+    user_id = u.id if u else None
+
+    # One IN query resolves every seed
+    seeds = {
+        m.tmdb_id: m.id
+        for m in Movie.query.with_entities(Movie.id, Movie.tmdb_id)
+        .filter(Movie.tmdb_id.in_(tmdb_ids)).all()
+    } if tmdb_ids else {}
+
+    # Component lists are computed once, concurrently, and shared between
+    # the plain strategies and every hybrid blend in this request
+    config = hybrid.get_config()
+    wants_hybrid = "hybrid" in seed_strategies or "hybrid" in user_strategies
+
+    seed_components = {s for s in seed_strategies if s != "hybrid"}
+    if "hybrid" in seed_strategies:
+        seed_components.update(
+            name for name, (needs, _) in hybrid.RECOMMENDERS.items()
+            if needs == "movie" and config["enabled"].get(name)
+        )
+
+    shared = {}
+    per_seed = {movie_id: {} for movie_id in seeds.values()}
+
+    jobs = [
+        (name, movie_id, None, max(top_n, hybrid.COMPONENT_SIZES[name]))
+        for movie_id in per_seed
+        for name in sorted(seed_components)
+    ]
+    if user_id and ("collaborative" in user_strategies or wants_hybrid):
+        jobs.append(("collaborative", None, user_id, max(top_n, hybrid.COMPONENT_SIZES["collaborative"])))
+
+    for (name, movie_id, _, _), future in hybrid.submit_components(jobs).items():
+        if movie_id is None:
+            shared[name] = future.result()
+        else:
+            per_seed[movie_id][name] = future.result()
+
+    lists = {}
+    for tmdb_id, movie_id in seeds.items():
+        components = per_seed[movie_id]
+        components.update(shared)
+        lists[tmdb_id] = {
+            name: (
+                hybrid.hybrid_recommendation(movie_id, user_id, top_n, components=components)
+                if name == "hybrid" else components.get(name, [])[:top_n]
+            )
+            for name in seed_strategies
+        }
+
+    user_lists = {}
+    if user_id:
+        for name in user_strategies:
+            user_lists[name] = (
+                hybrid.hybrid_recommendation(None, user_id, top_n, components=dict(shared))
+                if name == "hybrid" else shared.get(name, [])[:top_n]
+            )
+
+    # One IN query serialises every list
+    all_ids = {m for rails in lists.values() for ids in rails.values() for m in ids}
+    all_ids.update(m for ids in user_lists.values() for m in ids)
+    movies = {
+        m.id: movie_card(m)
+        for m in Movie.query.filter(Movie.id.in_(all_ids)).all()
+    } if all_ids else {}
+
+    def cards(ids):
+        return [movies[m] for m in ids if m in movies]
+
+    return jsonify({
+        "seeds": {
+            str(tmdb_id): {name: cards(ids) for name, ids in rails.items()}
+            for tmdb_id, rails in lists.items()
+        },
+        "user": {name: cards(ids) for name, ids in user_lists.items()}
+    })
+
+
 @main.route("/recommend/top-rated")
 def recommend_top_rated():
     u = current_user()
-    watched = {w.movie.tmdb_id for w in u.watched} if u else set()
+    watched = {
+        t for (t,) in db.session.query(Movie.tmdb_id)
+        .join(Watched, Watched.movie_id == Movie.id)
+        .filter(Watched.user_id == u.id).all()
+    } if u else set()
 
     res = tmdb_get("/movie/top_rated")
-    results = []
-
-    for m in res.get("results", []):
-        if m["id"] in watched:
-            continue
-
-        movie = Movie.query.filter_by(tmdb_id=m["id"]).first()
-        if not movie:
-            movie = Movie(
-                tmdb_id=m["id"],
-                title=m.get("title", ""),
-                poster_path=m.get("poster_path", ""),
-                popularity=m.get("popularity", 0)
-            )
-            db.session.add(movie)
+    picks = [m for m in res.get("results", []) if m["id"] not in watched][:20]
 
-        results.append(movie)
-        if len(results) >= 20:
-            break
+    stored, created = upsert_movies(tmdb_list_rows(picks))
+    results = [movie_card(stored[m["id"]]) for m in picks]
 
     db.session.commit()
+    index_new_movies(created)
 
-    return jsonify([
-        {
-            "id": m.tmdb_id,
-            "title": m.title,
-            "poster_path": m.poster_path
-        }
-        for m in results
-    ])
+    return jsonify(results)
+
+
+# ======================================================
+# STATS
+# ======================================================
+
+def require_stats_token():
+    token = request.headers.get("X-Stats-Token", "")
+    if not STATS_TOKEN or not hmac.compare_digest(token, STATS_TOKEN):
+        abort(404)
+
+
+@main.route("/stats/tmdb-cache")
+def tmdb_cache_stats():
+    require_stats_token()
+    return jsonify(get_cache().metrics())
@@ -0,0 +1,105 @@
+"""
+Movie search: local full-text index + TMDB, fused.
+
+The TMDB movie and person searches are sent together, the local index is
+queried while they are in flight, and person credits are fetched in
+parallel as soon as the person search returns. Everything upstream shares
+one deadline (SEARCH_DEADLINE_SECONDS); calls still running when it passes
+are dropped and the response is built from what arrived.
+
+Sources are merged with reciprocal rank fusion: each ranked list adds
+1 / (RRF_K + rank) to a movie's score, so a film found by both the local
+index and TMDB rises above one found by a single source.
+"""
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from database.search_index import search_movies as search_local
+from .tmdb_cache import get_cache
+
+SEARCH_DEADLINE = float(os.getenv("SEARCH_DEADLINE_SECONDS", "1.5"))
+RRF_K = 60
+MAX_RESULTS = 15
+MAX_PEOPLE = 3
+LOCAL_CANDIDATES = 30
+
+
+def _card(m):
+    return {
+        "tmdb_id": m["id"],
+        "title": m.get("title", ""),
+        "poster_path": m.get("poster_path", "")
+    }
+
+
+def _credit_cards(credits):
+    """A person's films (acting, or directing) by popularity."""
+    films = credits.get("cast", []) + [
+        m for m in credits.get("crew", []) if m.get("job") == "Director"
+    ]
+    films.sort(key=lambda m: -(m.get("popularity") or 0))
+    return [_card(m) for m in films]
+
+
+def fuse(ranked_lists, limit=MAX_RESULTS):
+    """Reciprocal rank fusion of lists of cards, keyed by tmdb_id."""
+    scores, cards = {}, {}
+    for ranked in ranked_lists:
+        seen = set()
+        for rank, card in enumerate(ranked):
+            key = card["tmdb_id"]
+            if key in seen:
+                continue
+            seen.add(key)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (RRF_K + rank + 1)
+            cards.setdefault(key, card)
+
+    best = sorted(scores, key=lambda key: -scores[key])
+    return [cards[key] for key in best[:limit]]
+
+
+def search(query, deadline=SEARCH_DEADLINE, limit=MAX_RESULTS):
+    """
+    Returns (cards, partial); partial is True when an upstream call did not
+    finish before the deadline, so the list may be missing TMDB results.
+    """
+    cache = get_cache()
+    expires = time.monotonic() + deadline
+
+    movie_search = cache.submit("/search/movie", {"query": query})
+    person_search = cache.submit("/search/person", {"query": query})
+
+    local = [
+        {"tmdb_id": m["tmdb_id"], "title": m["title"], "poster_path": m["poster_path"]}
+        for m in search_local(query, LOCAL_CANDIDATES)
+    ]
+
+    pending = {movie_search, person_search}
+    credit_calls = []
+    while pending:
+        remaining = expires - time.monotonic()
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        if person_search in done and not person_search.exception():
+            people = person_search.result().get("results", [])[:MAX_PEOPLE]
+            credit_calls = [cache.submit(f"/person/{p['id']}/movie_credits") for p in people]
+            pending |= set(credit_calls)
+
+    def result(future):
+        if not future.done() or future.exception():
+            return None
+        return future.result()
+
+    ranked = [local]
+    movies = result(movie_search)
+    if movies:
+        ranked.append([_card(m) for m in movies.get("results", [])])
+    ranked.extend(_credit_cards(c) for c in map(result, credit_calls) if c)
+
+    partial = any(
+        result(f) is None for f in [movie_search, person_search, *credit_calls]
+    )
+    return fuse(ranked, limit), partial
@@ -0,0 +1,169 @@
+"""
+Session Backends
+----------------
+SESSION_BACKEND selects how Flask sessions are stored:
+
+- "filesystem" (default): the original Flask-Session directory store.
+- "sql": only a signed session id travels in the cookie; the data lives in
+  the `sessions` table, so sessions can be revoked and expire server-side,
+  and every worker on every host shares them.
+  Rows are written only when the session changes or is due a refresh.
+  Logging in issues a new session id and deletes the old row, so an id
+  planted before login never carries the account.
+  Expired rows are removed by sweep_expired() / `python -m backend.sessions sweep`.
+- "cookie": signed, stateless cookie (Flask's itsdangerous session). No
+  server-side I/O, but the session data is readable (not encrypted) by
+  the client.
+
+Switching backend invalidates every existing session: all users are
+logged out once.
+"""
+
+import json
+import os
+import secrets
+from datetime import datetime, timedelta, timezone
+
+from flask.sessions import SecureCookieSessionInterface, SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+from database.db import db
+from database.models import SessionRecord
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "filesystem")
+SESSION_LIFETIME = timedelta(days=int(os.getenv("SESSION_LIFETIME_DAYS", "14")))
+# Unchanged sessions only touch the DB when this much lifetime has elapsed
+SESSION_REFRESH = timedelta(hours=int(os.getenv("SESSION_REFRESH_HOURS", "12")))
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class SQLSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False, expires_at=None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.expires_at = expires_at
+        self.modified = False
+        # Issue a new sid (and drop the old row) on the next save
+        self.regenerate = False
+
+
+class SQLSessionInterface(SessionInterface):
+    salt = "cinescintille-session"
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt=self.salt)
+
+    def _table(self):
+        return SessionRecord.__table__
+
+    def regenerate(self, session):
+        """Same hook as Flask-Session's: give `session` a fresh id when saved."""
+        session.regenerate = True
+        session.modified = True
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode()
+            except BadSignature:
+                sid = None
+
+            if sid:
+                table = self._table()
+                with db.engine.connect() as conn:
+                    row = conn.execute(
+                        table.select().where(
+                            table.c.sid == sid, table.c.expires_at > _now()
+                        )
+                    ).first()
+                if row:
+                    return SQLSession(json.loads(row.data), sid=sid, expires_at=row.expires_at)
+
+        return SQLSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        table = self._table()
+
+        if not session:
+            if session.modified and not session.new:
+                with db.engine.begin() as conn:
+                    conn.execute(table.delete().where(table.c.sid == session.sid))
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = _now()
+        due = session.expires_at is None or session.expires_at - now < SESSION_LIFETIME - SESSION_REFRESH
+        if not session.modified and not due:
+            return
+
+        expires_at = now + SESSION_LIFETIME
+        values = {"data": json.dumps(dict(session)), "expires_at": expires_at}
+        with db.engine.begin() as conn:
+            if session.regenerate:
+                conn.execute(table.delete().where(table.c.sid == session.sid))
+                session.sid = secrets.token_urlsafe(32)
+                session.regenerate = False
+                updated = 0
+            else:
+                updated = conn.execute(
+                    table.update().where(table.c.sid == session.sid).values(**values)
+                ).rowcount
+            if not updated:
+                conn.execute(table.insert().values(sid=session.sid, **values))
+
+        response.set_cookie(
+            name,
+            self._signer(app).sign(session.sid.encode()).decode(),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+def sweep_expired():
+    """Delete expired SQL sessions; returns the number removed."""
+    table = SessionRecord.__table__
+    with db.engine.begin() as conn:
+        return conn.execute(table.delete().where(table.c.expires_at <= _now())).rowcount
+
+
+def init_sessions(app, backend=SESSION_BACKEND):
+    if backend == "sql":
+        app.session_interface = SQLSessionInterface()
+    elif backend == "filesystem":
+        from flask_session import Session
+
+        app.config.setdefault("SESSION_TYPE", "filesystem")
+        app.config.setdefault("SESSION_FILE_DIR", "/tmp/flask_session")
+        Session(app)
+    elif backend == "cookie":
+        app.session_interface = SecureCookieSessionInterface()
+    else:
+        raise ValueError(f"SESSION_BACKEND must be filesystem, sql or cookie, not {backend!r}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    from backend.app import create_db_app
+
+    if sys.argv[1:] != ["sweep"]:
+        sys.exit("usage: python -m backend.sessions sweep")
+
+    with create_db_app().app_context():
+        print(f"✅ Removed {sweep_expired()} expired sessions")
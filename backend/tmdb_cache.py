@@ -0,0 +1,208 @@
+"""
+Tiered TMDB response cache.
+
+    request -> in-process LRU -> shared filesystem tier -> TMDB
+
+- per-path TTLs (trending/top-rated change daily, details almost never)
+- stale-while-revalidate: a stale entry inside its grace window is served
+  immediately while one background refresh runs
+- request coalescing: concurrent misses for one key make one upstream call
+- hit/miss counters, exposed through /stats/tmdb-cache (X-Stats-Token)
+
+The filesystem tier (TMDB_CACHE_DIR) is shared by every worker on a host;
+point it at a shared volume to share it across hosts.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+from recommendation.cache import TTLCache
+from .tmdb_client import get_client
+
+CACHE_DIR = os.getenv("TMDB_CACHE_DIR", "/tmp/cinescintille_tmdb_cache")
+MEMORY_SIZE = int(os.getenv("TMDB_CACHE_MEMORY_SIZE", "2048"))
+
+MINUTE, HOUR, DAY = 60, 3600, 86400
+
+# (path pattern, fresh seconds, extra stale-while-revalidate seconds)
+TTL_RULES = [
+    (re.compile(r"^/trending/"), 6 * HOUR, DAY),
+    (re.compile(r"^/movie/(top_rated|popular|now_playing|upcoming)$"), 12 * HOUR, DAY),
+    (re.compile(r"^/movie/\d+/(watch/providers|similar)$"), DAY, DAY),
+    (re.compile(r"^/movie/\d+(/\w+)?$"), 7 * DAY, 7 * DAY),
+    (re.compile(r"^/person/\d+/movie_credits$"), DAY, 7 * DAY),
+    (re.compile(r"^/search/"), 30 * MINUTE, HOUR),
+]
+DEFAULT_TTL = (10 * MINUTE, 10 * MINUTE)
+
+
+def ttl_for(path):
+    for pattern, fresh, stale in TTL_RULES:
+        if pattern.search(path):
+            return fresh, stale
+    return DEFAULT_TTL
+
+
+def cache_key(path, params=None):
+    items = sorted((k, str(v)) for k, v in (params or {}).items() if k != "api_key")
+    return path + "?" + "&".join(f"{k}={v}" for k, v in items)
+
+
+class TMDBCache:
+    def __init__(self, client=None, cache_dir=CACHE_DIR, memory_size=MEMORY_SIZE):
+        self._client = client
+        self.cache_dir = cache_dir
+        self.memory = TTLCache(max_size=memory_size)
+        self.stats = Counter()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    @property
+    def client(self):
+        return self._client or get_client()
+
+    # -------------------------------------------------
+    # Shared tier
+    # -------------------------------------------------
+    def _file(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode()).hexdigest() + ".json")
+
+    def _read_shared(self, key):
+        try:
+            with open(self._file(key)) as f:
+                entry = json.load(f)
+            return entry["fetched_at"], entry["payload"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_shared(self, key, entry):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._file(key)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}"
+            with open(tmp, "w") as f:
+                json.dump({"fetched_at": entry[0], "payload": entry[1]}, f)
+            os.replace(tmp, path)
+        except OSError:
+            # The shared tier is an optimisation; never fail the request
+            pass
+
+    # -------------------------------------------------
+    # Lookup
+    # -------------------------------------------------
+    def _lookup(self, key, fresh, stale):
+        entry = self.memory.get(key)
+        if entry is not None:
+            return entry, "memory"
+
+        entry = self._read_shared(key)
+        if entry is not None and time.time() - entry[0] < fresh + stale:
+            self.memory.set(key, entry, ttl=fresh + stale)
+            return entry, "shared"
+
+        return None, None
+
+    def _claim(self, key):
+        """(future, leader): register a new in-flight call for `key`, or join the running one."""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future, False
+            future = self._inflight[key] = Future()
+            return future, True
+
+    def _fetch(self, key, path, params, fresh, stale):
+        """Single upstream call per key; followers wait on the leader."""
+        future, leader = self._claim(key)
+        if not leader:
+            self._count("coalesced")
+            return future.result()
+        return self._call_upstream(key, future, path, params, fresh, stale)
+
+    def _call_upstream(self, key, future, path, params, fresh, stale):
+        """Run the call registered as `future` in _inflight, then release it."""
+        try:
+            payload = self.client.get(path, params)
+            if payload:
+                entry = (time.time(), payload)
+                self.memory.set(key, entry, ttl=fresh + stale)
+                self._write_shared(key, entry)
+            else:
+                self._count("upstream_errors")
+            future.set_result(payload)
+            return payload
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def get(self, path, params=None):
+        key = cache_key(path, params)
+        fresh, stale = ttl_for(path)
+
+        entry, tier = self._lookup(key, fresh, stale)
+        if entry is not None:
+            fetched_at, payload = entry
+            if time.time() - fetched_at < fresh:
+                self._count(f"hits_{tier}")
+                return payload
+
+            # Stale but within grace: serve it, refresh in the background.
+            # The refresh is registered before it is queued, so concurrent
+            # stale hits never queue a second one.
+            self._count("stale_served")
+            future, leader = self._claim(key)
+            if leader:
+                try:
+                    self.client.submit_call(
+                        self._call_upstream, key, future, path, params, fresh, stale
+                    )
+                except RuntimeError as exc:
+                    # Pool shut down: release the key so a later call can fetch
+                    with self._lock:
+                        self._inflight.pop(key, None)
+                    future.set_exception(exc)
+            return payload
+
+        self._count("misses")
+        return self._fetch(key, path, params, fresh, stale)
+
+    def submit(self, path, params=None):
+        """Cached counterpart of TMDBClient.submit; returns a Future."""
+        return self.client.submit_call(self.get, path, params)
+
+    def get_many(self, calls):
+        """Cached counterpart of TMDBClient.get_many."""
+        futures = [self.submit(*((c,) if isinstance(c, str) else c)) for c in calls]
+        return [f.result() for f in futures]
+
+    def metrics(self):
+        with self._lock:
+            counts = dict(self.stats)
+        hits = counts.get("hits_memory", 0) + counts.get("hits_shared", 0)
+        lookups = hits + counts.get("misses", 0) + counts.get("stale_served", 0)
+        counts["hit_ratio"] = round(hits / lookups, 4) if lookups else None
+        counts["memory_entries"] = len(self.memory)
+        return counts
+
+
+# -------------------------------------------------
+# Process-wide cache
+# -------------------------------------------------
+_cache = TMDBCache()
+
+
+def get_cache():
+    return _cache
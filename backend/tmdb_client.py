@@ -0,0 +1,133 @@
+"""
+Shared TMDB HTTP client.
+
+- one keep-alive requests.Session per process with a bounded connection pool
+- connect/read timeouts on every call
+- retries with exponential backoff on 429/5xx, honouring Retry-After
+- a bounded thread pool for fanning out independent requests
+
+Every knob comes from the environment so the client can be pointed at a
+local stub server (TMDB_BASE_URL=http://127.0.0.1:8001) in development.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+TMDB_API_KEY = os.getenv("TMDB_API_KEY")
+TMDB_BASE = os.getenv("TMDB_BASE_URL", "https://api.themoviedb.org/3")
+
+CONNECT_TIMEOUT = float(os.getenv("TMDB_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.getenv("TMDB_READ_TIMEOUT", "10"))
+MAX_RETRIES = int(os.getenv("TMDB_MAX_RETRIES", "3"))
+BACKOFF_FACTOR = float(os.getenv("TMDB_BACKOFF_FACTOR", "0.5"))
+MAX_CONCURRENCY = int(os.getenv("TMDB_MAX_CONCURRENCY", "8"))
+
+
+class TMDBClient:
+    def __init__(self, api_key=TMDB_API_KEY, base_url=TMDB_BASE,
+                 timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), retries=MAX_RETRIES,
+                 backoff_factor=BACKOFF_FACTOR, max_concurrency=MAX_CONCURRENCY):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET",),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=max_concurrency,
+            pool_maxsize=max_concurrency,
+            max_retries=retry,
+        )
+
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="tmdb"
+        )
+
+    def get(self, path, params=None, not_found=None):
+        """
+        GET ``path``; returns the decoded JSON, or {} on any failure.
+        A 404 returns ``not_found`` instead when one is given, so callers can
+        tell a title TMDB no longer has from a transient error.
+        """
+        params = dict(params or {})
+        params["api_key"] = self.api_key
+        try:
+            res = self.session.get(
+                f"{self.base_url}{path}", params=params, timeout=self.timeout
+            )
+        except requests.RequestException:
+            return {}
+        if res.status_code == 404 and not_found is not None:
+            return not_found
+        if not res.ok:
+            return {}
+        try:
+            return res.json()
+        except ValueError:
+            return {}
+
+    def submit(self, path, params=None):
+        """Schedule a GET on the fan-out pool; returns a Future."""
+        return self.submit_call(self.get, path, params)
+
+    def submit_call(self, fn, *args):
+        """Run any TMDB-bound callable on the fan-out pool."""
+        return self._pool.submit(fn, *args)
+
+    def get_many(self, calls, not_found=None):
+        """
+        Run several GETs concurrently.
+
+        calls: iterable of path strings or (path, params) tuples
+        Returns the responses in the same order.
+        """
+        futures = [
+            self.submit_call(self.get, *((c, None) if isinstance(c, str) else c), not_found)
+            for c in calls
+        ]
+        return [f.result() for f in futures]
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+        self.session.close()
+
+
+# -------------------------------------------------
+# Process-wide client
+# -------------------------------------------------
+_lock = threading.Lock()
+_client = None
+_client_pid = None
+
+
+def get_client():
+    """Shared client, recreated after fork so workers never share sockets."""
+    global _client, _client_pid
+
+    if _client is not None and _client_pid == os.getpid():
+        return _client
+
+    with _lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = TMDBClient()
+            _client_pid = os.getpid()
+        return _client
+
+
+def tmdb_get(path, params=None):
+    return get_client().get(path, params)
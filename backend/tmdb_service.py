@@ -1,23 +1,26 @@
-import requests
-import os
+from .tmdb_cache import get_cache
 
-TMDB_API_KEY = os.getenv("TMDB_API_KEY")
-BASE_URL = "https://api.themoviedb.org/3"
+# Every web-facing TMDB read goes through the response cache
+tmdb_get = get_cache().get
 
-
-def tmdb_get(path, params=None):
-    if params is None:
-        params = {}
-    params["api_key"] = TMDB_API_KEY
-    return requests.get(f"{BASE_URL}{path}", params=params).json()
+# Sub-resources folded into the details call via append_to_response
+DETAIL_PARTS = ("videos", "credits", "watch/providers", "similar")
 
 
 def get_movie_full(tmdb_id):
-    details = tmdb_get(f"/movie/{tmdb_id}")
-    videos = tmdb_get(f"/movie/{tmdb_id}/videos")
-    credits = tmdb_get(f"/movie/{tmdb_id}/credits")
-    providers = tmdb_get(f"/movie/{tmdb_id}/watch/providers")
-    similar = tmdb_get(f"/movie/{tmdb_id}/similar")
+    client = get_cache()
+    details = client.get(
+        f"/movie/{tmdb_id}", {"append_to_response": ",".join(DETAIL_PARTS)}
+    )
+
+    # Anything not appended (older proxies, stubs) is fetched in parallel
+    missing = [part for part in DETAIL_PARTS if part not in details]
+    fetched = dict(zip(
+        missing, client.get_many(f"/movie/{tmdb_id}/{part}" for part in missing)
+    ))
+    videos, credits, providers, similar = (
+        details.get(part) or fetched.get(part, {}) for part in DETAIL_PARTS
+    )
 
     # 🎬 Trailer (YouTube)
     trailer = None
@@ -0,0 +1,580 @@
+"""
+Recommender Benchmark
+---------------------
+Speed and ranking quality of every recommender on a synthetic catalogue,
+so a performance change can be shown not to cost recommendation quality:
+
+  first ms     first call, including model / index load
+  p50, p99 ms  single-seed calls, as a request handler makes them
+  calls/s      the same calls back to back
+  batch/s      seeds per second through the *_batch form
+  peak MB      tracemalloc peak from a cold start over --memory-queries calls
+  P@K R@K      precision and recall of the held-out ratings in the top K
+  NDCG@K       the same, discounted by rank
+  coverage     share of the catalogue appearing in anyone's top K
+
+    python -m benchmarks.recommenders --movies 10000 --users 1000
+    python -m benchmarks.recommenders --movies 1000000 --users 100000 --als --json base.json
+    python -m benchmarks.recommenders --movies 1000000 --users 100000 --als --compare base.json
+
+Movies belong to latent topics that drive their overview words, genres,
+director, cast and series; each user favours one to three topics and
+rates mostly within them. --holdout liked ratings per user are left out
+of the database and have to be recovered from the rest. Every query seeds
+the movie recommenders with the user's best-rated remaining movie, and
+already-rated movies are dropped from all lists before scoring.
+
+Everything runs against a temporary SQLite database and artifact directory.
+--compare exits with status 1 when a quality metric drops by more than
+--tolerance, or p99 latency grows by more than --latency-tolerance,
+against a saved --json run.
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+GENRES = (
+    "Action", "Adventure", "Animation", "Comedy", "Crime", "Documentary",
+    "Drama", "Family", "Fantasy", "History", "Horror", "Music", "Mystery",
+    "Romance", "Science Fiction", "Thriller", "War", "Western",
+)
+SYLLABLES = ("ka", "lo", "mi", "ne", "ru", "sa", "to", "be",
+             "ze", "da", "fe", "gu", "ho", "ja", "po", "re")
+VOCABULARY = 20000
+TOPIC_WORDS = 30
+DIRECTORS_PER_TOPIC = 4
+ACTORS_PER_TOPIC = 30
+STARS = 200
+SERIES_RATE = 0.03
+TASTE = 0.8           # share of a user's ratings drawn from favourite topics
+WATCHED_ONLY = 0.25   # share of training interactions stored as watched, unrated
+INSERT_CHUNK = 10000
+USER_CHUNK = 50000
+
+METRICS = ("precision", "recall", "ndcg", "coverage")
+LATENCY = ("p99_ms",)
+
+
+def _word(n):
+    """Pronounceable, unique, never a roman numeral (no franchise collisions)."""
+    out = ""
+    while True:
+        out += SYLLABLES[n % len(SYLLABLES)]
+        n //= len(SYLLABLES)
+        if not n:
+            return out
+
+
+# -------------------------------------------------
+# Synthetic data
+# -------------------------------------------------
+class Catalogue:
+    def __init__(self, n_movies, n_topics, seed):
+        rng = np.random.default_rng(seed)
+        self.n_movies = n_movies
+        self.n_topics = n_topics
+        self.topic = rng.integers(0, n_topics, n_movies)
+        self.popularity = (rng.pareto(1.5, n_movies) + 1.0) * 10
+        self.topic_words = rng.integers(0, VOCABULARY, size=(n_topics, TOPIC_WORDS))
+
+        # Short runs of consecutive ids form a series on one topic
+        self.series = np.zeros(n_movies, dtype=np.int64)
+        starts = np.flatnonzero(rng.random(n_movies) < SERIES_RATE)
+        for start in starts:
+            stop = min(start + int(rng.integers(2, 5)), n_movies)
+            if self.series[start:stop].any():
+                continue
+            self.series[start:stop] = start + 1
+            self.topic[start:stop] = self.topic[start]
+
+        # Popularity-weighted sampling within a topic: one cumulative sum
+        # over the movies sorted by topic, a slice of it per topic
+        self.by_topic = np.argsort(self.topic, kind="stable")
+        self.cumulative = np.cumsum(self.popularity[self.by_topic])
+        bounds = np.searchsorted(self.topic[self.by_topic], np.arange(n_topics + 1))
+        self.topic_start, self.topic_stop = bounds[:-1], bounds[1:]
+
+    def sample(self, rng, topics):
+        """One popularity-weighted movie index per entry of `topics`."""
+        start, stop = self.topic_start[topics], self.topic_stop[topics]
+        base = np.where(start > 0, self.cumulative[np.maximum(start - 1, 0)], 0.0)
+        total = self.cumulative[np.maximum(stop - 1, 0)] - base
+        target = base + rng.random(len(topics)) * total
+        pos = np.searchsorted(self.cumulative, target, side="right")
+        pos = np.clip(pos, start, np.maximum(stop - 1, start))
+        return self.by_topic[pos]
+
+    def sample_any(self, rng, n):
+        target = rng.random(n) * self.cumulative[-1]
+        pos = np.minimum(np.searchsorted(self.cumulative, target, side="right"),
+                         self.n_movies - 1)
+        return self.by_topic[pos]
+
+    def movie_rows(self, seed):
+        """Movie dicts (id = index + 1) in chunks of INSERT_CHUNK."""
+        from database.models import franchise_key
+
+        rng = np.random.default_rng(seed + 1)
+        rows = []
+        for i in range(self.n_movies):
+            t = int(self.topic[i])
+            series = int(self.series[i])
+            title = _word(series - 1 if series else i).title()
+            if series:
+                # franchise_key only strips a number after a two-word base
+                title = f"{title} Saga"
+                if i + 1 > series:
+                    title = f"{title} {i + 2 - series}"
+
+            words = np.concatenate([
+                rng.choice(self.topic_words[t], size=25),
+                rng.integers(0, VOCABULARY, size=8),
+            ])
+            actors = rng.choice(ACTORS_PER_TOPIC, size=4, replace=False) + t * ACTORS_PER_TOPIC
+            cast = [f"Actor {a}" for a in actors]
+            if rng.random() < 0.2:
+                cast.append(f"Star {rng.integers(STARS)}")
+
+            rows.append({
+                "id": i + 1,
+                "tmdb_id": i + 1,
+                "title": title,
+                "franchise_key": franchise_key(title),
+                # Half the series are linked by collection, half by title alone
+                "collection_id": series if series and series % 2 else None,
+                "overview": " ".join(f"w{w}" for w in words),
+                "genres": f"{GENRES[t % len(GENRES)]}, {GENRES[(t * 7 + 3) % len(GENRES)]}",
+                "director": f"Director {t * DIRECTORS_PER_TOPIC + rng.integers(DIRECTORS_PER_TOPIC)}",
+                "cast": ",".join(cast),
+                "language": "en",
+                "release_date": f"{1970 + i % 55}-01-01",
+                "runtime": 80 + int(rng.integers(70)),
+                "popularity": float(self.popularity[i]),
+            })
+            if len(rows) == INSERT_CHUNK:
+                yield rows
+                rows = []
+        if rows:
+            yield rows
+
+
+def interactions(catalogue, n_users, ratings_per_user, seed):
+    """
+    (users, movies, ratings) index arrays, one row per distinct (user, movie)
+    pair; ratings are 4-5 inside a user's favourite topics, 1-3 outside,
+    with a tenth of them flipped.
+    """
+    rng = np.random.default_rng(seed + 2)
+    parts = []
+    for first in range(0, n_users, USER_CHUNK):
+        n = min(USER_CHUNK, n_users - first)
+        favourites = rng.integers(0, catalogue.n_topics, size=(n, 3))
+        n_favourites = rng.integers(1, 4, size=n)
+        counts = np.maximum(5, rng.poisson(ratings_per_user, size=n))
+
+        users = np.repeat(np.arange(first, first + n), counts)
+        local = users - first
+        topics = favourites[local, (rng.random(len(users)) * n_favourites[local]).astype(int)]
+        movies = np.where(
+            rng.random(len(users)) < TASTE,
+            catalogue.sample(rng, topics),
+            catalogue.sample_any(rng, len(users)),
+        )
+
+        own = np.arange(3)[None, :] < n_favourites[local][:, None]
+        liked = ((catalogue.topic[movies][:, None] == favourites[local]) & own).any(axis=1)
+        liked ^= rng.random(len(users)) < 0.1
+        ratings = np.where(liked, rng.integers(4, 6, len(users)), rng.integers(1, 4, len(users)))
+
+        _, keep = np.unique(users.astype(np.int64) * catalogue.n_movies + movies,
+                            return_index=True)
+        parts.append((users[keep], movies[keep], ratings[keep]))
+
+    return tuple(np.concatenate(column) for column in zip(*parts))
+
+
+def split(users, ratings, holdout, seed):
+    """Boolean mask of held-out rows: `holdout` liked ratings per user with more to spare."""
+    rng = np.random.default_rng(seed + 3)
+    liked = np.flatnonzero(ratings >= 4)
+    order = liked[np.lexsort((rng.random(len(liked)), users[liked]))]
+
+    owners = users[order]
+    group_start = np.r_[0, np.flatnonzero(np.diff(owners)) + 1]
+    group_size = np.diff(np.r_[group_start, len(order)])
+    rank = np.arange(len(order)) - np.repeat(group_start, group_size)
+    size = np.repeat(group_size, group_size)
+
+    held = np.zeros(len(users), dtype=bool)
+    held[order[(rank < holdout) & (size > holdout)]] = True
+    return held
+
+
+def _insert(model, rows):
+    from database.db import db
+
+    db.session.execute(model.__table__.insert(), rows)
+    db.session.commit()
+
+
+def load_database(catalogue, users, movies, ratings, held, watched_only, n_users, seed):
+    """Insert the catalogue, the users and every row not held out."""
+    from database.models import Movie, Review, User, Watched
+
+    for rows in catalogue.movie_rows(seed):
+        _insert(Movie, rows)
+
+    for first in range(0, n_users, INSERT_CHUNK):
+        _insert(User, [
+            {"id": u + 1, "username": f"user{u}", "email": f"user{u}@bench.local",
+             "password_hash": "!"}
+            for u in range(first, min(first + INSERT_CHUNK, n_users))
+        ])
+
+    reviews = np.flatnonzero(~held & ~watched_only)
+    watched = np.flatnonzero(~held & watched_only)
+    for model, rows in ((Review, reviews), (Watched, watched)):
+        for start in range(0, len(rows), INSERT_CHUNK):
+            block = rows[start:start + INSERT_CHUNK]
+            values = [
+                {"user_id": int(u) + 1, "movie_id": int(m) + 1}
+                for u, m in zip(users[block], movies[block])
+            ]
+            if model is Review:
+                for value, r in zip(values, ratings[block]):
+                    value["rating"] = int(r)
+            _insert(model, values)
+
+
+
+def seed_movies(users, movies, ratings, reviewed, popularity, n_users):
+    """Per user, the best-rated reviewed movie (then most popular), -1 for none."""
+    rows = np.flatnonzero(reviewed)
+    order = rows[np.lexsort((-popularity[movies[rows]], -ratings[rows], users[rows]))]
+    first = np.r_[True, np.diff(users[order]) != 0]
+    seeds = np.full(n_users, -1, dtype=np.int64)
+    seeds[users[order[first]]] = movies[order[first]]
+    return seeds
+
+
+# -------------------------------------------------
+# Recommenders under test
+# -------------------------------------------------
+def recommenders(als=False):
+    """
+    name -> (single(movie_id, user_id, n) -> ids, batch(movie_ids, user_ids, n) -> ids)
+    """
+    from recommendation.collaborative import (
+        recommend_collaborative, recommend_collaborative_batch
+    )
+    from recommendation.content_based import (
+        recommend_similar_movies, recommend_similar_movies_batch
+    )
+    from recommendation.crew_based import recommend_by_crew, recommend_by_crew_batch
+    from recommendation.franchise import (
+        recommend_by_franchise, recommend_by_franchise_batch
+    )
+    from recommendation.hybrid import hybrid_recommendation, hybrid_recommendation_batch
+
+    found = {
+        "content": (
+            lambda m, u, n: recommend_similar_movies(m, top_n=n),
+            lambda ms, us, n: recommend_similar_movies_batch(ms, top_n=n)[0],
+        ),
+        "crew": (
+            lambda m, u, n: recommend_by_crew(m, top_n=n),
+            lambda ms, us, n: recommend_by_crew_batch(ms, top_n=n)[0],
+        ),
+        "franchise": (
+            lambda m, u, n: recommend_by_franchise(m, top_n=n),
+            lambda ms, us, n: recommend_by_franchise_batch(ms, top_n=n)[0],
+        ),
+        "collaborative": (
+            lambda m, u, n: recommend_collaborative(u, top_n=n, method="neighbours"),
+            lambda ms, us, n: recommend_collaborative_batch(us, top_n=n, method="neighbours")[0],
+        ),
+    }
+    if als:
+        found["collaborative-als"] = (
+            lambda m, u, n: recommend_collaborative(u, top_n=n, method="als"),
+            lambda ms, us, n: recommend_collaborative_batch(us, top_n=n, method="als")[0],
+        )
+    found["hybrid"] = (
+        lambda m, u, n: hybrid_recommendation(movie_id=m, user_id=u, top_n=n),
+        lambda ms, us, n: hybrid_recommendation_batch(us, top_n=n, movie_ids=ms)[0],
+    )
+    return found
+
+
+def reset_models():
+    """Drop every process-wide model, index and cache; the next call loads cold."""
+    from recommendation import als, content_store, crew_index, hybrid, rating_matrix
+
+    content_store.reset()
+    als.reset()
+    crew_index._index = None
+    rating_matrix._matrix = None
+    hybrid._results.clear()
+    hybrid._popular_cache.clear()
+
+
+def train_models(als, content_index):
+    from recommendation import train_collaborative_model, train_content_model
+
+    started = time.perf_counter()
+    train_content_model.train(index=content_index)
+    print(f"  content model: {time.perf_counter() - started:.1f}s")
+    if als:
+        started = time.perf_counter()
+        train_collaborative_model.train()
+        print(f"  ALS model: {time.perf_counter() - started:.1f}s")
+
+
+# -------------------------------------------------
+# Measurements
+# -------------------------------------------------
+def measure_speed(single, batch, movie_ids, user_ids, k):
+    from recommendation import hybrid
+
+    hybrid._results.clear()
+    started = time.perf_counter()
+    single(int(movie_ids[0]), int(user_ids[0]), k)
+    first = time.perf_counter() - started
+
+    latencies = []
+    for m, u in zip(movie_ids[1:].tolist(), user_ids[1:].tolist()):
+        started = time.perf_counter()
+        single(m, u, k)
+        latencies.append(time.perf_counter() - started)
+    latencies = np.array(latencies or [first]) * 1000
+
+    hybrid._results.clear()
+    started = time.perf_counter()
+    batch(movie_ids, user_ids, k)
+    batch_seconds = time.perf_counter() - started
+
+    return {
+        "first_ms": first * 1000,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "calls_per_s": len(latencies) / max(latencies.sum() / 1000, 1e-9),
+        "batch_per_s": len(movie_ids) / max(batch_seconds, 1e-9),
+    }
+
+
+def measure_memory(single, movie_ids, user_ids, k):
+    """tracemalloc peak (MB) from a cold start; memory-mapped artifacts are not counted."""
+    reset_models()
+    tracemalloc.start()
+    try:
+        for m, u in zip(movie_ids.tolist(), user_ids.tolist()):
+            single(m, u, k)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 2 ** 20
+
+
+def ranking_metrics(lists, relevant, k, n_movies):
+    """Mean precision@k, recall@k and NDCG@k, plus catalogue coverage."""
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    precision, recall, ndcg, recommended = [], [], [], set()
+    for ranked, wanted in zip(lists, relevant):
+        ranked = ranked[:k]
+        hits = np.array([m in wanted for m in ranked], dtype=float)
+        precision.append(hits.sum() / k)
+        recall.append(hits.sum() / len(wanted))
+        ideal = discounts[:min(len(wanted), k)].sum()
+        ndcg.append((hits * discounts[:len(hits)]).sum() / ideal)
+        recommended.update(ranked)
+    return {
+        "precision": float(np.mean(precision)),
+        "recall": float(np.mean(recall)),
+        "ndcg": float(np.mean(ndcg)),
+        "coverage": len(recommended) / n_movies,
+    }
+
+
+def unseen_lists(ids, seen, k):
+    """Top-k rows with -1 padding and already-rated movies removed."""
+    return [[m for m in row.tolist() if m >= 0 and m not in rated][:k]
+            for row, rated in zip(ids, seen)]
+
+
+# -------------------------------------------------
+# Driver
+# -------------------------------------------------
+def _environment(tmp):
+    # Read by the modules at import time, so set before anything is imported
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+    os.environ["RECOMMENDATION_ARTIFACTS"] = os.path.join(tmp, "artifacts")
+    os.environ["CREW_INDEX_PATH"] = os.path.join(tmp, "crew_index.pkl")
+    os.environ["FEED_WORKER"] = "off"
+
+
+def run(n_movies, n_users, ratings_per_user=30, k=10, queries=500, memory_queries=100,
+        eval_users=2000, holdout=1, topics=None, als=False, content_index=None, seed=0):
+    with tempfile.TemporaryDirectory() as tmp:
+        _environment(tmp)
+        from backend.app import create_db_app
+        from database import models  # noqa: F401
+        from database.db import db
+
+        with create_db_app().app_context():
+            db.create_all()
+            return _run(n_movies, n_users, ratings_per_user, k, queries, memory_queries,
+                        eval_users, holdout, topics, als, content_index, seed)
+
+
+def _run(n_movies, n_users, ratings_per_user, k, queries, memory_queries,
+         eval_users, holdout, topics, als, content_index, seed):
+    config = {"movies": n_movies, "users": n_users, "ratings_per_user": ratings_per_user,
+              "k": k, "holdout": holdout, "als": als, "seed": seed}
+
+    print(f"Generating {n_movies} movies and {n_users} users...")
+    started = time.perf_counter()
+    catalogue = Catalogue(n_movies, topics or max(8, int(np.sqrt(n_movies) / 2)), seed)
+    users, movies, ratings = interactions(catalogue, n_users, ratings_per_user, seed)
+    held = split(users, ratings, holdout, seed)
+    watched_only = np.random.default_rng(seed + 4).random(len(users)) < WATCHED_ONLY
+    load_database(catalogue, users, movies, ratings, held, watched_only, n_users, seed)
+    print(f"  {len(users) - held.sum()} training interactions, {held.sum()} held out "
+          f"({time.perf_counter() - started:.1f}s)")
+
+    print("Training models...")
+    if content_index is None:
+        content_index = "exact" if n_movies <= 50000 else "ivf"
+    train_models(als, content_index)
+
+    # Evaluated users: everyone with a held-out rating and a seed movie
+    rng = np.random.default_rng(seed + 5)
+    train = ~held
+    seeds = seed_movies(users, movies, ratings, train & ~watched_only,
+                        catalogue.popularity, n_users)
+    candidates = np.intersect1d(np.unique(users[held]), np.flatnonzero(seeds >= 0))
+    evaluated = np.sort(rng.choice(candidates, size=min(eval_users, len(candidates)),
+                                   replace=False))
+
+    # Movie and user ids are index + 1
+    movie_ids, user_ids = seeds[evaluated] + 1, evaluated + 1
+    position = {u: i for i, u in enumerate(evaluated.tolist())}
+    seen = [set() for _ in evaluated]
+    relevant = [set() for _ in evaluated]
+    for rows, out in ((np.flatnonzero(train), seen), (np.flatnonzero(held), relevant)):
+        for u, m in zip(users[rows].tolist(), movies[rows].tolist()):
+            i = position.get(u)
+            if i is not None:
+                out[i].add(m + 1)
+
+    timed = rng.choice(len(evaluated), size=min(queries, len(evaluated)), replace=False)
+    # Enough slack for already-rated movies to be dropped
+    fetch = 2 * k
+
+    results = {}
+    for name, (single, batch) in recommenders(als).items():
+        print(f"Benchmarking {name}...")
+        result = measure_speed(single, batch, movie_ids[timed], user_ids[timed], k)
+        result.update(ranking_metrics(
+            unseen_lists(batch(movie_ids, user_ids, fetch), seen, k), relevant, k, n_movies
+        ))
+        result["peak_mb"] = measure_memory(
+            single, movie_ids[timed[:memory_queries]], user_ids[timed[:memory_queries]], k
+        )
+        results[name] = result
+
+    # Reference point: the same most-popular unseen movies for everyone
+    popular = np.argsort(-catalogue.popularity)[:fetch + max(map(len, seen), default=0)] + 1
+    results["popularity (baseline)"] = ranking_metrics(
+        unseen_lists(np.tile(popular, (len(evaluated), 1)), seen, k), relevant, k, n_movies
+    )
+
+    config["evaluated_users"] = len(evaluated)
+    config["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {"config": config, "results": results}
+
+
+def report(run_result):
+    config, results = run_result["config"], run_result["results"]
+    k = config["k"]
+    print(f"\n{config['movies']} movies, {config['users']} users, "
+          f"{config['evaluated_users']} evaluated, K={k}")
+
+    print(f"{'recommender':<22} {'first ms':>9} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'calls/s':>9} {'batch/s':>9} {'peak MB':>8}")
+    for name, r in results.items():
+        if "p50_ms" in r:
+            print(f"{name:<22} {r['first_ms']:>9.1f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+                  f"{r['calls_per_s']:>9.0f} {r['batch_per_s']:>9.0f} {r['peak_mb']:>8.1f}")
+
+    print(f"\n{'recommender':<22} {f'P@{k}':>8} {f'R@{k}':>8} {f'NDCG@{k}':>8} {'coverage':>9}")
+    for name, r in results.items():
+        print(f"{name:<22} {r['precision']:>8.4f} {r['recall']:>8.4f} "
+              f"{r['ndcg']:>8.4f} {r['coverage']:>9.3f}")
+    print(f"\nprocess max RSS: {config['max_rss_mb']:.0f} MB")
+
+
+def compare(run_result, baseline, tolerance, latency_tolerance):
+    """Regressions against a saved run, as printable lines."""
+    regressions = []
+    for name, base in baseline["results"].items():
+        current = run_result["results"].get(name)
+        if current is None:
+            continue
+        for metric in METRICS:
+            if metric in base and current[metric] < base[metric] * (1 - tolerance):
+                regressions.append(f"{name} {metric}: {base[metric]:.4f} -> {current[metric]:.4f}")
+        for metric in LATENCY:
+            if metric in base and current[metric] > base[metric] * (1 + latency_tolerance):
+                regressions.append(f"{name} {metric}: {base[metric]:.2f} -> {current[metric]:.2f}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recommender latency, memory and ranking quality")
+    parser.add_argument("--movies", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--ratings", type=int, default=30, help="mean ratings per user")
+    parser.add_argument("--topics", type=int)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--holdout", type=int, default=1, help="held-out ratings per user")
+    parser.add_argument("--queries", type=int, default=500, help="timed single-seed calls")
+    parser.add_argument("--memory-queries", type=int, default=100)
+    parser.add_argument("--eval-users", type=int, default=2000)
+    parser.add_argument("--als", action="store_true", help="also train and measure ALS")
+    parser.add_argument("--content-index", choices=("exact", "ivf"),
+                        help="default: exact up to 50k movies, ivf above")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="flag regressions against a saved --json run")
+    parser.add_argument("--tolerance", type=float, default=0.05,
+                        help="allowed relative drop of a quality metric")
+    parser.add_argument("--latency-tolerance", type=float, default=0.25,
+                        help="allowed relative growth of p99 latency")
+    args = parser.parse_args()
+
+    result = run(args.movies, args.users, args.ratings, args.k, args.queries,
+                 args.memory_queries, args.eval_users, args.holdout, args.topics,
+                 args.als, args.content_index, args.seed)
+    report(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.tolerance,
+                                  args.latency_tolerance)
+        for line in regressions:
+            print("REGRESSION", line)
+        if regressions:
+            sys.exit(1)
+        print("✅ no regressions")
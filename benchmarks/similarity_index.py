@@ -0,0 +1,111 @@
+"""
+Similarity Index Benchmark
+--------------------------
+Recall@K and per-query latency of the IVF backend against exact search,
+for a sweep of probe counts.
+
+    python -m benchmarks.similarity_index --movies 50000 --probes 1 4 8 16
+    python -m benchmarks.similarity_index --published     # live content model
+
+Without --published a synthetic TF-IDF catalogue is generated: documents
+mix words from one or two of `--topics` topics plus background noise.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from recommendation.similarity_index import (
+    DEFAULT_COMPONENTS, ExactIndex, build_ivf, recall_at_k
+)
+
+
+def synthetic_vectors(n_movies, n_topics=200, vocabulary=20000, doc_words=60, seed=0):
+    from recommendation.preprocess import build_vectorizer
+
+    rng = np.random.default_rng(seed)
+    topic_words = rng.integers(0, vocabulary, size=(n_topics, 40))
+
+    documents = []
+    for _ in range(n_movies):
+        topics = rng.choice(n_topics, size=rng.integers(1, 3), replace=False)
+        words = np.concatenate([
+            rng.choice(topic_words[t], size=doc_words // len(topics)) for t in topics
+        ] + [rng.integers(0, vocabulary, size=doc_words // 4)])
+        documents.append(" ".join(f"w{w}" for w in words))
+
+    vectorizer = build_vectorizer()
+    return vectorizer.fit_transform(documents).tocsr().astype(np.float32)
+
+
+def published_vectors():
+    from recommendation.content_store import get_content_model
+
+    model = get_content_model()
+    if model is None:
+        raise SystemExit("No content model published; run train_content_model.py")
+    return model.vectors, model.ann_index
+
+
+def _timed(search, rows, k):
+    latencies, results = [], []
+    for row in rows:
+        start = time.perf_counter()
+        found, _ = search([row], k)
+        latencies.append(time.perf_counter() - start)
+        results.append(found[0])
+    return np.array(results), np.array(latencies) * 1000
+
+
+def run(vectors, k, probes, queries, ivf=None, n_components=DEFAULT_COMPONENTS,
+        n_lists=None, seed=0):
+    n = vectors.shape[0]
+    rows = np.random.default_rng(seed).choice(n, size=min(queries, n), replace=False)
+
+    if ivf is None:
+        start = time.perf_counter()
+        ivf = build_ivf(vectors, n_components=n_components, n_lists=n_lists, seed=seed)
+        print(f"IVF build: {time.perf_counter() - start:.1f}s, "
+              f"{len(ivf.centroids)} lists, {ivf.embeddings.shape[1]}-d")
+
+    exact = ExactIndex(vectors)
+    exact_rows, exact_ms = _timed(exact.search_rows, rows, k)
+
+    print(f"{'backend':<14} {'recall@' + str(k):>10} {'p50 ms':>8} {'p99 ms':>8}")
+    print(f"{'exact':<14} {1.0:>10.3f} "
+          f"{np.percentile(exact_ms, 50):>8.2f} {np.percentile(exact_ms, 99):>8.2f}")
+
+    results = []
+    for p in probes:
+        approx_rows, ms = _timed(
+            lambda r, k_: ivf.search_rows(r, k_, probes=p), rows, k
+        )
+        recall = recall_at_k(approx_rows, exact_rows)
+        results.append((p, recall, np.percentile(ms, 50), np.percentile(ms, 99)))
+        print(f"{f'ivf probes={p}':<14} {recall:>10.3f} "
+              f"{np.percentile(ms, 50):>8.2f} {np.percentile(ms, 99):>8.2f}")
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ANN recall/latency tradeoff")
+    parser.add_argument("--published", action="store_true")
+    parser.add_argument("--movies", type=int, default=20000)
+    parser.add_argument("--topics", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--components", type=int, default=DEFAULT_COMPONENTS)
+    parser.add_argument("--lists", type=int)
+    args = parser.parse_args()
+
+    if args.published:
+        vectors, ivf = published_vectors()
+    else:
+        print(f"Generating {args.movies} synthetic movies...")
+        vectors, ivf = synthetic_vectors(args.movies, args.topics), None
+
+    run(vectors, args.k, args.probes, args.queries, ivf=ivf,
+        n_components=args.components, n_lists=args.lists)
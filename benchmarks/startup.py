@@ -0,0 +1,121 @@
+"""
+Startup Benchmark
+-----------------
+Cold-start cost of a web worker, measured in fresh interpreters:
+
+  import      import backend.app
+  create_app  build the Flask app (no migrations)
+  first /me   first request through sessions + routes
+  first rec   first recommendation request (loads numpy/scipy on demand)
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --database-url postgresql://...
+
+Without --database-url a temporary SQLite catalogue is created and migrated.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+HEAVY_MODULES = ("numpy", "scipy", "sklearn", "pandas")
+PHASES = ("import", "create_app", "first /me", "first rec")
+
+# Runs in a fresh interpreter for every sample
+_WORKER = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import backend.app
+t1 = time.perf_counter()
+heavy_after_import = [m for m in HEAVY if m in sys.modules]
+app = backend.app.create_app()
+t2 = time.perf_counter()
+client = app.test_client()
+client.get("/me", base_url="https://bench")
+t3 = time.perf_counter()
+client.get(f"/recommend/crew/{SEED_TMDB_ID}", base_url="https://bench")
+t4 = time.perf_counter()
+print(json.dumps({
+    "import": t1 - t0, "create_app": t2 - t1,
+    "first /me": t3 - t2, "first rec": t4 - t3,
+    "heavy_after_import": heavy_after_import,
+}))
+"""
+
+_SETUP = r"""
+from backend.app import create_db_app
+from database.bulk import upsert_movies
+from database.db import db
+from database.migrate import migrate
+
+with create_db_app().app_context():
+    migrate()
+    upsert_movies([
+        {"tmdb_id": SEED_TMDB_ID + i, "title": f"Movie {i}", "genres": "Drama",
+         "director": f"Director {i % 50}", "cast": f"Actor {i % 300},Actor {i % 70}"}
+        for i in range(N_MOVIES)
+    ])
+    db.session.commit()
+"""
+
+SEED_TMDB_ID = 900000
+
+
+def _python(code, env):
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=env,
+        check=True, capture_output=True, text=True
+    )
+    return out.stdout
+
+
+def run(runs, database_url=None, n_movies=2000):
+    env = {**os.environ, "PYTHONPATH": ROOT, "AUTO_MIGRATE": "0"}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if database_url is None:
+            env["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+            env.setdefault("RECOMMENDATION_ARTIFACTS", os.path.join(tmp, "artifacts"))
+            env.setdefault("CREW_INDEX_PATH", os.path.join(tmp, "crew_index.pkl"))
+            _python(
+                _SETUP.replace("SEED_TMDB_ID", str(SEED_TMDB_ID))
+                .replace("N_MOVIES", str(n_movies)), env
+            )
+        else:
+            env["DATABASE_URL"] = database_url
+
+        worker = (
+            f"HEAVY = {HEAVY_MODULES!r}\nSEED_TMDB_ID = {SEED_TMDB_ID}\n" + _WORKER
+        )
+        samples = [
+            json.loads(_python(worker, env).strip().splitlines()[-1])
+            for _ in range(runs)
+        ]
+
+    return samples
+
+
+def report(samples):
+    print(f"{'phase':<12} {'median ms':>10} {'min ms':>10}")
+    for phase in PHASES:
+        values = [s[phase] * 1000 for s in samples]
+        print(f"{phase:<12} {statistics.median(values):>10.1f} {min(values):>10.1f}")
+
+    total = [sum(s[p] for p in PHASES[:3]) * 1000 for s in samples]
+    print(f"{'to /me':<12} {statistics.median(total):>10.1f} {min(total):>10.1f}")
+    print("heavy modules loaded by import:", samples[0]["heavy_after_import"] or "none")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure worker cold-start time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--database-url")
+    parser.add_argument("--movies", type=int, default=2000)
+    args = parser.parse_args()
+
+    report(run(args.runs, args.database_url, args.movies))
@@ -0,0 +1,75 @@
+"""
+Backfill franchise keys (and optionally TMDB collections) for existing rows.
+
+    python -m database.backfill_franchise                # keys only
+    python -m database.backfill_franchise --collections  # + TMDB lookups
+
+Keys are recomputed for every row, so rerun it whenever franchise_key()'s
+rules change (tests/test_franchise_key.py lists the title -> key cases).
+"""
+
+import argparse
+
+from backend.app import create_db_app
+from backend.tmdb_service import tmdb_get
+from database.db import db
+from database.migrate import migrate
+from database.models import Movie, franchise_key
+
+BATCH_SIZE = 500
+
+
+def backfill_keys():
+    updated = 0
+    last_id = 0
+
+    while True:
+        rows = db.session.query(Movie.id, Movie.title).filter(
+            Movie.id > last_id
+        ).order_by(Movie.id).limit(BATCH_SIZE).all()
+        if not rows:
+            break
+
+        db.session.execute(
+            db.update(Movie),
+            [{"id": mid, "franchise_key": franchise_key(title)} for mid, title in rows]
+        )
+        db.session.commit()
+
+        updated += len(rows)
+        last_id = rows[-1].id
+
+    return updated
+
+
+def backfill_collections():
+    updated = 0
+    movies = db.session.query(Movie.id, Movie.tmdb_id).filter(
+        Movie.collection_id.is_(None)
+    ).all()
+
+    for mid, tmdb_id in movies:
+        details = tmdb_get(f"/movie/{tmdb_id}")
+        collection = details.get("belongs_to_collection") or {}
+        if collection.get("id"):
+            db.session.execute(
+                db.update(Movie).where(Movie.id == mid).values(collection_id=collection["id"])
+            )
+            updated += 1
+
+    db.session.commit()
+    return updated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--collections", action="store_true",
+                        help="also fetch belongs_to_collection from TMDB")
+    args = parser.parse_args()
+
+    with create_db_app().app_context():
+        migrate()
+        print(f"Franchise keys set on {backfill_keys()} movies")
+        if args.collections:
+            print(f"Collections set on {backfill_collections()} movies")
+        print("✅ Franchise backfill complete")
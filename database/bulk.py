@@ -0,0 +1,100 @@
+"""
+Bulk Movie Upserts
+------------------
+Resolve a batch of TMDB results against the movies table in one IN query
+and insert the missing rows with one multi-row
+INSERT ... ON CONFLICT (tmdb_id) DO NOTHING (SQLite and Postgres).
+
+Callers own the transaction: nothing here commits.
+"""
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database.db import db
+from database.models import Movie, franchise_key
+
+# Stays well under SQLite's bound-parameter limit
+INSERT_CHUNK = 500
+
+MOVIE_COLUMNS = (
+    "tmdb_id", "title", "overview", "genres", "release_date", "runtime",
+    "language", "poster_path", "popularity", "director", "cast",
+    "franchise_key", "collection_id",
+)
+
+_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+
+def dialect_insert():
+    """INSERT construct with ON CONFLICT support for the bound database, or None."""
+    return _INSERTS.get(db.session.get_bind().dialect.name)
+
+
+def existing_tmdb_ids(tmdb_ids):
+    """Subset of ``tmdb_ids`` already stored, in one query."""
+    if not tmdb_ids:
+        return set()
+    return {
+        t for (t,) in db.session.query(Movie.tmdb_id)
+        .filter(Movie.tmdb_id.in_(set(tmdb_ids))).all()
+    }
+
+
+def _normalise(row):
+    values = {c: row.get(c) for c in MOVIE_COLUMNS}
+    values["title"] = values["title"] or ""
+    # Core inserts bypass Movie's title validator
+    values["franchise_key"] = values["franchise_key"] or franchise_key(values["title"])
+    return values
+
+
+def _insert_missing(rows):
+    insert = dialect_insert()
+
+    if insert is None:
+        # Other backends: plain ORM inserts
+        db.session.add_all(Movie(**row) for row in rows)
+        db.session.flush()
+        return
+
+    for start in range(0, len(rows), INSERT_CHUNK):
+        chunk = rows[start:start + INSERT_CHUNK]
+        db.session.execute(
+            insert(Movie).values(chunk).on_conflict_do_nothing(index_elements=["tmdb_id"])
+        )
+
+
+def upsert_movies(rows):
+    """
+    rows: iterable of dicts with at least tmdb_id and title.
+
+    Returns (movies, created):
+        movies:  {tmdb_id: Movie} for every input row
+        created: Movie rows inserted by this call
+    Existing rows are left untouched.
+    """
+    by_tmdb_id = {}
+    for row in rows:
+        by_tmdb_id.setdefault(row["tmdb_id"], row)
+
+    if not by_tmdb_id:
+        return {}, []
+
+    movies = {
+        m.tmdb_id: m
+        for m in Movie.query.filter(Movie.tmdb_id.in_(by_tmdb_id)).all()
+    }
+
+    missing = [_normalise(r) for t, r in by_tmdb_id.items() if t not in movies]
+    created = []
+    if missing:
+        _insert_missing(missing)
+        created = Movie.query.filter(
+            Movie.tmdb_id.in_([r["tmdb_id"] for r in missing])
+        ).all()
+        movies.update((m.tmdb_id, m) for m in created)
+
+    return movies, created
@@ -0,0 +1,351 @@
+"""
+TMDB Catalogue Ingestion
+------------------------
+Concurrent, resumable loader for the movies table.
+
+    python -m database.ingest full --from-year 1950 --to-year 2025
+    python -m database.ingest popular --pages 50
+    python -m database.ingest changes            # since the last sync
+
+Pipeline per window of listing pages:
+  1. fetch the listing pages concurrently
+  2. drop ids already stored (one IN query)
+  3. fetch details + credits for the rest concurrently
+     (one call each via append_to_response)
+  4. write the window with one bulk upsert and commit
+  5. record the window in the checkpoint file
+
+An interrupted run restarts from the first window not in the checkpoint.
+Detail fetches that still fail after DETAIL_ATTEMPTS tries are kept in
+the checkpoint ("failed_details") and retried at the start of every run,
+as inserts for new titles and refreshes for stored ones, so a transient
+TMDB error never drops a title for good. Ids TMDB answers with 404 are
+dropped instead of retried.
+
+"popular" checkpoints under popular:<date>, so a second run on the same
+day is a no-op; --restart walks the listing again.
+Listings stop at page 500 (10,000 titles), so "full" partitions the
+catalogue by release year and splits a year into months when it has more
+pages than that. A partition that is still over the cap is walked to
+page 500 and reported as truncated.
+"""
+
+import argparse
+import calendar
+import datetime
+import json
+import os
+
+from database.bulk import existing_tmdb_ids, upsert_movies
+from database.db import db
+from database.models import Movie, franchise_key
+from recommendation import crew_index
+
+DEFAULT_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "16"))
+DEFAULT_CHECKPOINT = os.getenv("INGEST_CHECKPOINT", "ingest_checkpoint.json")
+MAX_LISTING_PAGES = 500
+DETAIL_ATTEMPTS = 3
+CHANGES_WINDOW_DAYS = 14
+
+# Returned by the client for a 404, i.e. a title TMDB no longer has
+NOT_FOUND = {"status_code": 404}
+
+
+# -------------------------------------------------
+# Row mapping
+# -------------------------------------------------
+def extract_director_and_cast(credits):
+    director = None
+    cast_list = []
+
+    # Director
+    for person in credits.get("crew", []):
+        if person.get("job") == "Director":
+            director = person.get("name")
+            break
+
+    # Top 5 cast
+    for actor in credits.get("cast", [])[:5]:
+        cast_list.append(actor.get("name"))
+
+    return director, ",".join(cast_list)
+
+
+def movie_row(details):
+    """Movie column values from a /movie/{id}?append_to_response=credits body."""
+    director, cast = extract_director_and_cast(details.get("credits") or {})
+    return {
+        "tmdb_id": details["id"],
+        "title": details.get("title", ""),
+        "overview": details.get("overview"),
+        "genres": ",".join(g["name"] for g in details.get("genres", [])),
+        "release_date": details.get("release_date"),
+        "runtime": details.get("runtime"),
+        "language": details.get("original_language"),
+        "poster_path": details.get("poster_path"),
+        "popularity": details.get("popularity"),
+        "director": director,
+        "cast": cast,
+        "collection_id": (details.get("belongs_to_collection") or {}).get("id"),
+    }
+
+
+# -------------------------------------------------
+# Checkpoint
+# -------------------------------------------------
+class Checkpoint:
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path) as f:
+                self.state = json.load(f)
+        except (OSError, ValueError):
+            self.state = {}
+
+    def get(self, key, default=None):
+        return self.state.get(key, default)
+
+    def set(self, key, value):
+        self.state[key] = value
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def failed_ids(self):
+        return self.state.get("failed_details", [])
+
+    def set_failed(self, tmdb_ids):
+        self.set("failed_details", sorted(set(tmdb_ids)))
+
+
+# -------------------------------------------------
+# Stages
+# -------------------------------------------------
+def fetch_details(client, tmdb_ids, attempts=DETAIL_ATTEMPTS):
+    """
+    (rows, ids still failing after `attempts` rounds).
+    Ids TMDB answers with 404 are in neither.
+    """
+    rows, pending = [], list(tmdb_ids)
+    for _ in range(attempts):
+        if not pending:
+            break
+        bodies = client.get_many(
+            ((f"/movie/{t}", {"append_to_response": "credits"}) for t in pending),
+            not_found=NOT_FOUND,
+        )
+        rows.extend(movie_row(b) for b in bodies if b.get("id"))
+        pending = [t for t, b in zip(pending, bodies) if not b.get("id") and b is not NOT_FOUND]
+    return rows, pending
+
+
+def apply_rows(rows):
+    """Insert new titles and refresh stored ones; returns (created, updated) counts."""
+    movies, created = upsert_movies(rows)
+    created_ids = {m.tmdb_id for m in created}
+
+    changed = [
+        {"id": movies[r["tmdb_id"]].id, "franchise_key": franchise_key(r["title"]), **r}
+        for r in rows if r["tmdb_id"] not in created_ids
+    ]
+    if changed:
+        db.session.execute(db.update(Movie), changed)
+    return len(created), len(changed)
+
+
+def record_failed(checkpoint, failed, label):
+    """Keep ids whose details could not be fetched for retry_failed()."""
+    if failed:
+        checkpoint.set_failed(checkpoint.failed_ids() + failed)
+        print(f"  {label}: {len(failed)} detail fetches failed, kept for retry")
+
+
+def retry_failed(client, checkpoint):
+    """
+    Fetch the details that failed in earlier runs: new titles are inserted,
+    stored ones refreshed. An id leaves the list once it has been applied
+    or TMDB answers 404 for it. Returns (inserted, updated).
+    """
+    ids = checkpoint.failed_ids()
+    if not ids:
+        return 0, 0
+    rows, failed = fetch_details(client, ids)
+    inserted, updated = apply_rows(rows)
+    db.session.commit()
+    checkpoint.set_failed(failed)
+    print(f"  retried {len(ids)} failed ids: +{inserted}, ~{updated}, "
+          f"{len(failed)} still failing")
+    return inserted, updated
+
+
+def ingest_listing(client, path, params, checkpoint, key, concurrency,
+                   max_pages=MAX_LISTING_PAGES):
+    """
+    Walk one listing partition (path + params) window by window.
+    Returns the number of movies inserted.
+    """
+    done = checkpoint.get(key, 0)
+    if done == "complete":
+        return 0
+
+    total_pages = max_pages
+    page = done + 1
+    inserted = 0
+
+    while page <= total_pages:
+        window = range(page, min(page + concurrency, total_pages + 1))
+        listings = client.get_many((path, {**params, "page": p}) for p in window)
+
+        failed = [p for p, l in zip(window, listings) if "results" not in l]
+        if failed:
+            # Leave the checkpoint where it is; a rerun retries these pages
+            raise RuntimeError(f"TMDB listing fetch failed for {key} pages {failed}")
+
+        reported = max((l.get("total_pages") or 0 for l in listings), default=0)
+        if page == done + 1 and reported > max_pages and max_pages == MAX_LISTING_PAGES:
+            print(f"  {key}: TMDB reports {reported} pages, "
+                  f"only the first {MAX_LISTING_PAGES} are reachable; truncated")
+        total_pages = min(total_pages, reported)
+
+        ids = [m["id"] for l in listings for m in l.get("results", [])]
+        known = existing_tmdb_ids(ids)
+        new_ids = list(dict.fromkeys(t for t in ids if t not in known))
+
+        rows, failed = fetch_details(client, new_ids)
+        _, created = upsert_movies(rows)
+        db.session.commit()
+        inserted += len(created)
+
+        # Failures are recorded before the window is marked done
+        record_failed(checkpoint, failed, key)
+        page = window[-1] + 1
+        checkpoint.set(key, window[-1])
+        print(f"  {key}: pages {window[0]}-{window[-1]} of {total_pages}, +{len(created)}")
+
+    checkpoint.set(key, "complete")
+    return inserted
+
+
+def discover_partitions(client, checkpoint, year):
+    """
+    [(checkpoint key, params)] covering one release year: the whole year,
+    or one partition per month when the year has more than MAX_LISTING_PAGES.
+    """
+    key = f"discover:{year}"
+    params = {"primary_release_year": year, "sort_by": "popularity.desc"}
+    if checkpoint.get(key) is not None:
+        # Already walked (or started) as a whole year
+        return [(key, params)]
+
+    first = client.get("/discover/movie", {**params, "page": 1})
+    if "total_pages" not in first:
+        raise RuntimeError(f"TMDB listing fetch failed for {key} page 1")
+    if first["total_pages"] <= MAX_LISTING_PAGES:
+        return [(key, params)]
+
+    months = []
+    for month in range(1, 13):
+        last = calendar.monthrange(year, month)[1]
+        months.append((f"{key}-{month:02d}", {
+            "primary_release_date.gte": f"{year}-{month:02d}-01",
+            "primary_release_date.lte": f"{year}-{month:02d}-{last:02d}",
+            "sort_by": "popularity.desc",
+        }))
+    return months
+
+
+def ingest_full(client, checkpoint, from_year, to_year, concurrency):
+    inserted = 0
+    for year in range(to_year, from_year - 1, -1):
+        for key, params in discover_partitions(client, checkpoint, year):
+            inserted += ingest_listing(
+                client, "/discover/movie", params, checkpoint, key, concurrency
+            )
+    return inserted
+
+
+def ingest_popular(client, checkpoint, pages, concurrency, restart=False):
+    key = f"popular:{datetime.date.today().isoformat()}"
+    if restart:
+        checkpoint.set(key, 0)
+    return ingest_listing(
+        client, "/movie/popular", {}, checkpoint, key, concurrency,
+        max_pages=min(pages, MAX_LISTING_PAGES)
+    )
+
+
+def sync_changes(client, checkpoint, concurrency, since=None):
+    """Apply /movie/changes since the last sync: insert new titles, refresh known ones."""
+    today = datetime.date.today()
+    start = since or datetime.date.fromisoformat(
+        checkpoint.get("changes:last_date", (today - datetime.timedelta(days=1)).isoformat())
+    )
+    inserted = updated = 0
+
+    while start < today:
+        end = min(start + datetime.timedelta(days=CHANGES_WINDOW_DAYS), today)
+        params = {"start_date": start.isoformat(), "end_date": end.isoformat()}
+
+        first = client.get("/movie/changes", {**params, "page": 1})
+        pages = [first] + client.get_many(
+            ("/movie/changes", {**params, "page": p})
+            for p in range(2, (first.get("total_pages") or 1) + 1)
+        )
+        ids = list(dict.fromkeys(
+            c["id"] for p in pages for c in p.get("results", []) if not c.get("adult")
+        ))
+
+        for i in range(0, len(ids), concurrency * 20):
+            rows, failed = fetch_details(client, ids[i:i + concurrency * 20])
+            record_failed(checkpoint, failed, "changes")
+            created, changed = apply_rows(rows)
+            db.session.commit()
+
+            inserted += created
+            updated += changed
+
+        checkpoint.set("changes:last_date", end.isoformat())
+        print(f"  changes {params['start_date']}..{params['end_date']}: {len(ids)} ids")
+        start = end
+
+    return inserted, updated
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    from backend.app import create_db_app
+    from backend.tmdb_client import TMDBClient
+
+    parser = argparse.ArgumentParser(description="Load movies from TMDB")
+    parser.add_argument("mode", choices=("full", "popular", "changes"))
+    parser.add_argument("--from-year", type=int, default=1950)
+    parser.add_argument("--to-year", type=int, default=datetime.date.today().year)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--since", type=datetime.date.fromisoformat)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--restart", action="store_true",
+                        help="popular: walk today's listing again even if already done")
+    args = parser.parse_args()
+
+    client = TMDBClient(max_concurrency=args.concurrency)
+    checkpoint = Checkpoint(args.checkpoint)
+
+    with create_db_app().app_context():
+        retry_failed(client, checkpoint)
+        if args.mode == "full":
+            n = ingest_full(client, checkpoint, args.from_year, args.to_year, args.concurrency)
+            print(f"✅ Inserted {n} movies")
+        elif args.mode == "popular":
+            n = ingest_popular(client, checkpoint, args.pages, args.concurrency,
+                               restart=args.restart)
+            print(f"✅ Inserted {n} movies")
+        else:
+            n, u = sync_changes(client, checkpoint, args.concurrency, args.since)
+            print(f"✅ Inserted {n} and refreshed {u} movies")
+
+        crew_index.update_snapshot()
@@ -1,9 +1,8 @@
-from backend.app import create_app
-from database.db import db
-from database import models  # noqa: F401
+from backend.app import create_db_app
+from database.migrate import migrate
 
-app = create_app()
+app = create_db_app()
 
 with app.app_context():
-    db.create_all()
+    migrate()
     print("Database tables created successfully")
@@ -0,0 +1,159 @@
+"""
+Schema Migrations
+-----------------
+db.create_all() creates missing tables but never alters existing ones.
+Each step below brings an older SQLite/Postgres database up to the current
+models and is safe to run repeatedly.
+
+    python -m database.migrate
+"""
+
+import logging
+
+from sqlalchemy import inspect, text
+
+from database.db import db
+from database import models  # noqa: F401
+
+log = logging.getLogger(__name__)
+
+
+def _columns(conn, table):
+    return {c["name"] for c in inspect(conn).get_columns(table)}
+
+
+def _add_column(conn, table, name, ddl):
+    if name not in _columns(conn, table):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+
+
+def _has_index(conn, table, name):
+    return any(ix["name"] == name for ix in inspect(conn).get_indexes(table))
+
+
+def _create_index(conn, name, table, columns, unique=False):
+    # IF NOT EXISTS is understood by both SQLite and Postgres
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    conn.execute(text(
+        f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+    ))
+
+
+# -------------------------------------------------
+# Steps
+# -------------------------------------------------
+def movie_franchise_columns(conn):
+    _add_column(conn, "movies", "franchise_key", "VARCHAR(255)")
+    _add_column(conn, "movies", "collection_id", "INTEGER")
+    _create_index(conn, "ix_movies_franchise_key", "movies", ["franchise_key"])
+    _create_index(conn, "ix_movies_collection_id", "movies", ["collection_id"])
+
+
+def _dedupe(conn, table, columns):
+    """
+    Delete duplicate rows (keeping the oldest per `columns`) so a unique
+    index can be built; every deleted row is logged. Returns the deleted ids.
+    """
+    cols = ", ".join(columns)
+    rows = conn.execute(text(
+        f"SELECT id, {cols} FROM {table} WHERE id NOT IN "
+        f"(SELECT MIN(id) FROM {table} GROUP BY {cols}) ORDER BY id"
+    )).all()
+    if not rows:
+        return []
+
+    ids = [r[0] for r in rows]
+    log.warning("migrate: deleting %d duplicate %s rows before adding a unique index on (%s)",
+                len(ids), table, cols)
+    for row in rows:
+        log.warning("migrate:   %s id=%s %s", table, row[0],
+                    " ".join(f"{c}={v}" for c, v in zip(columns, row[1:])))
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        conn.execute(text(f"DELETE FROM {table} WHERE id IN ({', '.join(map(str, chunk))})"))
+    return ids
+
+
+def hot_lookup_indexes(conn):
+    for table in ("watchlist", "watched"):
+        name = f"uq_{table}_user_movie"
+        if not _has_index(conn, table, name):
+            _dedupe(conn, table, ["user_id", "movie_id"])
+            _create_index(conn, name, table, ["user_id", "movie_id"], unique=True)
+
+    _create_index(conn, "ix_reviews_movie_id_id", "reviews", ["movie_id", "id"])
+    conn.execute(text("DROP INDEX IF EXISTS ix_reviews_movie_id"))  # superseded
+    _create_index(conn, "ix_reviews_user_id_movie_id", "reviews", ["user_id", "movie_id"])
+    _create_index(conn, "ix_movies_popularity", "movies", ["popularity"])
+
+
+def rating_stats_backfill(conn):
+    # Table itself comes from create_all; fill it once from existing reviews
+    from database.rating_stats import rebuild_sql
+
+    has_stats = conn.execute(text("SELECT 1 FROM movie_rating_stats LIMIT 1")).first()
+    if not has_stats:
+        conn.execute(rebuild_sql())
+
+
+def movie_search_index(conn):
+    from database import search_index
+
+    if conn.dialect.name == "sqlite":
+        search_index.create_sqlite(conn)
+    elif conn.dialect.name == "postgresql":
+        search_index.create_postgres(conn)
+
+
+STEPS = [
+    movie_franchise_columns,
+    hot_lookup_indexes,
+    rating_stats_backfill,
+    movie_search_index,
+]
+
+
+def migrate():
+    db.create_all()
+    with db.engine.begin() as conn:
+        for step in STEPS:
+            step(conn)
+
+
+def missing_schema():
+    """Model tables / columns the database lacks, as "table" or "table.column"."""
+    inspector = inspect(db.engine)
+    tables = set(inspector.get_table_names())
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in tables:
+            missing.append(table.name)
+            continue
+        present = {c["name"] for c in inspector.get_columns(table.name)}
+        missing.extend(f"{table.name}.{c.name}" for c in table.columns if c.name not in present)
+    return missing
+
+
+def ensure_schema():
+    """
+    Boot-time check: an empty database is created and migrated; one that
+    predates the models fails fast instead of serving 500s.
+    """
+    missing = missing_schema()
+    if not missing:
+        return
+    if len(missing) == len(db.metadata.sorted_tables):
+        migrate()
+        return
+    raise RuntimeError(
+        "Database schema is out of date (missing: " + ", ".join(missing) + "). "
+        "Run 'python -m database.migrate' or start with AUTO_MIGRATE=1."
+    )
+
+
+if __name__ == "__main__":
+    from backend.app import create_db_app
+
+    with create_db_app().app_context():
+        migrate()
+        print("✅ Database schema is up to date")
@@ -1,7 +1,36 @@
+import re
+
 from database.db import db
 from werkzeug.security import generate_password_hash, check_password_hash
 
 
+_NUMERAL = r"(\d+|[ivx]+|one|two|three|four|five|six|seven|eight|nine|ten)"
+# "<base> part|chapter|vol|volume <numeral>", with a non-empty base
+_SEQUEL_PART = re.compile(rf"^(.+?)\s+(part|chapter|vol|volume)\s+{_NUMERAL}$")
+# "<base> <number>" only after a base of two or more words, so one-word
+# titles like "Malcolm X" or "Apollo 13" keep their numeral
+_SEQUEL_NUMBER = re.compile(r"^(\S+\s+\S+.*?)\s+(\d+|[ivx]+)$")
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def franchise_key(title):
+    """
+    Normalised base title shared by movies of one series:
+    "Toy Story 2" and "Toy Story: Part III (2019)" -> "toy story".
+    Series with one-word names ("Rocky II") are left to collection_id.
+    """
+    if not title:
+        return None
+
+    base = title.split(":")[0].split("(")[0].strip().lower()
+    base = _NON_WORD.sub(" ", base).strip()
+    for suffix in (_SEQUEL_PART, _SEQUEL_NUMBER):
+        match = suffix.match(base)
+        if match:
+            return match.group(1)
+    return base or None
+
+
 # ======================================================
 # USER
 # ======================================================
@@ -47,13 +76,22 @@ class Movie(db.Model):
     runtime = db.Column(db.Integer)
     language = db.Column(db.String(50))
     poster_path = db.Column(db.String(255))
-    popularity = db.Column(db.Float)
+    popularity = db.Column(db.Float, index=True)
 
     director = db.Column(db.String(255))
     cast = db.Column(db.Text)
 
+    # Franchise lookups are index point queries on one of these
+    franchise_key = db.Column(db.String(255), index=True)
+    collection_id = db.Column(db.Integer, index=True)  # TMDB belongs_to_collection
+
     reviews = db.relationship("Review", back_populates="movie", cascade="all, delete")
 
+    @db.validates("title")
+    def _set_franchise_key(self, key, title):
+        self.franchise_key = franchise_key(title)
+        return title
+
 
 # ======================================================
 # REVIEW
@@ -61,6 +99,11 @@ class Movie(db.Model):
 
 class Review(db.Model):
     __tablename__ = "reviews"
+    __table_args__ = (
+        # (movie_id, id) serves keyset pagination of a movie's reviews
+        db.Index("ix_reviews_movie_id_id", "movie_id", "id"),
+        db.Index("ix_reviews_user_id_movie_id", "user_id", "movie_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -74,12 +117,49 @@ class Review(db.Model):
     movie = db.relationship("Movie", back_populates="reviews")
 
 
+# ======================================================
+# RATING AGGREGATES
+# ======================================================
+
+RATING_SCALE = range(1, 6)
+
+
+class MovieRatingStats(db.Model):
+    """Per-movie review aggregates, maintained in the review write path."""
+    __tablename__ = "movie_rating_stats"
+
+    movie_id = db.Column(db.Integer, db.ForeignKey("movies.id"), primary_key=True)
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+
+    # Histogram, one column per star so updates stay single-row increments
+    stars_1 = db.Column(db.Integer, nullable=False, default=0)
+    stars_2 = db.Column(db.Integer, nullable=False, default=0)
+    stars_3 = db.Column(db.Integer, nullable=False, default=0)
+    stars_4 = db.Column(db.Integer, nullable=False, default=0)
+    stars_5 = db.Column(db.Integer, nullable=False, default=0)
+
+    @property
+    def mean(self):
+        return self.rating_sum / self.rating_count if self.rating_count else None
+
+    def to_dict(self):
+        return {
+            "count": self.rating_count,
+            "mean": round(self.mean, 2) if self.mean is not None else None,
+            "histogram": {str(s): getattr(self, f"stars_{s}") for s in RATING_SCALE},
+        }
+
+
 # ======================================================
 # WATCHLIST
 # ======================================================
 
 class Watchlist(db.Model):
     __tablename__ = "watchlist"
+    __table_args__ = (
+        db.Index("uq_watchlist_user_movie", "user_id", "movie_id", unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
@@ -95,6 +175,9 @@ class Watchlist(db.Model):
 
 class Watched(db.Model):
     __tablename__ = "watched"
+    __table_args__ = (
+        db.Index("uq_watched_user_movie", "user_id", "movie_id", unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
@@ -102,3 +185,32 @@ class Watched(db.Model):
 
     user = db.relationship("User", back_populates="watched")
     movie = db.relationship("Movie")
+
+
+# ======================================================
+# SESSIONS
+# ======================================================
+
+class SessionRecord(db.Model):
+    """Server-side session data for SESSION_BACKEND=sql."""
+    __tablename__ = "sessions"
+
+    sid = db.Column(db.String(64), primary_key=True)
+    data = db.Column(db.Text, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+# ======================================================
+# PRECOMPUTED FEEDS
+# ======================================================
+
+class UserFeed(db.Model):
+    """A user's stored top-N list per recommender (see recommendation/feeds.py)."""
+    __tablename__ = "user_feeds"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    kind = db.Column(db.String(20), primary_key=True)
+    movie_ids = db.Column(db.Text, nullable=False)  # "12,7,95", best first
+    # When the computation started; activity after this makes the feed stale
+    computed_at = db.Column(db.DateTime, nullable=False)
+    stale_since = db.Column(db.DateTime)
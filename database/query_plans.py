@@ -0,0 +1,87 @@
+"""
+Query-plan regression check for the hot lookups.
+
+Runs EXPLAIN for each query the request path depends on and exits non-zero
+if any of them would scan a whole table instead of using an index.
+
+    python -m database.query_plans      # against DATABASE_URL
+
+Postgres happily seq-scans tiny tables, so seq scans are disabled for the
+check: a plan that still scans means no usable index exists.
+"""
+
+import sys
+
+from sqlalchemy import func, select, text
+
+from database.db import db
+from database.models import Movie, Review, Watched, Watchlist
+
+
+def hot_queries():
+    return {
+        "watchlist by user+movie": select(Watchlist.id).where(
+            Watchlist.user_id == 1, Watchlist.movie_id == 1),
+        "watched by user+movie": select(Watched.id).where(
+            Watched.user_id == 1, Watched.movie_id == 1),
+        "watched by user": select(Watched.movie_id).where(Watched.user_id == 1),
+        "reviews by movie": select(Review.id).where(Review.movie_id == 1),
+        "reviews page": select(Review.id).where(
+            Review.movie_id == 1, Review.id < 100).order_by(Review.id.desc()).limit(20),
+        "reviews by user": select(Review.id).where(Review.user_id == 1),
+        "review version by user": select(func.count(Review.id), func.max(Review.id)).where(
+            Review.user_id == 1),
+        "watched version by user": select(func.count(Watched.id), func.max(Watched.id)).where(
+            Watched.user_id == 1),
+        "movie by tmdb_id": select(Movie.id).where(Movie.tmdb_id == 1),
+        "movies by franchise": select(Movie.id).where(Movie.franchise_key == "x"),
+        "movies by popularity": select(Movie.id).order_by(Movie.popularity.desc()).limit(10),
+    }
+
+
+def _plan(conn, stmt):
+    dialect = conn.dialect.name
+    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+
+    if dialect == "sqlite":
+        rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+        return [r[-1] for r in rows]
+
+    rows = conn.execute(text(f"EXPLAIN {sql}")).all()
+    return [r[0] for r in rows]
+
+
+def _scans(dialect, plan):
+    if dialect == "sqlite":
+        # "SCAN t" is a full scan; "SCAN t USING INDEX ..." walks an index
+        return [p for p in plan if p.startswith("SCAN ") and "USING" not in p]
+    return [p for p in plan if "Seq Scan" in p]
+
+
+def check():
+    """Return {query name: offending plan lines} for every regression."""
+    failures = {}
+    with db.engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SET enable_seqscan = off"))
+
+        for name, stmt in hot_queries().items():
+            plan = _plan(conn, stmt)
+            bad = _scans(conn.dialect.name, plan)
+            if bad:
+                failures[name] = plan
+    return failures
+
+
+if __name__ == "__main__":
+    from backend.app import create_db_app
+
+    with create_db_app().app_context():
+        failures = check()
+
+    for name, plan in failures.items():
+        print(f"❌ {name}: " + " | ".join(plan))
+
+    if failures:
+        sys.exit(1)
+    print("✅ Every hot query uses an index")
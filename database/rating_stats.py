@@ -0,0 +1,75 @@
+"""
+Per-movie rating aggregates (count, sum, 1-5 star histogram).
+
+apply_review() runs inside the caller's transaction, so the aggregate row
+commits or rolls back together with the review itself. Updates are
+single-row increments in SQL, never read-modify-write in Python.
+"""
+
+from sqlalchemy import text
+
+from database.bulk import dialect_insert
+from database.db import db
+from database.models import MovieRatingStats, RATING_SCALE
+
+STAR_COLUMNS = [f"stars_{s}" for s in RATING_SCALE]
+
+
+def _deltas(rating, sign):
+    deltas = {"rating_count": sign, "rating_sum": sign * rating}
+    if rating in RATING_SCALE:
+        deltas[f"stars_{rating}"] = sign
+    return deltas
+
+
+def apply_review(movie_id, rating, sign=1):
+    """Count one review in (sign=1) or out (sign=-1) of the movie's aggregates."""
+    rating = int(rating)
+    deltas = _deltas(rating, sign)
+    table = MovieRatingStats.__table__
+    insert = dialect_insert()
+
+    if sign > 0 and insert is not None:
+        row = {"movie_id": movie_id, "rating_count": 0, "rating_sum": 0,
+               **{c: 0 for c in STAR_COLUMNS}, **deltas}
+        db.session.execute(
+            insert(table).values(**row).on_conflict_do_update(
+                index_elements=["movie_id"],
+                set_={c: table.c[c] + d for c, d in deltas.items()}
+            )
+        )
+        return
+
+    updated = db.session.execute(
+        table.update().where(table.c.movie_id == movie_id)
+        .values({c: table.c[c] + d for c, d in deltas.items()})
+    ).rowcount
+
+    if not updated and sign > 0:
+        db.session.add(MovieRatingStats(
+            movie_id=movie_id, rating_count=0, rating_sum=0,
+            **{c: 0 for c in STAR_COLUMNS}, **deltas
+        ))
+
+
+def stats_for(movie_id):
+    stats = db.session.get(MovieRatingStats, movie_id)
+    if stats is None:
+        return MovieRatingStats(
+            movie_id=movie_id, rating_count=0, rating_sum=0,
+            **{c: 0 for c in STAR_COLUMNS}
+        ).to_dict()
+    return stats.to_dict()
+
+
+def rebuild_sql():
+    """INSERT ... SELECT that recomputes every aggregate from reviews."""
+    stars = ",\n".join(
+        f"SUM(CASE WHEN rating = {s} THEN 1 ELSE 0 END)" for s in RATING_SCALE
+    )
+    return text(
+        f"INSERT INTO movie_rating_stats "
+        f"(movie_id, rating_count, rating_sum, {', '.join(STAR_COLUMNS)}) "
+        f"SELECT movie_id, COUNT(*), SUM(rating),\n{stars}\n"
+        f"FROM reviews GROUP BY movie_id"
+    )
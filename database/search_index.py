@@ -0,0 +1,151 @@
+"""
+Local Full-Text Movie Search
+----------------------------
+Ranked keyword search over movies.title, overview, director and cast, so
+/search can answer (or pre-fill) without TMDB.
+
+  SQLite    FTS5 external-content table movies_fts, kept in step with the
+            movies table by triggers; ranked by bm25
+  Postgres  GIN expression index over a weighted tsvector; ranked by ts_rank
+
+Both are created by the movie_search_index migration step. Until it has
+run (or on other databases) queries fall back to a title LIKE ordered by
+popularity. Every query term is matched as a prefix, so partial words hit.
+"""
+
+import re
+
+from sqlalchemy import text
+
+from database.db import db
+
+FTS_TABLE = "movies_fts"
+FTS_COLUMNS = ("title", "overview", "director", "cast")
+# bm25 column weights, in FTS_COLUMNS order: a title hit outranks a plot hit
+BM25_WEIGHTS = (10.0, 1.0, 4.0, 3.0)
+
+# Must match the indexed expression exactly for Postgres to use the index
+PG_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(director, '') || ' ' || "
+    "coalesce(\"cast\", '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(overview, '')), 'C')"
+)
+PG_INDEX = "ix_movies_search_document"
+
+RESULT_COLUMNS = "m.id, m.tmdb_id, m.title, m.poster_path, m.popularity"
+
+_ready = set()
+
+
+def _terms(query):
+    # Words only: user input never reaches the MATCH / tsquery syntax
+    return re.findall(r"\w+", query.lower())
+
+
+def _quoted(columns):
+    return ", ".join(f'"{c}"' for c in columns)
+
+
+# -------------------------------------------------
+# Schema (see database/migrate.py)
+# -------------------------------------------------
+def create_sqlite(conn):
+    exists = conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+    ), {"name": FTS_TABLE}).first()
+
+    cols = _quoted(FTS_COLUMNS)
+    new = ", ".join(f'new."{c}"' for c in FTS_COLUMNS)
+    old = ", ".join(f'old."{c}"' for c in FTS_COLUMNS)
+
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"{cols}, content='movies', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2')"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON movies BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, {cols}) VALUES (new.id, {new}); END"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON movies BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {cols}) "
+        f"VALUES ('delete', old.id, {old}); END"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {cols} ON movies BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {cols}) "
+        f"VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {FTS_TABLE}(rowid, {cols}) VALUES (new.id, {new}); END"
+    ))
+
+    if not exists:
+        # Index the movies stored before the table existed
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def create_postgres(conn):
+    conn.execute(text(
+        f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON movies USING GIN (({PG_DOCUMENT}))"
+    ))
+
+
+# -------------------------------------------------
+# Queries
+# -------------------------------------------------
+def _fts_available():
+    bind = db.session.get_bind()
+    if bind.url in _ready:
+        return True
+    found = db.session.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+    ), {"name": FTS_TABLE}).first()
+    if found:
+        _ready.add(bind.url)
+    return found is not None
+
+
+def _search_sqlite(terms, limit):
+    weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+    return db.session.execute(text(
+        f"SELECT {RESULT_COLUMNS} FROM {FTS_TABLE} "
+        f"JOIN movies m ON m.id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH :match "
+        f"ORDER BY bm25({FTS_TABLE}, {weights}), m.popularity DESC LIMIT :limit"
+    ), {"match": " ".join(f'"{t}"*' for t in terms), "limit": limit})
+
+
+def _search_postgres(terms, limit):
+    return db.session.execute(text(
+        f"SELECT {RESULT_COLUMNS} FROM movies m, to_tsquery('english', :query) q "
+        f"WHERE ({PG_DOCUMENT}) @@ q "
+        f"ORDER BY ts_rank(({PG_DOCUMENT}), q) DESC, m.popularity DESC LIMIT :limit"
+    ), {"query": " & ".join(f"{t}:*" for t in terms), "limit": limit})
+
+
+def _search_like(terms, limit):
+    clauses = " AND ".join(f"lower(m.title) LIKE :t{i}" for i in range(len(terms)))
+    return db.session.execute(text(
+        f"SELECT {RESULT_COLUMNS} FROM movies m WHERE {clauses} "
+        f"ORDER BY m.popularity DESC LIMIT :limit"
+    ), {**{f"t{i}": f"%{t}%" for i, t in enumerate(terms)}, "limit": limit})
+
+
+def search_movies(query, limit=20):
+    """
+    Best local matches for `query`, best first, as dicts with
+    id, tmdb_id, title, poster_path and popularity.
+    """
+    terms = _terms(query)
+    if not terms:
+        return []
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "sqlite" and _fts_available():
+        rows = _search_sqlite(terms, limit)
+    elif dialect == "postgresql":
+        rows = _search_postgres(terms, limit)
+    else:
+        rows = _search_like(terms, limit)
+    return [dict(r._mapping) for r in rows]
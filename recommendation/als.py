@@ -0,0 +1,170 @@
+"""
+ALS Matrix Factorization
+------------------------
+Latent-factor collaborative model over the preference matrix of
+rating_matrix.py (ratings from Review, WATCHED_WEIGHT for watched-only).
+
+  implicit  confidence-weighted ALS (Hu, Koren & Volinsky): every movie is a
+            0/1 preference, observed ones weighted 1 + alpha · value
+  explicit  ALS on the observed values only, with weighted-λ regularisation
+
+Training (train_collaborative_model.py) publishes float32 user and item
+factors through the artifact store, so workers memory-map them. Scoring is
+one item_factors @ user_vector product plus top-K. Users missing from the
+published model are folded in from their current preferences by solving
+their row of the ALS problem against the fixed item factors.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from recommendation import artifact_store
+
+MODEL_NAME = "collaborative"
+RELOAD_CHECK_SECONDS = 30.0
+DEFAULT_FACTORS = 64
+DEFAULT_ITERATIONS = 15
+DEFAULT_REGULARIZATION = 0.1
+DEFAULT_ALPHA = 10.0
+
+
+# -------------------------------------------------
+# Solver
+# -------------------------------------------------
+def _solve_row(fixed, gram, cols, values, reg, alpha, implicit):
+    """Least-squares factor for one row given the other side's factors."""
+    factors = fixed[cols]
+    d = fixed.shape[1]
+
+    if implicit:
+        confidence = 1.0 + alpha * values
+        a = gram + (factors.T * (confidence - 1.0)) @ factors + reg * np.eye(d)
+        b = factors.T @ confidence
+    else:
+        a = factors.T @ factors + reg * max(len(cols), 1) * np.eye(d)
+        b = factors.T @ values
+
+    return np.linalg.solve(a, b)
+
+
+def _solve_side(matrix, fixed, reg, alpha, implicit):
+    """Re-solve every row of `matrix` (CSR) against `fixed` factors."""
+    fixed = np.asarray(fixed, dtype=np.float64)
+    gram = fixed.T @ fixed if implicit else None
+    out = np.zeros((matrix.shape[0], fixed.shape[1]), dtype=np.float64)
+
+    for row in range(matrix.shape[0]):
+        start, stop = matrix.indptr[row], matrix.indptr[row + 1]
+        if start == stop:
+            continue
+        out[row] = _solve_row(
+            fixed, gram, matrix.indices[start:stop], matrix.data[start:stop].astype(np.float64),
+            reg, alpha, implicit
+        )
+    return out
+
+
+def fit_als(preferences, factors=DEFAULT_FACTORS, iterations=DEFAULT_ITERATIONS,
+            reg=DEFAULT_REGULARIZATION, alpha=DEFAULT_ALPHA, implicit=True, seed=0):
+    """
+    Factorise a users × movies CSR matrix.
+    Returns (user_factors, item_factors) as contiguous float32 arrays.
+    """
+    preferences = preferences.tocsr()
+    by_item = preferences.T.tocsr()
+    rng = np.random.default_rng(seed)
+
+    items = rng.normal(0, 0.01, size=(preferences.shape[1], factors))
+    users = np.zeros((preferences.shape[0], factors))
+    for _ in range(iterations):
+        users = _solve_side(preferences, items, reg, alpha, implicit)
+        items = _solve_side(by_item, users, reg, alpha, implicit)
+
+    return (np.ascontiguousarray(users, dtype=np.float32),
+            np.ascontiguousarray(items, dtype=np.float32))
+
+
+# -------------------------------------------------
+# Published model
+# -------------------------------------------------
+class FactorModel:
+    def __init__(self, version, user_factors, item_factors, user_ids, movie_ids, meta):
+        self.version = version
+        self.user_factors = user_factors
+        self.item_factors = item_factors
+        self.movie_ids = movie_ids
+        self.meta = meta
+        self.implicit = meta.get("kind", "implicit") == "implicit"
+        self.user_index = {int(u): i for i, u in enumerate(user_ids)}
+        self.movie_index = {int(m): j for j, m in enumerate(movie_ids)}
+
+        items = np.asarray(item_factors, dtype=np.float64)
+        self._items = items
+        self._gram = items.T @ items
+
+    def fold_in(self, movie_ids, values):
+        """User vector for preferences the model was not trained on."""
+        cols = [self.movie_index.get(int(m)) for m in movie_ids]
+        keep = [i for i, c in enumerate(cols) if c is not None]
+        if not keep:
+            return None
+
+        vector = _solve_row(
+            self._items, self._gram, np.array([cols[i] for i in keep]),
+            np.asarray(values, dtype=np.float64)[keep],
+            self.meta["reg"], self.meta["alpha"], self.implicit
+        )
+        return vector.astype(np.float32)
+
+    def user_vector(self, user_id):
+        row = self.user_index.get(user_id)
+        return None if row is None else self.user_factors[row]
+
+    def scores(self, user_vector):
+        return self.item_factors @ user_vector
+
+
+def _load(version):
+    arrays, _, meta = artifact_store.load(MODEL_NAME, version)
+    return FactorModel(
+        version, arrays["user_factors"], arrays["item_factors"],
+        arrays["user_ids"], arrays["movie_ids"], meta
+    )
+
+
+_lock = threading.Lock()
+_model = None
+_next_check = 0.0
+
+
+def get_factor_model():
+    """Return the live FactorModel, or None when none is published."""
+    global _model, _next_check
+
+    now = time.monotonic()
+    if now < _next_check:
+        return _model
+
+    with _lock:
+        if now < _next_check:
+            return _model
+
+        version = artifact_store.current_version(MODEL_NAME)
+        if version is None:
+            _model = None
+        elif _model is None or _model.version != version:
+            try:
+                _model = _load(version)
+            except (OSError, ValueError, KeyError):
+                pass  # keep serving the previous model
+
+        _next_check = now + RELOAD_CHECK_SECONDS
+        return _model
+
+
+def reset():
+    global _model, _next_check
+    with _lock:
+        _model, _next_check = None, 0.0
@@ -0,0 +1,124 @@
+"""
+Versioned Artifact Store
+------------------------
+Training scripts publish immutable, versioned artifact directories:
+
+    artifacts/<model>/<version>/<name>.npy   raw NumPy arrays (mmap-able)
+    artifacts/<model>/<version>/<name>.pkl   pickled helpers (vectorizers)
+    artifacts/<model>/<version>/meta.json    shapes, parameters, timestamps
+    artifacts/<model>/CURRENT                name of the live version
+
+A version is written under a temporary name and renamed into place, then
+CURRENT is swapped atomically, so readers never see a half-written model.
+Arrays are opened with ``mmap_mode="r"``: every forked gunicorn worker maps
+the same page-cache pages read-only instead of holding a private copy.
+"""
+
+import json
+import os
+import pickle
+import shutil
+import time
+
+import numpy as np
+
+# -------------------------------------------------
+# Resolve artifact path safely (local + Render)
+# -------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ARTIFACT_PATH = os.getenv(
+    "RECOMMENDATION_ARTIFACTS",
+    os.path.join(BASE_DIR, "recommendation", "artifacts")
+)
+
+CURRENT_FILE = "CURRENT"
+META_FILE = "meta.json"
+
+
+def model_dir(model):
+    return os.path.join(ARTIFACT_PATH, model)
+
+
+def current_version(model):
+    """Return the published version name, or None if nothing is published."""
+    try:
+        with open(os.path.join(model_dir(model), CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def publish(model, arrays, objects=None, meta=None, keep=3):
+    """
+    Write a new version of ``model`` and make it current.
+
+    arrays:  dict[str, np.ndarray] saved as raw .npy files
+    objects: dict[str, object] pickled alongside the arrays
+    meta:    JSON-serialisable dict stored as meta.json
+    """
+    root = model_dir(model)
+    os.makedirs(root, exist_ok=True)
+
+    # Microseconds keep back-to-back publishes from one process distinct
+    now = time.time()
+    version = time.strftime("%Y%m%d%H%M%S", time.localtime(now)) + \
+        f"{int(now * 1e6) % 1000000:06d}-{os.getpid()}"
+    tmp_dir = os.path.join(root, f".{version}.tmp")
+    os.makedirs(tmp_dir)
+
+    for name, arr in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(arr))
+
+    for name, obj in (objects or {}).items():
+        with open(os.path.join(tmp_dir, f"{name}.pkl"), "wb") as f:
+            pickle.dump(obj, f)
+
+    meta = dict(meta or {})
+    meta.update(version=version, published_at=time.time())
+    with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+        json.dump(meta, f)
+
+    os.rename(tmp_dir, os.path.join(root, version))
+
+    pointer_tmp = os.path.join(root, f".{CURRENT_FILE}.{os.getpid()}")
+    with open(pointer_tmp, "w") as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(root, CURRENT_FILE))
+
+    _prune(root, keep)
+    return version
+
+
+def _prune(root, keep):
+    # Old versions stay on disk for a while: workers that mapped them keep
+    # reading until their next reload check, and unlinked mmaps stay valid.
+    versions = sorted(
+        d for d in os.listdir(root)
+        if not d.startswith(".") and os.path.isdir(os.path.join(root, d))
+    )
+    for old in versions[:-keep]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+
+
+def load(model, version):
+    """
+    Open a published version.
+
+    Returns (arrays, objects, meta); arrays are read-only memory maps.
+    """
+    path = os.path.join(model_dir(model), version)
+
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+
+    arrays, objects = {}, {}
+    for filename in os.listdir(path):
+        name, ext = os.path.splitext(filename)
+        full = os.path.join(path, filename)
+        if ext == ".npy":
+            arrays[name] = np.load(full, mmap_mode="r")
+        elif ext == ".pkl":
+            with open(full, "rb") as f:
+                objects[name] = pickle.load(f)
+
+    return arrays, objects, meta
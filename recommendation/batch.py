@@ -0,0 +1,163 @@
+"""
+Batch Scoring
+-------------
+Shared plumbing for the *_batch recommenders, which take arrays of movie
+or user ids and return top-K matrices:
+
+    ids    int32   [n, K]  recommended movie ids, best first, -1 padded
+    scores float32 [n, K]  the recommender's own scores, 0 padded
+
+    content        content_based.recommend_similar_movies_batch(movie_ids)
+    crew           crew_based.recommend_by_crew_batch(movie_ids)
+    franchise      franchise.recommend_by_franchise_batch(movie_ids)
+    collaborative  collaborative.recommend_collaborative_batch(user_ids)
+    hybrid         hybrid.hybrid_recommendation_batch(movie_ids, user_ids)
+
+Each scores a block of seeds with one matrix product. With workers > 1 the
+blocks are spread over a process pool; every worker opens its own app
+context and loads its own models (artifacts are memory-mapped, so their
+pages are shared). Meant for offline jobs, not request handlers:
+
+    python -m recommendation.batch content --top-n 20 --workers 4 --out similar.npz
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.util import Finalize
+
+import numpy as np
+
+DEFAULT_BLOCK_SIZE = 256
+
+# name -> (module, function, seeds: "movie" | "user")
+BATCH_FUNCTIONS = {
+    "content": ("recommendation.content_based", "recommend_similar_movies_batch", "movie"),
+    "crew": ("recommendation.crew_based", "recommend_by_crew_batch", "movie"),
+    "franchise": ("recommendation.franchise", "recommend_by_franchise_batch", "movie"),
+    "collaborative": ("recommendation.collaborative", "recommend_collaborative_batch", "user"),
+    "hybrid": ("recommendation.hybrid", "hybrid_recommendation_batch", "user"),
+}
+
+
+def empty_result(n, k):
+    return np.full((n, k), -1, dtype=np.int32), np.zeros((n, k), dtype=np.float32)
+
+
+def in_blocks(items, block_size):
+    for start in range(0, len(items), block_size):
+        yield items[start:start + block_size]
+
+
+def get_batch_function(name):
+    import importlib
+
+    module, function, _ = BATCH_FUNCTIONS[name]
+    return getattr(importlib.import_module(module), function)
+
+
+# -------------------------------------------------
+# Process pool
+# -------------------------------------------------
+_worker_context = None
+
+
+def _close_worker():
+    global _worker_context
+    from database.db import db
+
+    if _worker_context is not None:
+        db.session.remove()
+        _worker_context.pop()
+        _worker_context = None
+
+
+def _init_worker():
+    global _worker_context
+    from backend.app import create_db_app
+
+    # Held for the life of the worker process, popped when it exits
+    _worker_context = create_db_app().app_context()
+    _worker_context.push()
+    Finalize(None, _close_worker, exitpriority=10)
+
+
+def _score_block(name, seeds, top_n, block_size, options):
+    return get_batch_function(name)(seeds, top_n=top_n, block_size=block_size, **options)
+
+
+def run_parallel(name, seeds, top_n, block_size=DEFAULT_BLOCK_SIZE, workers=None,
+                 **options):
+    """
+    Score `seeds` with the `name` batch function across worker processes.
+    `options` are passed on to it (e.g. similarity, method), so the workers
+    score exactly as the in-process call would.
+    """
+    workers = workers or os.cpu_count()
+    ids, scores = empty_result(len(seeds), top_n)
+    # A few blocks per worker keeps the pool busy without tiny tasks
+    chunk = max(block_size, -(-len(seeds) // (workers * 4)))
+
+    # spawn: forked children would inherit the parent's DB connections
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker) as pool:
+        starts = range(0, len(seeds), chunk)
+        futures = [
+            pool.submit(_score_block, name, seeds[start:start + chunk], top_n, block_size,
+                        options)
+            for start in starts
+        ]
+        for start, future in zip(starts, futures):
+            block_ids, block_scores = future.result()
+            ids[start:start + len(block_ids)] = block_ids
+            scores[start:start + len(block_ids)] = block_scores
+
+    return ids, scores
+
+
+# -------------------------------------------------
+# Offline CLI
+# -------------------------------------------------
+def all_seeds(kind):
+    from database.db import db
+    from database.models import Movie
+    from recommendation.feeds import active_user_ids
+
+    if kind == "user":
+        return np.asarray(active_user_ids(), dtype=np.int64)
+    return np.asarray([m for (m,) in db.session.query(Movie.id).order_by(Movie.id)],
+                      dtype=np.int64)
+
+
+def score_all(name, top_n=10, block_size=DEFAULT_BLOCK_SIZE, workers=None):
+    """(seeds, ids, scores) for every movie or active user."""
+    seeds = all_seeds(BATCH_FUNCTIONS[name][2])
+    fn = get_batch_function(name)
+    ids, scores = fn(seeds, top_n=top_n, block_size=block_size, workers=workers)
+    return seeds, ids, scores
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score every movie or user in bulk")
+    parser.add_argument("recommender", choices=sorted(BATCH_FUNCTIONS))
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE)
+    parser.add_argument("--workers", type=int, help="process pool size (default: in-process)")
+    parser.add_argument("--out", help="write seeds/ids/scores to this .npz file")
+    args = parser.parse_args()
+
+    from backend.app import create_db_app
+
+    with create_db_app().app_context():
+        started = time.perf_counter()
+        seeds, ids, scores = score_all(
+            args.recommender, args.top_n, args.block_size, args.workers
+        )
+        elapsed = time.perf_counter() - started
+
+    if args.out:
+        np.savez(args.out, seeds=seeds, ids=ids, scores=scores)
+    print(f"✅ {len(seeds)} {args.recommender} lists in {elapsed:.1f}s "
+          f"({len(seeds) / max(elapsed, 1e-9):.0f}/s)")
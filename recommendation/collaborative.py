@@ -2,42 +2,233 @@
 User-Based Collaborative Filtering
 ----------------------------------
 Uses ratings + watch history.
+
+Neighbours and scores are sparse products over the process-wide
+user × movie matrix (see rating_matrix.py). Similarity modes:
+- "overlap": number of shared movies (the original heuristic)
+- "cosine":  cosine of preference vectors
+- "pearson": cosine of mean-centred preference vectors
+
+COLLABORATIVE_METHOD=als scores with the trained factor model instead
+(see als.py), falling back to neighbours while none is published.
+
+recommend_collaborative_batch scores a block of users at a time: one
+(block × users) similarity product, one (block × movies) score product.
 """
 
-from database.models import Review
-from collections import defaultdict
+import os
+
+import numpy as np
+from scipy import sparse
+
+from recommendation.als import get_factor_model
+from recommendation.batch import empty_result, in_blocks, run_parallel
+from recommendation.neighbours import top_k_from_scores
+from recommendation.rating_matrix import get_rating_matrix
+
+SIMILARITIES = ("overlap", "cosine", "pearson")
+DEFAULT_SIMILARITY = os.getenv("COLLABORATIVE_SIMILARITY", "overlap")
+METHODS = ("neighbours", "als")
+DEFAULT_METHOD = os.getenv("COLLABORATIVE_METHOD", "neighbours")
+
+
+def _binary(preferences):
+    b = preferences.copy()
+    b.data = np.ones_like(b.data)
+    return b
+
+
+def _row_normalised(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms).astype(np.float32) @ matrix
+
+
+def _mean_centred(preferences):
+    centred = preferences.copy()
+    counts = np.diff(centred.indptr)
+    sums = np.asarray(centred.sum(axis=1)).ravel()
+    means = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+    centred.data = centred.data - np.repeat(means, counts).astype(np.float32)
+    return _row_normalised(centred)
+
+
+_BUILDERS = {
+    "overlap": _binary,
+    "cosine": _row_normalised,
+    "pearson": _mean_centred,
+}
+
+
+def user_similarities(matrix, row, similarity=DEFAULT_SIMILARITY):
+    """Similarity of user ``row`` to every user, as a dense vector."""
+    if similarity not in _BUILDERS:
+        raise ValueError(f"similarity must be one of {SIMILARITIES}")
+
+    features = matrix.derived(similarity, _BUILDERS[similarity])
+    return np.asarray((features @ features[row].T).todense()).ravel()
+
+
+def _recommend_als(model, user_id, top_n):
+    matrix = get_rating_matrix()
+    row = matrix.user_index.get(user_id)
+
+    seen_ids, values = [], []
+    if row is not None:
+        preferences = matrix.preferences()[row]
+        seen_ids = [matrix.movie_ids[c] for c in preferences.indices]
+        values = preferences.data
+
+    vector = model.user_vector(user_id)
+    if vector is None:
+        # Not in the trained model: fold in from current preferences
+        vector = model.fold_in(seen_ids, values) if len(seen_ids) else None
+        if vector is None:
+            return []
 
+    scores = model.scores(vector).reshape(1, -1)
+    seen = [model.movie_index[m] for m in seen_ids if m in model.movie_index]
+    if seen:
+        scores = np.array(scores)
+        scores[0, seen] = -np.inf
 
-def recommend_collaborative(user_id, top_n=10):
-    # Movies rated by target user
-    user_reviews = Review.query.filter_by(user_id=user_id).all()
-    user_movies = {r.movie_id for r in user_reviews}
+    cols, _ = top_k_from_scores(scores, top_n)
+    return [int(model.movie_ids[c]) for c in cols[0] if c >= 0]
 
-    if not user_movies:
+
+def recommend_collaborative(user_id, top_n=10, similarity=DEFAULT_SIMILARITY,
+                            n_neighbours=5, method=DEFAULT_METHOD):
+    if method == "als":
+        model = get_factor_model()
+        if model is not None:
+            return _recommend_als(model, user_id, top_n)
+
+    matrix = get_rating_matrix()
+    row = matrix.user_index.get(user_id)
+    if row is None:
+        return []
+
+    preferences = matrix.preferences()
+    seen = preferences[row].indices
+    if len(seen) == 0:
         return []
 
     # Find similar users
-    similar_users = defaultdict(int)
+    sims = user_similarities(matrix, row, similarity).reshape(1, -1)
+    neighbours, weights = top_k_from_scores(sims, n_neighbours, exclude=np.array([row]))
+    keep = neighbours[0] >= 0
+    neighbours, weights = neighbours[0][keep], weights[0][keep]
+    if len(neighbours) == 0:
+        return []
+
+    # "overlap" keeps the plain sum of neighbour ratings
+    if similarity == "overlap":
+        weights = np.ones_like(weights)
+
+    scores = (sparse.csr_matrix(weights) @ preferences[neighbours]).toarray()
+    scores[0, seen] = 0
+
+    cols, _ = top_k_from_scores(scores, top_n)
+    return [matrix.movie_ids[c] for c in cols[0] if c >= 0]
+
+
+# -------------------------------------------------
+# Batch scoring
+# -------------------------------------------------
+def _als_block(model, matrix, preferences, user_ids, top_n):
+    vectors = np.zeros((len(user_ids), model.item_factors.shape[1]), dtype=np.float32)
+    # Rating-matrix column -> factor-model column (-1 when not trained on)
+    to_model = np.array([model.movie_index.get(m, -1) for m in matrix.movie_ids], dtype=np.int64)
+    seen_rows, seen_cols = [], []
 
-    all_reviews = Review.query.all()
-    for r in all_reviews:
-        if r.movie_id in user_movies and r.user_id != user_id:
-            similar_users[r.user_id] += 1
+    for i, user_id in enumerate(user_ids):
+        row = matrix.user_index.get(int(user_id))
+        cols, values = np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+        if row is not None:
+            prefs = preferences[row]
+            cols, values = prefs.indices, prefs.data
 
-    top_users = sorted(
-        similar_users, key=similar_users.get, reverse=True
-    )[:5]
+        vector = model.user_vector(int(user_id))
+        if vector is None and len(cols):
+            vector = model.fold_in([matrix.movie_ids[c] for c in cols], values)
+        if vector is None:
+            continue
+        vectors[i] = vector
 
-    recommendations = defaultdict(int)
+        mapped = to_model[cols]
+        mapped = mapped[mapped >= 0]
+        seen_rows.extend([i] * len(mapped))
+        seen_cols.extend(mapped.tolist())
 
-    for u in top_users:
-        reviews = Review.query.filter_by(user_id=u).all()
-        for r in reviews:
-            if r.movie_id not in user_movies:
-                recommendations[r.movie_id] += r.rating
+    scores = vectors @ np.asarray(model.item_factors).T
+    scores[seen_rows, seen_cols] = -np.inf
+    # Users with no vector score 0 everywhere and come back empty
+    cols, vals = top_k_from_scores(scores, top_n)
+    return np.where(cols >= 0, np.asarray(model.movie_ids)[np.maximum(cols, 0)], -1), vals
 
-    sorted_movies = sorted(
-        recommendations, key=recommendations.get, reverse=True
+
+def _neighbour_block(matrix, preferences, rows, similarity, n_neighbours, top_n):
+    features = matrix.derived(similarity, _BUILDERS[similarity])
+    sims = np.asarray((features[rows] @ features.T).todense())
+    neighbours, weights = top_k_from_scores(sims, n_neighbours, exclude=rows)
+
+    if similarity == "overlap":
+        weights = (neighbours >= 0).astype(np.float32)
+
+    # Block × users weight matrix, one row per seed user's neighbours
+    keep = neighbours >= 0
+    mixing = sparse.csr_matrix(
+        (weights[keep], (np.nonzero(keep)[0], neighbours[keep])),
+        shape=(len(rows), preferences.shape[0])
     )
+    scores = (mixing @ preferences).toarray()
+
+    seen = preferences[rows]
+    scores[np.repeat(np.arange(len(rows)), np.diff(seen.indptr)), seen.indices] = 0
+    cols, vals = top_k_from_scores(scores, top_n)
+    movie_ids = np.asarray(matrix.movie_ids)
+    return np.where(cols >= 0, movie_ids[np.maximum(cols, 0)], -1), vals
+
+
+def recommend_collaborative_batch(user_ids, top_n=10, similarity=DEFAULT_SIMILARITY,
+                                  n_neighbours=5, method=DEFAULT_METHOD,
+                                  block_size=256, workers=None):
+    """
+    recommend_collaborative for many users: (ids int32 [n, top_n], scores
+    float32 [n, top_n]), -1 / 0 padded for users with nothing to recommend.
+    """
+    if similarity not in _BUILDERS:
+        raise ValueError(f"similarity must be one of {SIMILARITIES}")
+
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    if workers and workers > 1:
+        return run_parallel("collaborative", user_ids, top_n, block_size, workers,
+                            similarity=similarity, n_neighbours=n_neighbours, method=method)
+
+    ids, scores = empty_result(len(user_ids), top_n)
+    matrix = get_rating_matrix()
+    preferences = matrix.preferences()
+
+    model = get_factor_model() if method == "als" else None
+    if model is not None:
+        for block in in_blocks(np.arange(len(user_ids)), block_size):
+            ids[block], scores[block] = _als_block(
+                model, matrix, preferences, user_ids[block], top_n
+            )
+        return ids, scores
+
+    # Users with no row or no preferences get nothing, as in the single form
+    positions = [
+        (i, matrix.user_index[int(u)]) for i, u in enumerate(user_ids)
+        if int(u) in matrix.user_index
+    ]
+    positions = [(i, row) for i, row in positions
+                 if preferences.indptr[row + 1] > preferences.indptr[row]]
 
-    return sorted_movies[:top_n]
\ No newline at end of file
+    for block in in_blocks(positions, block_size):
+        out = np.array([i for i, _ in block])
+        rows = np.array([row for _, row in block])
+        ids[out], scores[out] = _neighbour_block(
+            matrix, preferences, rows, similarity, n_neighbours, top_n
+        )
+    return ids, scores
@@ -1,50 +1,108 @@
-import os
-import pickle
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 
-# -------------------------------------------------
-# Resolve artifact path safely (local + Render)
-# -------------------------------------------------
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-ARTIFACT_PATH = os.path.join(BASE_DIR, "recommendation", "artifacts")
+from database.models import Movie
+from recommendation.batch import empty_result, in_blocks, run_parallel
+from recommendation.content_store import get_content_model
+from recommendation.preprocess import movie_text
 
 
-def load_artifacts():
-    vectors_path = os.path.join(ARTIFACT_PATH, "movie_vectors.pkl")
-    ids_path = os.path.join(ARTIFACT_PATH, "movie_ids.pkl")
+def _score_online(model, top_n, query_vec=None, row=None):
+    # Exact or approximate, per CONTENT_INDEX_BACKEND
+    index = model.similarity_index()
+    if row is None:
+        rows, _ = index.search(query_vec, top_n)
+    else:
+        rows, _ = index.search_rows([row], top_n)
+    return [int(model.movie_ids[i]) for i in rows[0] if i >= 0]
 
-    if not os.path.exists(vectors_path) or not os.path.exists(ids_path):
-        # Fail safely — NEVER crash the server
-        return None, None
 
-    with open(vectors_path, "rb") as f:
-        movie_vectors = pickle.load(f)
+def _vectorize_new_movie(model, movie_id):
+    # Movie inserted after the last training run
+    if model.vectorizer is None:
+        return None
 
-    with open(ids_path, "rb") as f:
-        movie_ids = pickle.load(f)
+    movie = Movie.query.get(movie_id)
+    if not movie:
+        return None
 
-    return movie_vectors, movie_ids
+    query_vec = model.vectorizer.transform([movie_text(movie)])
+    if query_vec.nnz == 0:
+        return None
+    return model.embed(query_vec)
 
 
 # -------------------------------------------------
 # ✅ THIS is the function your app imports
 # -------------------------------------------------
 def recommend_similar_movies(movie_id, top_n=10):
-    movie_vectors, movie_ids = load_artifacts()
+    model = get_content_model()
 
     # Fail-safe fallback
-    if movie_vectors is None or movie_ids is None:
+    if model is None:
         return []
 
-    if movie_id not in movie_ids:
-        return []
+    idx = model.row_of(movie_id)
+
+    if idx is None:
+        query_vec = _vectorize_new_movie(model, movie_id)
+        if query_vec is None:
+            return []
+        return _score_online(model, top_n, query_vec=query_vec)
+
+    # O(K) answer from the precomputed neighbour table
+    if model.neighbour_ids is not None and top_n <= model.neighbour_ids.shape[1]:
+        neighbours = model.neighbour_ids[idx, :top_n]
+        return [int(m) for m in neighbours if m >= 0]
+
+    return _score_online(model, top_n, row=idx)
+
+
+# -------------------------------------------------
+# Batch scoring
+# -------------------------------------------------
+def recommend_similar_movies_batch(movie_ids, top_n=10, block_size=256, workers=None):
+    """
+    recommend_similar_movies for many seeds at once.
+
+    Returns (ids int32 [n, top_n], scores float32 [n, top_n]), one row per
+    seed, -1 / 0 padded. Seeds in the neighbour table are one fancy-index
+    lookup; the rest are scored a block of seeds at a time, and movies newer
+    than the model are vectorised together from one query.
+    """
+    movie_ids = np.asarray(movie_ids, dtype=np.int64)
+    if workers and workers > 1:
+        return run_parallel("content", movie_ids, top_n, block_size, workers)
+
+    ids, scores = empty_result(len(movie_ids), top_n)
+    model = get_content_model()
+    if model is None or not len(movie_ids):
+        return ids, scores
 
-    idx = movie_ids.index(movie_id)
-    query_vec = movie_vectors[idx].reshape(1, -1)
+    rows = [model.row_of(int(m)) for m in movie_ids]
+    known = np.array([i for i, r in enumerate(rows) if r is not None], dtype=np.int64)
+    unknown = [i for i, r in enumerate(rows) if r is None]
+    model_rows = np.array([rows[i] for i in known], dtype=np.int64)
+    table = model.neighbour_ids
 
-    similarities = cosine_similarity(query_vec, movie_vectors)[0]
+    if table is not None and top_n <= table.shape[1]:
+        ids[known] = table[model_rows, :top_n]
+        scores[known] = model.neighbour_scores[model_rows, :top_n]
+    else:
+        index = model.similarity_index()
+        for block in in_blocks(np.arange(len(known)), block_size):
+            found, sims = index.search_rows(model_rows[block], top_n)
+            ids[known[block]] = np.where(found >= 0, model.movie_ids[np.maximum(found, 0)], -1)
+            scores[known[block]] = sims
 
-    similar_indices = similarities.argsort()[::-1][1 : top_n + 1]
+    if len(unknown) and model.vectorizer is not None:
+        movies = {m.id: m for m in Movie.query.filter(Movie.id.in_(movie_ids[unknown].tolist()))}
+        unknown = [i for i in unknown if int(movie_ids[i]) in movies]
+        if unknown:
+            queries = model.embed(model.vectorizer.transform(
+                [movie_text(movies[int(movie_ids[i])]) for i in unknown]
+            ))
+            found, sims = model.similarity_index().search(queries, top_n)
+            ids[unknown] = np.where(found >= 0, model.movie_ids[np.maximum(found, 0)], -1)
+            scores[unknown] = sims
 
-    return [movie_ids[i] for i in similar_indices]
+    return ids, scores
@@ -0,0 +1,169 @@
+"""
+Content Model Store
+-------------------
+Process-wide holder for the content-based model.
+
+The model is loaded once per worker on first use and shared by every
+request. The TF-IDF matrix is rebuilt from memory-mapped CSR arrays, so
+forked workers share its pages read-only. When train_content_model.py
+publishes a new version, the next lookup after RELOAD_CHECK_SECONDS swaps
+the model in without a restart.
+
+Models trained with --svd hold dense, L2-normalised float32 embeddings
+(embeddings.npy) instead of TF-IDF rows, plus the SVD projection that maps
+a TF-IDF vector into that space.
+
+Similarity search goes through recommendation.similarity_index: the exact
+backend is always available, the IVF backend when training published one.
+"""
+
+import os
+import pickle
+import threading
+import time
+
+import numpy as np
+from scipy import sparse
+
+from recommendation import artifact_store
+from recommendation.preprocess import l2_normalise
+from recommendation.similarity_index import INDEX_BACKEND, ExactIndex, IVFIndex
+
+MODEL_NAME = "content"
+RELOAD_CHECK_SECONDS = float(os.getenv("CONTENT_MODEL_RELOAD_SECONDS", "5"))
+
+
+class ContentModel:
+    def __init__(self, version, vectors, movie_ids, vectorizer=None,
+                 neighbour_ids=None, neighbour_scores=None, ann_index=None,
+                 projection=None):
+        self.version = version
+        # Sparse TF-IDF rows, or dense embeddings when `projection` is set
+        self.vectors = vectors
+        self.projection = projection
+        self.movie_ids = movie_ids
+        self.vectorizer = vectorizer
+        # Precomputed top-K table: [N, K] movie ids (-1 padded) and scores
+        self.neighbour_ids = neighbour_ids
+        self.neighbour_scores = neighbour_scores
+        # movie id -> row in `vectors`
+        self.index = {int(m): row for row, m in enumerate(movie_ids)}
+        self.exact_index = ExactIndex(vectors)
+        self.ann_index = ann_index
+
+    def row_of(self, movie_id):
+        return self.index.get(movie_id)
+
+    def embed(self, tfidf_rows):
+        """TF-IDF rows from `vectorizer` in the space of `vectors`."""
+        if self.projection is None:
+            return tfidf_rows
+        return l2_normalise(tfidf_rows @ self.projection)
+
+    def similarity_index(self, backend=None):
+        """Requested backend, falling back to exact when it was not published."""
+        if (backend or INDEX_BACKEND) == "ivf" and self.ann_index is not None:
+            return self.ann_index
+        return self.exact_index
+
+
+# -------------------------------------------------
+# Loaders
+# -------------------------------------------------
+def csr_from_arrays(arrays, shape):
+    matrix = sparse.csr_matrix(
+        (arrays["vectors_data"], arrays["vectors_indices"], arrays["vectors_indptr"]),
+        shape=tuple(shape),
+        copy=False
+    )
+    # Published matrices are canonical; telling SciPy so keeps it from
+    # trying to sort the read-only mapped buffers in place.
+    matrix.has_sorted_indices = True
+    matrix.has_canonical_format = True
+    return matrix
+
+
+def _load_published(version):
+    arrays, objects, meta = artifact_store.load(MODEL_NAME, version)
+    if "embeddings" in arrays:
+        vectors = arrays["embeddings"]
+    else:
+        vectors = csr_from_arrays(arrays, meta["shape"])
+    return ContentModel(
+        version=version,
+        vectors=vectors,
+        movie_ids=arrays["movie_ids"],
+        vectorizer=objects.get("tfidf_vectorizer"),
+        neighbour_ids=arrays.get("neighbour_ids"),
+        neighbour_scores=arrays.get("neighbour_scores"),
+        ann_index=IVFIndex.from_arrays(arrays, vectors=vectors),
+        projection=arrays.get("svd_projection")
+    )
+
+
+def _load_legacy():
+    # Pickles written by older versions of train_content_model.py
+    root = artifact_store.ARTIFACT_PATH
+    vectors_path = os.path.join(root, "movie_vectors.pkl")
+    ids_path = os.path.join(root, "movie_ids.pkl")
+    vectorizer_path = os.path.join(root, "tfidf_vectorizer.pkl")
+
+    if not os.path.exists(vectors_path) or not os.path.exists(ids_path):
+        return None
+
+    with open(vectors_path, "rb") as f:
+        movie_vectors = sparse.csr_matrix(pickle.load(f))
+
+    with open(ids_path, "rb") as f:
+        movie_ids = np.asarray(pickle.load(f), dtype=np.int32)
+
+    vectorizer = None
+    if os.path.exists(vectorizer_path):
+        with open(vectorizer_path, "rb") as f:
+            vectorizer = pickle.load(f)
+
+    return ContentModel("legacy", movie_vectors, movie_ids, vectorizer)
+
+
+# -------------------------------------------------
+# Process-wide cache
+# -------------------------------------------------
+_lock = threading.Lock()
+_model = None
+_loaded = False
+_next_check = 0.0
+
+
+def get_content_model():
+    """Return the live ContentModel, or None when no artifacts exist."""
+    global _model, _loaded, _next_check
+
+    now = time.monotonic()
+    if _loaded and now < _next_check:
+        return _model
+
+    with _lock:
+        if _loaded and now < _next_check:
+            return _model
+
+        version = artifact_store.current_version(MODEL_NAME)
+        current = _model.version if _model is not None else None
+
+        if not _loaded or (version and version != current):
+            try:
+                _model = _load_published(version) if version else _load_legacy()
+            except (OSError, ValueError, KeyError):
+                # Fail safely — keep serving the previous model
+                if not _loaded:
+                    _model = None
+            _loaded = True
+
+        _next_check = now + RELOAD_CHECK_SECONDS
+        return _model
+
+
+def reset():
+    """Drop the cached model; the next call reloads from disk."""
+    global _model, _loaded, _next_check
+    with _lock:
+        _model, _loaded, _next_check = None, False, 0.0
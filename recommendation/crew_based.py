@@ -4,43 +4,88 @@ Crew-Based Recommendation
 Recommends movies based on:
 - Same director
 - Overlapping cast
+
+Only the postings of the seed movie's people are touched
+(see crew_index.py). The batch form scores blocks of seeds with one sparse
+product over the index's movie × person matrix.
 """
 
 from database.models import Movie
 from collections import defaultdict
 
+import numpy as np
+from scipy import sparse
+
+from recommendation.batch import empty_result, in_blocks, run_parallel
+from recommendation.crew_index import get_crew_index
+
+DIRECTOR_WEIGHT = 3
+CAST_WEIGHT = 1
+
 
 def recommend_by_crew(movie_id, top_n=10):
     scores = defaultdict(int)
 
-    movie = Movie.query.get(movie_id)
-    if not movie:
-        return []
+    index = get_crew_index()
+    postings = index.postings(movie_id)
+    if postings is None:
+        movie = Movie.query.get(movie_id)
+        if not movie:
+            return []
+        index.add_movie(movie.id, movie.director, movie.cast)
+        postings = index.postings(movie_id)
 
-    # Director-based
-    if movie.director:
-        director_movies = Movie.query.filter(
-            Movie.director == movie.director,
-            Movie.id != movie.id
-        ).all()
+    directed, cast_postings = postings
 
-        for m in director_movies:
-            scores[m.id] += 3
+    # Director-based
+    for m in directed:
+        scores[m] += DIRECTOR_WEIGHT
 
     # Cast-based
-    if movie.cast:
-        cast_members = set(a.strip() for a in movie.cast.split(","))
+    for movies in cast_postings:
+        for m in movies:
+            scores[m] += CAST_WEIGHT
 
-        all_movies = Movie.query.all()
-        for m in all_movies:
-            if not m.cast or m.id == movie.id:
-                continue
+    scores.pop(movie_id, None)
 
-            other_cast = set(a.strip() for a in m.cast.split(","))
-            overlap = cast_members.intersection(other_cast)
+    ranked = sorted(scores, key=lambda m: (-scores[m], m))
+    return ranked[:top_n]
 
-            if overlap:
-                scores[m.id] += len(overlap)
 
-    ranked = sorted(scores, key=scores.get, reverse=True)
-    return ranked[:top_n]
+def recommend_by_crew_batch(movie_ids, top_n=10, block_size=256, workers=None):
+    """
+    recommend_by_crew for many seeds: (ids int32 [n, top_n], scores float32).
+    Same scores and tie order (lower movie id first) as the single form.
+    """
+    movie_ids = np.asarray(movie_ids, dtype=np.int64)
+    if workers and workers > 1:
+        return run_parallel("crew", movie_ids, top_n, block_size, workers)
+
+    ids, scores = empty_result(len(movie_ids), top_n)
+    index = get_crew_index()
+
+    missing = [int(m) for m in movie_ids if int(m) not in index.people]
+    if missing:
+        for m in Movie.query.filter(Movie.id.in_(missing)):
+            index.add_movie(m.id, m.director, m.cast)
+
+    matrix, matrix_ids, weights = index.matrix(DIRECTOR_WEIGHT, CAST_WEIGHT)
+    rows = np.searchsorted(matrix_ids, movie_ids)
+    present = np.flatnonzero(rows < len(matrix_ids))
+    present = present[matrix_ids[rows[present]] == movie_ids[present]]
+
+    weighted_t = (matrix @ sparse.diags(weights)).T.tocsc()
+    for block in in_blocks(present, block_size):
+        block_scores = (matrix[rows[block]] @ weighted_t).tocsr()
+        for i, seed in enumerate(block):
+            start, stop = block_scores.indptr[i], block_scores.indptr[i + 1]
+            cols = block_scores.indices[start:stop]
+            vals = block_scores.data[start:stop]
+            keep = (matrix_ids[cols] != movie_ids[seed]) & (vals > 0)
+            cols, vals = cols[keep], vals[keep]
+            # Highest score first, lower movie id on ties
+            order = np.lexsort((matrix_ids[cols], -vals))[:top_n]
+            ids[seed, :len(order)] = matrix_ids[cols[order]]
+            scores[seed, :len(order)] = vals[order]
+
+    return ids, scores
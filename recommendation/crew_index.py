@@ -0,0 +1,230 @@
+"""
+Crew Inverted Index
+-------------------
+person name -> movie ids, split into director and cast postings.
+
+Built once per process from (id, director, cast) columns, or loaded from
+a persisted snapshot and caught up with the rows inserted since. Routes
+and the TMDB seeder call add_movies() after inserting, so the index never
+needs a full rebuild while the process lives. Crew edits to existing rows
+(the ingest "changes" sync) are folded into the snapshot by
+update_snapshot(); running processes reload it when it changes on disk,
+checking every RELOAD_CHECK_SECONDS.
+
+    python -m recommendation.crew_index     # persist a fresh snapshot
+"""
+
+import os
+import pickle
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+from scipy import sparse
+
+from database.db import db
+from database.models import Movie
+from recommendation.artifact_store import ARTIFACT_PATH
+
+INDEX_PATH = os.getenv(
+    "CREW_INDEX_PATH", os.path.join(ARTIFACT_PATH, "crew_index.pkl")
+)
+RELOAD_CHECK_SECONDS = 30.0
+
+
+def split_cast(cast):
+    if not cast:
+        return ()
+    return tuple(a.strip() for a in cast.split(",") if a.strip())
+
+
+class CrewIndex:
+    def __init__(self):
+        self.directors = defaultdict(set)
+        self.cast = defaultdict(set)
+        # movie id -> (director, cast names)
+        self.people = {}
+        self.max_movie_id = 0
+        self._matrix = None
+        self._lock = threading.Lock()
+
+    def add_movie(self, movie_id, director, cast):
+        with self._lock:
+            old = self.people.get(movie_id)
+            if old:
+                self._remove_postings(movie_id, *old)
+
+            names = split_cast(cast)
+            self.people[movie_id] = (director, names)
+            if director:
+                self.directors[director].add(movie_id)
+            for name in names:
+                self.cast[name].add(movie_id)
+            self.max_movie_id = max(self.max_movie_id, movie_id)
+            self._matrix = None
+
+    def _remove_postings(self, movie_id, director, names):
+        if director:
+            self.directors[director].discard(movie_id)
+        for name in names:
+            self.cast[name].discard(movie_id)
+
+    def remove_movie(self, movie_id):
+        with self._lock:
+            old = self.people.pop(movie_id, None)
+            if old:
+                self._remove_postings(movie_id, *old)
+                self._matrix = None
+
+    def postings(self, movie_id):
+        """
+        (director's movie ids, [movie ids per cast member]) for a seed, copied
+        under the lock so add_movie() can run concurrently; None if unknown.
+        """
+        with self._lock:
+            people = self.people.get(movie_id)
+            if people is None:
+                return None
+            director, names = people
+            directed = tuple(self.directors.get(director, ())) if director else ()
+            return directed, [tuple(self.cast.get(name, ())) for name in set(names)]
+
+    def add_rows(self, rows):
+        for movie_id, director, cast in rows:
+            self.add_movie(movie_id, director, cast)
+
+    def catch_up(self, full=False):
+        """
+        Index rows inserted since the snapshot was taken. full=True also
+        re-reads every existing row, applying crew edits and deletions.
+        """
+        query = db.session.query(Movie.id, Movie.director, Movie.cast)
+        if not full:
+            self.add_rows(query.filter(Movie.id > self.max_movie_id).yield_per(1000))
+            return
+
+        seen = set()
+        for movie_id, director, cast in query.yield_per(1000):
+            seen.add(movie_id)
+            if self.people.get(movie_id) != (director, split_cast(cast)):
+                self.add_movie(movie_id, director, cast)
+        for movie_id in set(self.people) - seen:
+            self.remove_movie(movie_id)
+
+    def matrix(self, director_weight, cast_weight):
+        """
+        Sparse movie × (role, person) incidence matrix for batch scoring.
+
+        Returns (matrix CSR float32 [movies, people], movie ids int64 sorted,
+        column weights float32). Rebuilt after the index changes.
+        """
+        with self._lock:
+            cached = self._matrix
+            if cached is not None and cached[0] == (director_weight, cast_weight):
+                return cached[1]
+
+            movie_ids = np.array(sorted(self.people), dtype=np.int64)
+            columns, weights, rows, cols = {}, [], [], []
+            for row, movie_id in enumerate(movie_ids):
+                director, names = self.people[int(movie_id)]
+                roles = [("director", director)] if director else []
+                roles += [("cast", name) for name in set(names)]
+                for role in roles:
+                    col = columns.get(role)
+                    if col is None:
+                        col = columns[role] = len(columns)
+                        weights.append(director_weight if role[0] == "director" else cast_weight)
+                    rows.append(row)
+                    cols.append(col)
+
+            matrix = sparse.csr_matrix(
+                (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+                shape=(len(movie_ids), len(columns))
+            )
+            result = (matrix, movie_ids, np.asarray(weights, dtype=np.float32))
+            self._matrix = ((director_weight, cast_weight), result)
+            return result
+
+    # -------------------------------------------------
+    # Persistence
+    # -------------------------------------------------
+    def save(self, path=INDEX_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(self.people, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        index = cls()
+        with open(path, "rb") as f:
+            people = pickle.load(f)
+        for movie_id, (director, names) in people.items():
+            index.add_movie(movie_id, director, ",".join(names))
+        return index
+
+
+# -------------------------------------------------
+# Process-wide instance
+# -------------------------------------------------
+_lock = threading.Lock()
+_index = None
+_snapshot_mtime = None
+_next_check = 0.0
+
+
+def _mtime(path=INDEX_PATH):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def get_crew_index():
+    global _index, _snapshot_mtime, _next_check
+
+    now = time.monotonic()
+    if _index is not None and now < _next_check:
+        return _index
+
+    with _lock:
+        mtime = _mtime()
+        if _index is None or (mtime is not None and mtime != _snapshot_mtime):
+            try:
+                index = CrewIndex.load()
+            except (OSError, pickle.UnpicklingError, EOFError):
+                # No usable snapshot: keep the index we have, or build one
+                index = _index or CrewIndex()
+            index.catch_up()
+            _index, _snapshot_mtime = index, mtime
+        _next_check = now + RELOAD_CHECK_SECONDS
+        return _index
+
+
+def add_movies(movies):
+    """Register freshly inserted Movie rows (no-op until the index is built)."""
+    if _index is None:
+        return
+    for m in movies:
+        _index.add_movie(m.id, m.director, m.cast)
+
+
+def update_snapshot(path=INDEX_PATH):
+    """Bring a persisted snapshot up to date with the table (for offline jobs)."""
+    if not os.path.exists(path):
+        return
+    index = CrewIndex.load(path)
+    index.catch_up(full=True)
+    index.save(path)
+
+
+if __name__ == "__main__":
+    from backend.app import create_db_app
+
+    with create_db_app().app_context():
+        index = CrewIndex()
+        index.catch_up()
+        index.save()
+        print(f"✅ Crew index saved ({len(index.people)} movies) to {INDEX_PATH}")
@@ -1,32 +1,66 @@
 import sys, os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
+from database.db import db
 from database.models import Movie
-from backend.app import create_app
+from recommendation.preprocess import movie_text
+from flask import has_app_context
 
-def load_movies():
+DEFAULT_BATCH_SIZE = int(os.getenv("TRAINING_BATCH_SIZE", "2000"))
+
+# Only the columns movie_text() reads
+DOCUMENT_COLUMNS = (
+    Movie.id, Movie.genres, Movie.overview, Movie.director, Movie.cast, Movie.language
+)
+
+
+def iter_movie_batches(batch_size=DEFAULT_BATCH_SIZE, after_id=None, until_id=None):
     """
-    Fetch movies from database.
-    Returns:
-        movie_ids: list[int]
-        documents: list[str]
+    Stream movies from the database in id order.
+
+    Yields (movie_ids, documents) lists of at most `batch_size` rows. Rows
+    are plain column tuples fetched with yield_per (a server-side cursor on
+    Postgres), so memory is bounded by the batch, not the catalogue.
     """
-    app = create_app()
+    if not has_app_context():
+        from backend.app import create_db_app
+
+        with create_db_app().app_context():
+            yield from iter_movie_batches(batch_size, after_id, until_id)
+        return
+
+    stmt = db.select(*DOCUMENT_COLUMNS).order_by(Movie.id)
+    if after_id is not None:
+        stmt = stmt.where(Movie.id > after_id)
+    if until_id is not None:
+        stmt = stmt.where(Movie.id <= until_id)
 
-    with app.app_context():
-        movies = Movie.query.all()
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+    for rows in result.partitions():
+        yield [r.id for r in rows], [movie_text(r) for r in rows]
 
-        movie_ids = []
-        documents = []
 
-        for movie in movies:
-            text = ""
-            if movie.genres:
-                text += movie.genres.replace(",", " ") + " "
-            if movie.overview:
-                text += movie.overview
+def max_movie_id():
+    if not has_app_context():
+        from backend.app import create_db_app
+
+        with create_db_app().app_context():
+            return max_movie_id()
+    return db.session.scalar(db.select(db.func.max(Movie.id)))
+
+
+def load_movies(after_id=None):
+    """
+    Fetch movies from database (only ids above `after_id` when given).
+    Returns:
+        movie_ids: list[int]
+        documents: list[str]
+    """
+    movie_ids = []
+    documents = []
 
-            movie_ids.append(movie.id)
-            documents.append(text.lower())
+    for ids, docs in iter_movie_batches(after_id=after_id):
+        movie_ids.extend(ids)
+        documents.extend(docs)
 
     return movie_ids, documents
@@ -0,0 +1,289 @@
+"""
+Precomputed User Feeds
+----------------------
+Per-user top-N lists stored in the user_feeds table, one row per
+(user, kind):
+
+  hybrid          hybrid_recommendation(user_id=...)
+  collaborative   recommend_collaborative(user_id), shared with the hybrid run
+
+/recommend/hybrid and /recommend/collaborative serve the stored row and
+only compute live (and store the result) when a user has none. A review or
+watched change marks the user's rows stale and schedules a refresh on the
+in-process worker, debounced: a burst of changes triggers one recompute,
+FEED_DEBOUNCE_SECONDS after the last of them, but never later than
+FEED_MAX_DELAY_SECONDS after the first. FEED_WORKER=off leaves refreshes
+to the batch job:
+
+    python -m recommendation.feeds refresh          # stale, old or missing feeds
+    python -m recommendation.feeds refresh --all    # every active user
+
+The batch job scores users a block at a time through the *_batch
+recommenders (see batch.py).
+
+This module only needs the database; the recommenders are imported when a
+feed is computed.
+"""
+
+import argparse
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app, has_app_context
+from sqlalchemy import or_
+
+from database.bulk import dialect_insert
+from database.db import db
+from database.models import Review, UserFeed, Watched
+
+FEED_KINDS = ("hybrid", "collaborative")
+FEED_SIZE = 10
+BATCH_USERS = 256
+FEED_WORKER = os.getenv("FEED_WORKER", "thread")
+DEBOUNCE_SECONDS = float(os.getenv("FEED_DEBOUNCE_SECONDS", "30"))
+MAX_DELAY_SECONDS = float(os.getenv("FEED_MAX_DELAY_SECONDS", "300"))
+# Older feeds are still served, but flagged stale and refreshed
+MAX_AGE = timedelta(hours=float(os.getenv("FEED_MAX_AGE_HOURS", "24")))
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# -------------------------------------------------
+# Storage
+# -------------------------------------------------
+class Feed:
+    def __init__(self, movie_ids, computed_at, stale):
+        self.movie_ids = movie_ids
+        self.computed_at = computed_at
+        self.stale = stale
+
+    @property
+    def age_seconds(self):
+        return max(0, int((_now() - self.computed_at).total_seconds()))
+
+
+def load_feed(user_id, kind):
+    """The stored Feed, or None on a miss."""
+    row = db.session.get(UserFeed, (user_id, kind))
+    if row is None:
+        return None
+    stale = (
+        (row.stale_since is not None and row.stale_since >= row.computed_at)
+        or _now() - row.computed_at > MAX_AGE
+    )
+    ids = [int(m) for m in row.movie_ids.split(",") if m]
+    return Feed(ids, row.computed_at, stale)
+
+
+def store_feed(user_id, kind, movie_ids, computed_at):
+    """Upsert one feed row; the caller commits."""
+    values = {"user_id": user_id, "kind": kind, "computed_at": computed_at,
+              "movie_ids": ",".join(str(int(m)) for m in movie_ids)}
+    insert = dialect_insert()
+    if insert is not None:
+        db.session.execute(
+            insert(UserFeed).values(**values).on_conflict_do_update(
+                index_elements=["user_id", "kind"],
+                set_={"movie_ids": values["movie_ids"], "computed_at": computed_at}
+            )
+        )
+    else:
+        db.session.merge(UserFeed(**values))
+
+
+def mark_stale(user_id):
+    """Flag every stored feed of `user_id` as out of date, and commit."""
+    UserFeed.query.filter_by(user_id=user_id).update(
+        {"stale_since": _now()}, synchronize_session=False
+    )
+    db.session.commit()
+
+
+# -------------------------------------------------
+# Computing
+# -------------------------------------------------
+def compute_feeds(user_id):
+    """{kind: [movie ids]} for every feed kind, from one hybrid run."""
+    from recommendation.collaborative import recommend_collaborative
+    from recommendation.hybrid import hybrid_recommendation
+
+    components = {}
+    feeds = {"hybrid": hybrid_recommendation(user_id=user_id, top_n=FEED_SIZE,
+                                             components=components)}
+    # The hybrid run's collaborative component is the same top-N list
+    collaborative = components.get("collaborative")
+    if collaborative is None:
+        collaborative = recommend_collaborative(user_id, top_n=FEED_SIZE)
+    feeds["collaborative"] = list(collaborative)[:FEED_SIZE]
+    return feeds
+
+
+def refresh_user(user_id):
+    """Recompute and store all of a user's feeds; returns {kind: ids}."""
+    computed_at = _now()
+    feeds = compute_feeds(user_id)
+    for kind, ids in feeds.items():
+        store_feed(user_id, kind, ids, computed_at)
+    db.session.commit()
+    return feeds
+
+
+def get_or_compute(user_id, kind):
+    """
+    (movie ids, Feed or None). A stored feed is returned as is, a stale one
+    also schedules a refresh; a miss is computed now and stored.
+    """
+    feed = load_feed(user_id, kind)
+    if feed is not None:
+        if feed.stale:
+            schedule_refresh(user_id)
+        return feed.movie_ids, feed
+    return refresh_user(user_id)[kind], None
+
+
+# -------------------------------------------------
+# Background worker
+# -------------------------------------------------
+class FeedWorker:
+    def __init__(self, app, debounce=DEBOUNCE_SECONDS, max_delay=MAX_DELAY_SECONDS):
+        self.app = app
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._due = {}  # user id -> (due, latest allowed)
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def schedule(self, user_id):
+        now = time.monotonic()
+        with self._cond:
+            _, latest = self._due.get(user_id, (None, now + self.max_delay))
+            self._due[user_id] = (min(now + self.debounce, latest), latest)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="feed-worker", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+
+    def pending(self):
+        with self._cond:
+            return len(self._due)
+
+    def _next_batch(self):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                ready = [u for u, (due, _) in self._due.items() if due <= now]
+                if ready:
+                    for u in ready:
+                        del self._due[u]
+                    return ready
+                wait = min((due for due, _ in self._due.values()), default=now + 60) - now
+                self._cond.wait(wait)
+
+    def _run(self):
+        while True:
+            users = self._next_batch()
+            with self.app.app_context():
+                for user_id in users:
+                    try:
+                        refresh_user(user_id)
+                    except Exception:
+                        db.session.rollback()
+                        self.app.logger.exception("feeds: refresh failed for user %s", user_id)
+
+
+_lock = threading.Lock()
+_worker = None
+_worker_pid = None
+
+
+def get_worker():
+    global _worker, _worker_pid
+
+    with _lock:
+        # A forked worker process starts its own thread
+        if _worker is None or _worker_pid != os.getpid():
+            _worker = FeedWorker(current_app._get_current_object())
+            _worker_pid = os.getpid()
+        return _worker
+
+
+def schedule_refresh(user_id):
+    """Queue a debounced refresh (no-op with FEED_WORKER=off)."""
+    if FEED_WORKER == "off" or not user_id:
+        return
+    get_worker().schedule(user_id)
+
+
+def user_activity(user_id):
+    """A review or watched change: mark the user's feeds stale and refresh them."""
+    mark_stale(user_id)
+    schedule_refresh(user_id)
+
+
+# -------------------------------------------------
+# Batch mode
+# -------------------------------------------------
+def active_user_ids():
+    """Users with at least one review or watched movie."""
+    reviewed = db.session.query(Review.user_id)
+    watched = db.session.query(Watched.user_id)
+    return sorted(u for (u,) in reviewed.union(watched))
+
+
+def users_needing_refresh():
+    """Active users whose hybrid feed is missing, stale or past MAX_AGE."""
+    fresh = {
+        u for (u,) in db.session.query(UserFeed.user_id).filter(
+            UserFeed.kind == "hybrid",
+            UserFeed.computed_at > _now() - MAX_AGE,
+            or_(UserFeed.stale_since.is_(None), UserFeed.stale_since < UserFeed.computed_at),
+        )
+    }
+    return [u for u in active_user_ids() if u not in fresh]
+
+
+def refresh_all(everyone=False):
+    if not has_app_context():
+        from backend.app import create_db_app
+
+        with create_db_app().app_context():
+            return refresh_all(everyone)
+
+    from recommendation.collaborative import recommend_collaborative_batch
+    from recommendation.hybrid import hybrid_recommendation_batch
+
+    user_ids = active_user_ids() if everyone else users_needing_refresh()
+    print(f"Refreshing feeds for {len(user_ids)} users...")
+    started = time.perf_counter()
+    for start in range(0, len(user_ids), BATCH_USERS):
+        block = user_ids[start:start + BATCH_USERS]
+        computed_at = _now()
+        # One batch run per block; the hybrid blend reuses the collaborative lists
+        collaborative, _ = recommend_collaborative_batch(block, top_n=FEED_SIZE)
+        hybrid, _ = hybrid_recommendation_batch(
+            block, top_n=FEED_SIZE, components={"collaborative": collaborative}
+        )
+        for user_id, *lists in zip(block, hybrid, collaborative):
+            for kind, ids in zip(("hybrid", "collaborative"), lists):
+                store_feed(user_id, kind, [int(m) for m in ids if m >= 0], computed_at)
+        db.session.commit()
+        print(f"  {start + len(block)}/{len(user_ids)}")
+
+    print(f"✅ {len(user_ids)} feeds refreshed in {time.perf_counter() - started:.1f}s")
+    return len(user_ids)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute user recommendation feeds")
+    parser.add_argument("command", choices=("refresh",))
+    parser.add_argument("--all", action="store_true",
+                        help="recompute every active user, not only stale or missing feeds")
+    args = parser.parse_args()
+
+    refresh_all(everyone=args.all)
@@ -2,9 +2,19 @@
 Franchise-Based Recommendation
 ------------------------------
 Recommends movies from the same franchise / series
+
+Matches on the TMDB collection or the normalised base title
+(Movie.franchise_key), whichever the seed has; both are indexed lookups.
+The batch form resolves a block of seeds with two IN queries.
 """
 
+from collections import defaultdict
+
+import numpy as np
+from sqlalchemy import or_
+
 from database.models import Movie
+from recommendation.batch import empty_result, in_blocks, run_parallel
 
 
 def recommend_by_franchise(movie_id, top_n=10):
@@ -12,11 +22,72 @@ def recommend_by_franchise(movie_id, top_n=10):
     if not movie or not movie.title:
         return []
 
-    base_title = movie.title.split(":")[0].split("(")[0].strip().lower()
+    # Siblings stored without a collection (e.g. from /home or the seeder)
+    # still share the base title, so match on either
+    same_series = []
+    if movie.collection_id:
+        same_series.append(Movie.collection_id == movie.collection_id)
+    if movie.franchise_key:
+        same_series.append(Movie.franchise_key == movie.franchise_key)
+    if not same_series:
+        return []
 
-    similar_movies = Movie.query.filter(
+    similar_movies = Movie.query.with_entities(Movie.id).filter(
         Movie.id != movie.id,
-        Movie.title.ilike(f"%{base_title}%")
-    ).limit(top_n).all()
+        or_(*same_series)
+    ).order_by(Movie.id).limit(top_n).all()
 
     return [m.id for m in similar_movies]
+
+
+def recommend_by_franchise_batch(movie_ids, top_n=10, block_size=500, workers=None):
+    """
+    recommend_by_franchise for many seeds: (ids int32 [n, top_n], scores
+    float32, 1 per match). Series members are listed in movie id order.
+    """
+    movie_ids = np.asarray(movie_ids, dtype=np.int64)
+    if workers and workers > 1:
+        return run_parallel("franchise", movie_ids, top_n, block_size, workers)
+
+    ids, scores = empty_result(len(movie_ids), top_n)
+    positions = defaultdict(list)
+    for i, m in enumerate(movie_ids.tolist()):
+        positions[m].append(i)
+
+    # Block size stays under SQLite's bound-parameter limit
+    for block in in_blocks(list(positions), block_size):
+        seeds = Movie.query.with_entities(
+            Movie.id, Movie.title, Movie.collection_id, Movie.franchise_key
+        ).filter(Movie.id.in_(block)).all()
+
+        # seed -> (collection id or None, franchise key or None)
+        series = {
+            movie_id: (collection_id or None, key or None)
+            for movie_id, title, collection_id, key in seeds
+            if title and (collection_id or key)
+        }
+
+        if not series:
+            continue
+        collections = {c for c, _ in series.values() if c}
+        keys = {k for _, k in series.values() if k}
+
+        by_collection, by_key = defaultdict(list), defaultdict(list)
+        for movie_id, collection_id, key in Movie.query.with_entities(
+            Movie.id, Movie.collection_id, Movie.franchise_key
+        ).filter(or_(
+            Movie.collection_id.in_(collections), Movie.franchise_key.in_(keys)
+        )):
+            if collection_id in collections:
+                by_collection[collection_id].append(movie_id)
+            if key in keys:
+                by_key[key].append(movie_id)
+
+        for movie_id, (collection_id, key) in series.items():
+            group = set(by_collection.get(collection_id, ())) | set(by_key.get(key, ()))
+            same = sorted(group - {movie_id})[:top_n]
+            for i in positions[movie_id]:
+                ids[i, :len(same)] = same
+                scores[i, :len(same)] = 1.0
+
+    return ids, scores
@@ -2,36 +2,330 @@
 Hybrid Recommendation Engine
 ----------------------------
 Combines multiple recommenders
+
+Independent recommenders run concurrently in a bounded thread pool, each
+inside its own app context (and therefore its own DB session). Weights,
+on/off switches and cache settings come from DEFAULT_CONFIG, overridden by
+the JSON file named in HYBRID_CONFIG, which is re-read whenever it changes:
+
+    {"weights": {"crew": 0.35}, "enabled": {"franchise": false}}
+
+Results are memoised per (movie_id, user_id, top_n) together with the
+user's feedback_version(). A cached blend is only served while that version
+still matches the database, so a review or watched change made through any
+worker takes effect on the next request everywhere; invalidate_user also
+frees the entries in the process that handled the write.
+
+hybrid_recommendation_batch blends the components' batch forms for many
+(movie, user) pairs, computing each component once per distinct seed.
 """
 
+import json
+import os
+import threading
 from collections import defaultdict
-from database.models import Movie
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import func, select
+
+from database.db import db
+from database.models import Movie, Review, Watched
+from recommendation.batch import empty_result, get_batch_function
+from recommendation.cache import TTLCache
 from recommendation.content_based import recommend_similar_movies
 from recommendation.collaborative import recommend_collaborative
 from recommendation.crew_based import recommend_by_crew
 from recommendation.franchise import recommend_by_franchise
 
+DEFAULT_CONFIG = {
+    "weights": {
+        "content": 0.4,
+        "franchise": 0.3,
+        "crew": 0.25,
+        "collaborative": 0.2,
+        "popularity": 0.1,
+    },
+    "enabled": {
+        "content": True,
+        "franchise": True,
+        "crew": True,
+        "collaborative": True,
+        "popularity": True,
+    },
+    "max_workers": 4,  # read when the pool starts; not resized live
+    "cache_size": 2048,
+    "cache_ttl": 300,
+    "popularity_ttl": 600,
+}
+
+CONFIG_PATH = os.getenv("HYBRID_CONFIG")
+
+
+# -------------------------------------------------
+# Component recommenders
+# -------------------------------------------------
+def _popular_movies():
+    cached = _popular_cache.get("top")
+    if cached is None:
+        cached = [
+            m.id for m in Movie.query.with_entities(Movie.id)
+            .order_by(Movie.popularity.desc()).limit(10).all()
+        ]
+        _popular_cache.set("top", cached, ttl=get_config()["popularity_ttl"])
+    return cached
+
+
+# How many ids each component contributes to the blend
+COMPONENT_SIZES = {
+    "content": 15,
+    "franchise": 10,
+    "crew": 10,
+    "collaborative": 10,
+    "popularity": 10,
+}
+
+# name -> (needs, function(movie_id, user_id, n) -> [movie ids])
+RECOMMENDERS = {
+    "content": ("movie", lambda movie_id, user_id, n: recommend_similar_movies(movie_id, top_n=n)),
+    "franchise": ("movie", lambda movie_id, user_id, n: recommend_by_franchise(movie_id, top_n=n)),
+    "crew": ("movie", lambda movie_id, user_id, n: recommend_by_crew(movie_id, top_n=n)),
+    "collaborative": ("user", lambda movie_id, user_id, n: recommend_collaborative(user_id, top_n=n)),
+    "popularity": (None, lambda movie_id, user_id, n: _popular_movies()[:n]),
+}
+
+
+# -------------------------------------------------
+# Configuration (hot-reloaded)
+# -------------------------------------------------
+_config_lock = threading.Lock()
+_config = DEFAULT_CONFIG
+_config_mtime = None
+
+
+def _merge(base, override):
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            merged[key] = {**base[key], **value}
+        else:
+            merged[key] = value
+    return merged
+
+
+def get_config():
+    global _config, _config_mtime
+
+    if not CONFIG_PATH:
+        return _config
+
+    try:
+        mtime = os.stat(CONFIG_PATH).st_mtime
+    except OSError:
+        return _config
+
+    if mtime != _config_mtime:
+        with _config_lock:
+            try:
+                with open(CONFIG_PATH) as f:
+                    _config = _merge(DEFAULT_CONFIG, json.load(f))
+            except (OSError, ValueError):
+                # Keep the last good config on a bad edit
+                pass
+            _config_mtime = mtime
+            _results.max_size = _config["cache_size"]
+            _results.clear()
+
+    return _config
+
+
+# -------------------------------------------------
+# Caches and pool
+# -------------------------------------------------
+_results = TTLCache(DEFAULT_CONFIG["cache_size"], DEFAULT_CONFIG["cache_ttl"])
+_popular_cache = TTLCache(1, DEFAULT_CONFIG["popularity_ttl"])
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=get_config()["max_workers"], thread_name_prefix="hybrid"
+            )
+        return _pool
+
+
+def invalidate_user(user_id):
+    """
+    Forget memoised results for ``user_id`` after their feedback changes.
+    Only this process's cache is cleared; other workers notice the change
+    through feedback_version().
+    """
+    _results.invalidate(lambda key: key[1] == user_id)
+
+
+def feedback_version(user_id):
+    """
+    (review count, last review id, watched count, last watched id) for
+    ``user_id`` in one indexed query, None without a user. Adding or removing
+    a review or watched movie always changes it.
+    """
+    if not user_id:
+        return None
+    row = db.session.execute(select(
+        select(func.count(Review.id)).where(Review.user_id == user_id).scalar_subquery(),
+        select(func.max(Review.id)).where(Review.user_id == user_id).scalar_subquery(),
+        select(func.count(Watched.id)).where(Watched.user_id == user_id).scalar_subquery(),
+        select(func.max(Watched.id)).where(Watched.user_id == user_id).scalar_subquery(),
+    )).one()
+    return tuple(row)
+
+
+def _run_in_context(app, name, movie_id, user_id, n):
+    fn = RECOMMENDERS[name][1]
+    with app.app_context():
+        try:
+            return fn(movie_id, user_id, n)
+        except Exception:
+            # One failing recommender must not sink the whole list
+            app.logger.exception("hybrid: %s recommender failed", name)
+            return []
+
+
+def applicable(name, movie_id=None, user_id=None):
+    needs = RECOMMENDERS[name][0]
+    if needs == "movie":
+        return bool(movie_id)
+    if needs == "user":
+        return bool(user_id)
+    return True
+
+
+def submit_components(jobs):
+    """
+    Run component recommenders concurrently.
+
+    jobs: iterable of (name, movie_id, user_id, n)
+    Returns {job: Future} in submission order.
+    """
+    app = current_app._get_current_object()
+    pool = _get_pool()
+    return {
+        job: pool.submit(_run_in_context, app, *job)
+        for job in jobs
+    }
+
+
+def hybrid_recommendation(movie_id=None, user_id=None, top_n=10, components=None):
+    """
+    components: optional dict name -> [movie ids] shared by the caller
+    (e.g. one batch request). Lists already present are reused instead of
+    recomputed, and newly computed ones are added to it. Such calls bypass
+    the result cache: the blend depends on the caller's lists, and the
+    caller expects `components` filled in.
+    """
+    config = get_config()
+    key = (movie_id, user_id, top_n)
+    use_cache = components is None
+
+    if use_cache:
+        # Read before computing: a change made meanwhile fails the next check
+        version = feedback_version(user_id)
+        cached = _results.get(key)
+        if cached is not None and cached[0] == version:
+            return list(cached[1])
+
+    components = {} if components is None else components
+    names = [
+        name for name in RECOMMENDERS
+        if config["enabled"].get(name, False) and applicable(name, movie_id, user_id)
+    ]
+
+    futures = submit_components(
+        (name, movie_id, user_id, COMPONENT_SIZES[name])
+        for name in names if name not in components
+    )
+    for (name, *_), future in futures.items():
+        components[name] = future.result()
 
-def hybrid_recommendation(movie_id=None, user_id=None, top_n=10):
     scores = defaultdict(float)
+    for name in names:
+        weight = config["weights"].get(name, 0.0)
+        for m in components[name][:COMPONENT_SIZES[name]]:
+            scores[m] += weight
+
+    ranked = sorted(scores, key=scores.get, reverse=True)[:top_n]
+    if use_cache:
+        _results.set(key, (version, ranked), ttl=config["cache_ttl"])
+    return list(ranked)
+
+
+# -------------------------------------------------
+# Batch scoring
+# -------------------------------------------------
+def _component_batch(name, seeds, size, block_size, workers):
+    """Component lists aligned with `seeds`; 0 seeds get an empty row."""
+    out, _ = empty_result(len(seeds), size)
+    if name == "popularity":
+        popular = _popular_movies()[:size]
+        out[:, :len(popular)] = popular
+        return out
+
+    present = np.flatnonzero(seeds)
+    if len(present):
+        unique, inverse = np.unique(seeds[present], return_inverse=True)
+        ids, _ = get_batch_function(name)(
+            unique, top_n=size, block_size=block_size, workers=workers
+        )
+        out[present] = ids[inverse]
+    return out
+
 
-    if movie_id:
-        for m in recommend_similar_movies(movie_id, top_n=15):
-            scores[m] += 0.4
+def hybrid_recommendation_batch(user_ids, top_n=10, movie_ids=None, block_size=256,
+                                workers=None, components=None):
+    """
+    hybrid_recommendation for many (movie, user) pairs.
 
-        for m in recommend_by_franchise(movie_id):
-            scores[m] += 0.3
+    user_ids, movie_ids: equal-length id arrays, 0 for "no seed"; either may
+    be None. components: optional dict name -> [n, K] id matrix aligned with
+    the pairs, used instead of recomputing that component; newly computed
+    ones are added to it.
+    Returns (ids int32 [n, top_n], scores float32 [n, top_n]), -1 / 0 padded.
+    """
+    config = get_config()
+    if user_ids is None:
+        user_ids = np.zeros(len(movie_ids), dtype=np.int64)
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    movie_ids = (np.zeros_like(user_ids) if movie_ids is None
+                 else np.asarray(movie_ids, dtype=np.int64))
+    n = len(user_ids)
 
-        for m in recommend_by_crew(movie_id):
-            scores[m] += 0.25
+    components = {} if components is None else components
+    names = [name for name in RECOMMENDERS if config["enabled"].get(name, False)]
+    for name in names:
+        if name not in components:
+            needs = RECOMMENDERS[name][0]
+            seeds = movie_ids if needs == "movie" else user_ids if needs == "user" else None
+            components[name] = _component_batch(
+                name, np.ones(n, dtype=np.int64) if seeds is None else seeds,
+                COMPONENT_SIZES[name], block_size, workers
+            )
 
-    if user_id:
-        for m in recommend_collaborative(user_id):
-            scores[m] += 0.2
+    ids, scores = empty_result(n, top_n)
+    for i in range(n):
+        blended = defaultdict(float)
+        for name in names:
+            weight = config["weights"].get(name, 0.0)
+            for m in components[name][i][:COMPONENT_SIZES[name]]:
+                if m >= 0:
+                    blended[int(m)] += weight
 
-    popular = Movie.query.order_by(Movie.popularity.desc()).limit(10).all()
-    for m in popular:
-        scores[m.id] += 0.1
+        ranked = sorted(blended, key=blended.get, reverse=True)[:top_n]
+        ids[i, :len(ranked)] = ranked
+        scores[i, :len(ranked)] = [blended[m] for m in ranked]
 
-    ranked = sorted(scores, key=scores.get, reverse=True)
-    return ranked[:top_n]
+    return ids, scores
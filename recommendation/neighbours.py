@@ -0,0 +1,96 @@
+"""
+Top-K Neighbour Tables
+----------------------
+Offline all-pairs similarity for the content model.
+
+Rows are scored a chunk at a time (chunk × N product), so peak
+memory is chunk_size × N floats instead of N × N. Each row keeps only its
+K best neighbours, stored as int32 row numbers and float32 scores; rows with
+fewer than K positive neighbours are padded with -1 / 0.
+"""
+
+import numpy as np
+
+DEFAULT_K = 50
+DEFAULT_CHUNK_SIZE = 256
+
+
+def top_k_from_scores(scores, k, exclude=None):
+    """
+    Top-k columns of a dense (rows × N) score block.
+
+    exclude: optional array of one column per row to drop (the row itself).
+    Returns (indices int32, scores float32), best first, padded with -1.
+    """
+    scores = np.array(scores, dtype=np.float32, copy=True)
+    n_rows, n_cols = scores.shape
+
+    if exclude is not None:
+        scores[np.arange(n_rows), exclude] = -np.inf
+
+    k_eff = min(k, n_cols)
+    if k_eff == 0:
+        return (np.full((n_rows, k), -1, dtype=np.int32),
+                np.zeros((n_rows, k), dtype=np.float32))
+
+    part = np.argpartition(-scores, k_eff - 1, axis=1)[:, :k_eff]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind="stable")
+
+    idx = np.take_along_axis(part, order, axis=1).astype(np.int32)
+    val = np.take_along_axis(part_scores, order, axis=1)
+
+    # Zero / excluded similarities are not neighbours
+    empty = ~(val > 0)
+    idx[empty] = -1
+    val[empty] = 0.0
+
+    if k_eff < k:
+        pad = k - k_eff
+        idx = np.pad(idx, ((0, 0), (0, pad)), constant_values=-1)
+        val = np.pad(val, ((0, 0), (0, pad)), constant_values=0.0)
+
+    return idx, val.astype(np.float32)
+
+
+def build_neighbour_table(vectors, k=DEFAULT_K, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    K nearest rows for every row of an L2-normalised CSR matrix or dense
+    embedding matrix.
+
+    Returns (neighbour_rows int32 [N, K], neighbour_scores float32 [N, K]).
+    """
+    n = vectors.shape[0]
+    rows = np.full((n, k), -1, dtype=np.int32)
+    scores = np.zeros((n, k), dtype=np.float32)
+    sparse_input = hasattr(vectors, "tocsc")
+    vectors_t = vectors.T.tocsc() if sparse_input else np.asarray(vectors).T
+
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        block = vectors[start:stop] @ vectors_t
+        if sparse_input:
+            block = block.toarray()
+        idx, val = top_k_from_scores(block, k, exclude=np.arange(start, stop))
+        rows[start:stop] = idx
+        scores[start:stop] = val
+
+    return rows, scores
+
+
+def merge_neighbours(ids, scores, candidate_ids, candidate_scores, k):
+    """
+    Fold new candidates into an existing top-k table.
+
+    ids, scores:      [N, k] current table (movie ids, -1 padded)
+    candidate_ids:    [m] movie ids of the candidates
+    candidate_scores: [N, m] similarity of every row to every candidate
+    Returns the updated (ids int32 [N, k], scores float32 [N, k]).
+    """
+    n = ids.shape[0]
+    all_ids = np.hstack([ids, np.broadcast_to(candidate_ids, (n, len(candidate_ids)))])
+    all_scores = np.hstack([scores, candidate_scores])
+
+    cols, vals = top_k_from_scores(all_scores, k)
+    merged = np.take_along_axis(all_ids, np.maximum(cols, 0), axis=1)
+    return np.where(cols >= 0, merged, -1).astype(np.int32), vals
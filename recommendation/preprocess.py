@@ -1,7 +1,145 @@
-from sklearn.feature_extraction.text import TfidfVectorizer
+from collections import Counter
+
+import numpy as np
+
+MAX_FEATURES = 5000
+HASHING_FEATURES = 2 ** 18
+
 
 def build_vectorizer():
+    # Imported here: movie_document() is used on request paths that
+    # should not pay for loading scikit-learn
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
     return TfidfVectorizer(
         stop_words="english",
-        max_features=5000
+        max_features=MAX_FEATURES
+    )
+
+
+def build_hashing_vectorizer():
+    """Stateless term hashing + IDF; no vocabulary to fit or hold."""
+    from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+    from sklearn.pipeline import Pipeline
+
+    return Pipeline([
+        ("hash", HashingVectorizer(
+            n_features=HASHING_FEATURES, alternate_sign=False, norm=None,
+            stop_words="english"
+        )),
+        ("tfidf", TfidfTransformer()),
+    ])
+
+
+def _smooth_idf(df, n_docs):
+    # TfidfTransformer(smooth_idf=True)
+    return np.log((1 + n_docs) / (1 + np.asarray(df, dtype=np.float64))) + 1
+
+
+def fit_vectorizer(batches, kind="tfidf"):
+    """
+    Fit a vectorizer in one streaming pass over `batches` (iterable of
+    document lists); only counts are kept, never the documents.
+
+    kind="tfidf":   the same TfidfVectorizer as build_vectorizer().fit(docs);
+                    memory grows with the number of distinct terms
+    kind="hashing": build_hashing_vectorizer() with document frequencies
+                    accumulated per hash bucket; memory is fixed
+    """
+    if kind == "hashing":
+        vectorizer = build_hashing_vectorizer()
+        hasher, tfidf = vectorizer.named_steps["hash"], vectorizer.named_steps["tfidf"]
+        df = np.zeros(HASHING_FEATURES, dtype=np.int64)
+        n_docs = 0
+        for docs in batches:
+            hashed = hasher.transform(docs)
+            hashed.sum_duplicates()
+            df += np.bincount(hashed.indices, minlength=HASHING_FEATURES)
+            n_docs += len(docs)
+
+        tfidf.fit(hasher.transform([""]))
+        tfidf.idf_ = _smooth_idf(df, n_docs)
+        return vectorizer
+
+    vectorizer = build_vectorizer()
+    analyzer = vectorizer.build_analyzer()
+    counts, df = Counter(), Counter()
+    n_docs = 0
+    for docs in batches:
+        for doc in docs:
+            tokens = analyzer(doc)
+            counts.update(tokens)
+            df.update(set(tokens))
+        n_docs += len(docs)
+
+    # max_features keeps the most frequent terms, chosen exactly as
+    # CountVectorizer._limit_features does: (-counts).argsort() over the
+    # sorted terms, whose (unstable) tie order is then reproduced too
+    terms = sorted(counts)
+    totals = np.fromiter((counts[t] for t in terms), dtype=np.int64, count=len(terms))
+    keep = (-totals).argsort()[:MAX_FEATURES] if len(terms) > MAX_FEATURES else range(len(terms))
+    vocabulary = sorted(terms[i] for i in keep)
+
+    vectorizer.set_params(vocabulary=vocabulary)
+    vectorizer.fit([""])
+    vectorizer.idf_ = _smooth_idf([df[t] for t in vocabulary], n_docs)
+    return vectorizer
+
+
+def _tokens(prefix, names):
+    # "Tom Hanks" -> "cast_tom_hanks": one vocabulary term per person
+    return " ".join(
+        f"{prefix}_{'_'.join(name.lower().split())}"
+        for name in names if name and name.strip()
     )
+
+
+def movie_document(genres, overview, director=None, cast=None, language=None):
+    """Text the content model is trained on for a single movie."""
+    text = ""
+    if genres:
+        text += genres.replace(",", " ") + " "
+    if overview:
+        text += overview + " "
+    if director:
+        text += _tokens("director", [director]) + " "
+    if cast:
+        text += _tokens("cast", cast.split(",")) + " "
+    if language:
+        text += f"lang_{language}"
+    return text.lower().strip()
+
+
+def movie_text(movie):
+    """movie_document() for a Movie row (or any object with the same columns)."""
+    return movie_document(
+        movie.genres, movie.overview, movie.director, movie.cast, movie.language
+    )
+
+
+# -------------------------------------------------
+# Dimensionality reduction
+# -------------------------------------------------
+def l2_normalise(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def reduce_dimensions(vectors, n_components, seed=0):
+    """
+    TruncatedSVD (LSA) of a TF-IDF matrix.
+
+    Returns (embeddings, projection):
+        embeddings: [N, d] contiguous float32, L2-normalised, so cosine
+                    similarity is a plain dot product
+        projection: [F, d] float32; l2_normalise(tfidf @ projection) embeds
+                    a new document into the same space
+    """
+    from sklearn.decomposition import TruncatedSVD
+
+    n_components = max(1, min(n_components, min(vectors.shape) - 1))
+    svd = TruncatedSVD(n_components=n_components, random_state=seed)
+    embeddings = np.ascontiguousarray(l2_normalise(svd.fit_transform(vectors)))
+    return embeddings, np.ascontiguousarray(svd.components_.T, dtype=np.float32)
@@ -0,0 +1,204 @@
+"""
+User × Movie Rating Matrix
+--------------------------
+Process-wide sparse preference matrix for collaborative filtering.
+
+Explicit ratings come from Review, implicit feedback from Watched (a watched
+but unrated movie counts as WATCHED_WEIGHT). The matrix is built with two
+column-only queries the first time it is needed; afterwards /review and
+/watched/toggle push their writes in as small deltas that are merged with
+sparse arithmetic on the next read, never by rescanning the tables. A full
+rebuild every REBUILD_SECONDS picks up writes made by other workers.
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+from scipy import sparse
+
+from database.db import db
+from database.models import Review, Watched
+
+WATCHED_WEIGHT = float(os.getenv("COLLABORATIVE_WATCHED_WEIGHT", "3.0"))
+REBUILD_SECONDS = float(os.getenv("COLLABORATIVE_REBUILD_SECONDS", "900"))
+
+
+def _overwrite(base, pending, shape):
+    """Return ``base`` (resized to ``shape``) with the pending cells replaced."""
+    base = base.copy()
+    base.resize(shape)
+    if not pending:
+        return base
+
+    cells = np.array(list(pending.keys()), dtype=np.int64).reshape(-1, 2)
+    values = np.array(list(pending.values()), dtype=np.float32)
+    rows, cols = cells[:, 0], cells[:, 1]
+
+    mask = sparse.csr_matrix(
+        (np.ones(len(values), dtype=np.float32), (rows, cols)), shape=shape
+    )
+    update = sparse.csr_matrix((values, (rows, cols)), shape=shape)
+
+    merged = (base - base.multiply(mask) + update).tocsr()
+    merged.eliminate_zeros()
+    return merged
+
+
+class RatingMatrix:
+    def __init__(self, user_ids, movie_ids, ratings, watched):
+        # id -> row / column
+        self.user_index = {u: i for i, u in enumerate(user_ids)}
+        self.movie_index = {m: j for j, m in enumerate(movie_ids)}
+        self.movie_ids = list(movie_ids)
+
+        self._ratings = ratings
+        self._watched = watched
+        self._pending_ratings = {}
+        self._pending_watched = {}
+
+        self._preferences = None
+        self._derived = {}
+        self._lock = threading.Lock()
+        self.built_at = time.monotonic()
+
+    # -------------------------------------------------
+    # Construction
+    # -------------------------------------------------
+    @classmethod
+    def from_db(cls):
+        reviews = db.session.query(
+            Review.user_id, Review.movie_id, Review.rating
+        ).order_by(Review.id).all()
+        watched = db.session.query(Watched.user_id, Watched.movie_id).all()
+
+        # Latest review wins when a user rated a movie more than once
+        latest = {(u, m): float(r) for u, m, r in reviews}
+
+        user_ids = sorted({u for u, _ in latest} | {u for u, _ in watched})
+        movie_ids = sorted({m for _, m in latest} | {m for _, m in watched})
+        user_index = {u: i for i, u in enumerate(user_ids)}
+        movie_index = {m: j for j, m in enumerate(movie_ids)}
+        shape = (len(user_ids), len(movie_ids))
+
+        def build(cells, values):
+            rows = [user_index[u] for u, _ in cells]
+            cols = [movie_index[m] for _, m in cells]
+            matrix = sparse.csr_matrix(
+                (np.asarray(values, dtype=np.float32), (rows, cols)), shape=shape
+            )
+            matrix.sum_duplicates()
+            return matrix
+
+        watched_cells = list(set(watched))
+        return cls(
+            user_ids,
+            movie_ids,
+            build(list(latest), list(latest.values())),
+            build(watched_cells, [1.0] * len(watched_cells)).sign()
+        )
+
+    # -------------------------------------------------
+    # Incremental updates
+    # -------------------------------------------------
+    def _cell(self, user_id, movie_id):
+        if user_id not in self.user_index:
+            self.user_index[user_id] = len(self.user_index)
+        if movie_id not in self.movie_index:
+            self.movie_index[movie_id] = len(self.movie_ids)
+            self.movie_ids.append(movie_id)
+        return self.user_index[user_id], self.movie_index[movie_id]
+
+    def set_rating(self, user_id, movie_id, rating):
+        """Record a new rating; ``None`` removes it."""
+        with self._lock:
+            cell = self._cell(user_id, movie_id)
+            self._pending_ratings[cell] = float(rating or 0)
+            self._preferences = None
+
+    def set_watched(self, user_id, movie_id, watched):
+        with self._lock:
+            cell = self._cell(user_id, movie_id)
+            self._pending_watched[cell] = 1.0 if watched else 0.0
+            self._preferences = None
+
+    # -------------------------------------------------
+    # Reads
+    # -------------------------------------------------
+    def preferences(self):
+        """
+        Merged CSR preference matrix (users × movies).
+
+        Rated cells hold the rating; watched-but-unrated cells hold
+        WATCHED_WEIGHT.
+        """
+        with self._lock:
+            if self._preferences is not None:
+                return self._preferences
+
+            shape = (len(self.user_index), len(self.movie_ids))
+            self._ratings = _overwrite(self._ratings, self._pending_ratings, shape)
+            self._watched = _overwrite(self._watched, self._pending_watched, shape)
+            self._pending_ratings.clear()
+            self._pending_watched.clear()
+
+            rated = (self._ratings != 0).astype(np.float32)
+            watched_only = self._watched - self._watched.multiply(rated)
+            preferences = (self._ratings + WATCHED_WEIGHT * watched_only).tocsr()
+            preferences.eliminate_zeros()
+
+            self._preferences = preferences.astype(np.float32)
+            self._derived = {}
+            return self._preferences
+
+    def derived(self, name, build):
+        """Memoise a matrix derived from the current preferences."""
+        while True:
+            preferences = self.preferences()
+            with self._lock:
+                # A write merged in since: never store a build of the old matrix
+                if self._preferences is not preferences:
+                    continue
+                if name not in self._derived:
+                    self._derived[name] = build(preferences)
+                return self._derived[name]
+
+
+# -------------------------------------------------
+# Process-wide instance
+# -------------------------------------------------
+_lock = threading.Lock()
+_matrix = None
+
+
+def get_rating_matrix():
+    """Build on first use (inside an app context), then serve from memory."""
+    global _matrix
+
+    matrix = _matrix
+    if matrix is not None and time.monotonic() - matrix.built_at < REBUILD_SECONDS:
+        return matrix
+
+    with _lock:
+        if _matrix is None or time.monotonic() - _matrix.built_at >= REBUILD_SECONDS:
+            _matrix = RatingMatrix.from_db()
+        return _matrix
+
+
+def record_rating(user_id, movie_id, rating):
+    """rating=None: a review was deleted; fall back to any remaining one."""
+    # Nothing to update until the matrix has been built
+    if _matrix is None:
+        return
+    if rating is None:
+        # Same rule as from_db: the latest remaining review wins
+        rating = db.session.query(Review.rating).filter_by(
+            user_id=user_id, movie_id=movie_id
+        ).order_by(Review.id.desc()).limit(1).scalar()
+    _matrix.set_rating(user_id, movie_id, rating)
+
+
+def record_watched(user_id, movie_id, watched):
+    if _matrix is not None:
+        _matrix.set_watched(user_id, movie_id, watched)
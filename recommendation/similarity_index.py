@@ -0,0 +1,279 @@
+"""
+Similarity Indexes
+------------------
+Nearest-neighbour search behind recommend_similar_movies.
+
+Two backends share one interface:
+
+  ExactIndex  brute-force cosine over the model's L2-normalised vectors
+              (sparse TF-IDF or dense embeddings); exact, O(N) per query
+  IVFIndex    inverted-file index over a TruncatedSVD embedding: vectors are
+              bucketed by their nearest k-means centroid, and a query is
+              scored only against the `probes` closest buckets (re-ranked
+              with the original vectors when they are attached)
+
+Queries are given in the content model's vector space. For a TF-IDF model
+IVFIndex projects them with its own SVD components; for an embedding model
+(train_content_model.py --svd) it indexes the model's vectors directly.
+Search is pure NumPy,
+and every IVF array is published through the artifact store so workers
+memory-map it. CONTENT_INDEX_BACKEND picks the live backend (exact | ivf).
+"""
+
+import os
+
+import numpy as np
+
+from recommendation.neighbours import top_k_from_scores
+from recommendation.preprocess import l2_normalise, reduce_dimensions
+
+INDEX_BACKEND = os.getenv("CONTENT_INDEX_BACKEND", "exact")
+DEFAULT_PROBES = int(os.getenv("CONTENT_IVF_PROBES", "8"))
+DEFAULT_COMPONENTS = 128
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE = 50000
+ASSIGN_CHUNK = 4096
+
+
+def _dense(matrix):
+    return matrix.toarray() if hasattr(matrix, "toarray") else np.asarray(matrix)
+
+
+# -------------------------------------------------
+# Backends
+# -------------------------------------------------
+class ExactIndex:
+    name = "exact"
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    def search(self, queries, k, exclude=None):
+        """
+        queries: (m × F) matrix in the model's vector space.
+        exclude: optional row per query to leave out (the query itself).
+        Returns (rows int32 [m, k], scores float32 [m, k]), -1 padded.
+        """
+        scores = _dense(self.vectors @ queries.T).T
+        return top_k_from_scores(scores, k, exclude=exclude)
+
+    def search_rows(self, rows, k):
+        """Neighbours of indexed rows, excluding each row itself."""
+        rows = np.asarray(rows)
+        return self.search(self.vectors[rows], k, exclude=rows)
+
+
+class IVFIndex:
+    name = "ivf"
+
+    def __init__(self, projection, embeddings, centroids, list_offsets, list_rows,
+                 probes=DEFAULT_PROBES, vectors=None):
+        self.projection = projection      # [F, d] SVD components, or None when
+                                          # queries are already embeddings
+        self.embeddings = embeddings      # [N, d] L2-normalised, float32
+        self.centroids = centroids        # [L, d] L2-normalised
+        self.list_offsets = list_offsets  # [L + 1] bucket bounds in list_rows
+        self.list_rows = list_rows        # [N] rows grouped by bucket
+        self.probes = probes
+        # Original vectors: candidates are scored exactly when present,
+        # so the embedding only decides which buckets to visit
+        self.vectors = vectors
+
+    def __len__(self):
+        return self.embeddings.shape[0]
+
+    def embed(self, queries):
+        if self.projection is None:
+            return l2_normalise(_dense(queries))
+        return l2_normalise(_dense(queries @ self.projection))
+
+    def _search_embedded(self, embedded, k, exclude=None, probes=None, queries=None):
+        probes = min(probes or self.probes, len(self.centroids))
+        n = embedded.shape[0]
+        out_rows = np.full((n, k), -1, dtype=np.int32)
+        out_scores = np.zeros((n, k), dtype=np.float32)
+
+        centroid_scores = embedded @ self.centroids.T
+        nearest = np.argpartition(-centroid_scores, probes - 1, axis=1)[:, :probes]
+
+        for i in range(n):
+            candidates = np.concatenate([
+                self.list_rows[self.list_offsets[b]:self.list_offsets[b + 1]]
+                for b in nearest[i]
+            ])
+            if not len(candidates):
+                continue
+
+            if queries is not None and self.vectors is not None:
+                scores = _dense(self.vectors[candidates] @ queries[i].T).ravel()
+            else:
+                scores = self.embeddings[candidates] @ embedded[i]
+            if exclude is not None:
+                scores[candidates == exclude[i]] = -np.inf
+
+            idx, val = top_k_from_scores(scores[None, :], k)
+            hit = idx[0] >= 0
+            out_rows[i, hit] = candidates[idx[0][hit]]
+            out_scores[i] = val[0]
+
+        return out_rows, out_scores
+
+    def search(self, queries, k, exclude=None, probes=None):
+        return self._search_embedded(
+            self.embed(queries), k, exclude, probes, queries=queries
+        )
+
+    def search_rows(self, rows, k, probes=None):
+        rows = np.asarray(rows)
+        queries = self.vectors[rows] if self.vectors is not None else None
+        return self._search_embedded(
+            np.asarray(self.embeddings[rows], dtype=np.float32), k, rows, probes,
+            queries=queries
+        )
+
+    def to_arrays(self):
+        arrays = {
+            "ivf_centroids": self.centroids,
+            "ivf_list_offsets": self.list_offsets,
+            "ivf_list_rows": self.list_rows,
+        }
+        if self.projection is not None:
+            # Embedding models: the index reuses the model's own vectors
+            arrays.update(ivf_projection=self.projection, ivf_embeddings=self.embeddings)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays, probes=DEFAULT_PROBES, vectors=None):
+        """
+        vectors: the model's vectors, used for re-ranking (TF-IDF models)
+        or as the embedding itself (embedding models).
+        """
+        if "ivf_centroids" not in arrays:
+            return None
+        if "ivf_embeddings" not in arrays:
+            projection, embeddings, vectors = None, vectors, None
+        else:
+            projection, embeddings = arrays["ivf_projection"], arrays["ivf_embeddings"]
+        return cls(
+            projection, embeddings,
+            arrays["ivf_centroids"], arrays["ivf_list_offsets"],
+            arrays["ivf_list_rows"], probes=probes, vectors=vectors
+        )
+
+
+# -------------------------------------------------
+# Building
+# -------------------------------------------------
+def _assign(embeddings, centroids):
+    labels = np.empty(len(embeddings), dtype=np.int32)
+    for start in range(0, len(embeddings), ASSIGN_CHUNK):
+        block = embeddings[start:start + ASSIGN_CHUNK] @ centroids.T
+        labels[start:start + ASSIGN_CHUNK] = block.argmax(axis=1)
+    return labels
+
+
+def spherical_kmeans(embeddings, n_lists, iterations=KMEANS_ITERATIONS, seed=0):
+    """Cosine k-means; centroids are fitted on a sample of at most KMEANS_SAMPLE rows."""
+    rng = np.random.default_rng(seed)
+    sample = embeddings
+    if len(embeddings) > KMEANS_SAMPLE:
+        sample = embeddings[rng.choice(len(embeddings), KMEANS_SAMPLE, replace=False)]
+
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        empty = ~sums.any(axis=1)
+        # Re-seed empty buckets from random points
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        centroids = l2_normalise(sums)
+
+    return centroids
+
+
+def _inverted_lists(labels, n_lists):
+    list_rows = np.argsort(labels, kind="stable").astype(np.int32)
+    list_offsets = np.zeros(n_lists + 1, dtype=np.int64)
+    np.cumsum(np.bincount(labels, minlength=n_lists), out=list_offsets[1:])
+    return list_rows, list_offsets
+
+
+def build_ivf(vectors, n_components=DEFAULT_COMPONENTS, n_lists=None,
+              probes=DEFAULT_PROBES, seed=0):
+    """
+    IVFIndex over the model's vectors; n_lists defaults to ~4·√N.
+
+    Sparse TF-IDF vectors get their own SVD embedding and are attached for
+    re-ranking; dense vectors are taken as the embedding.
+    """
+    if hasattr(vectors, "toarray"):
+        embeddings, projection = reduce_dimensions(vectors, n_components, seed)
+        rerank = vectors
+    else:
+        embeddings, projection, rerank = np.asarray(vectors, dtype=np.float32), None, None
+    n = len(embeddings)
+    n_lists = max(1, min(n_lists or int(4 * np.sqrt(n)), n))
+
+    centroids = spherical_kmeans(embeddings, n_lists, seed=seed)
+    list_rows, list_offsets = _inverted_lists(_assign(embeddings, centroids), n_lists)
+
+    return IVFIndex(projection, embeddings, centroids, list_offsets, list_rows,
+                    probes, vectors=rerank)
+
+
+def extend_ivf_arrays(arrays, new_vectors):
+    """
+    Published IVF arrays with `new_vectors` (model-space rows) appended to
+    their nearest existing bucket. Centroids are kept; a full retrain
+    re-fits them.
+    """
+    centroids = arrays["ivf_centroids"]
+    offsets, rows = arrays["ivf_list_offsets"], arrays["ivf_list_rows"]
+
+    labels = np.empty(len(rows), dtype=np.int32)
+    labels[rows] = np.repeat(np.arange(len(centroids), dtype=np.int32), np.diff(offsets))
+
+    extended = {"ivf_centroids": centroids}
+    if "ivf_projection" in arrays:
+        new_embeddings = l2_normalise(_dense(new_vectors @ arrays["ivf_projection"]))
+        extended["ivf_projection"] = arrays["ivf_projection"]
+        extended["ivf_embeddings"] = np.vstack([arrays["ivf_embeddings"], new_embeddings])
+    else:
+        new_embeddings = l2_normalise(_dense(new_vectors))
+
+    labels = np.concatenate([labels, _assign(new_embeddings, centroids)])
+    extended["ivf_list_rows"], extended["ivf_list_offsets"] = _inverted_lists(
+        labels, len(centroids)
+    )
+    return extended
+
+
+def build_neighbour_table_from_index(index, k, chunk_size=256):
+    """Top-k table for every indexed row, via index.search_rows."""
+    n = len(index)
+    rows = np.full((n, k), -1, dtype=np.int32)
+    scores = np.zeros((n, k), dtype=np.float32)
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        rows[start:stop], scores[start:stop] = index.search_rows(np.arange(start, stop), k)
+    return rows, scores
+
+
+# -------------------------------------------------
+# Evaluation
+# -------------------------------------------------
+def recall_at_k(approx_rows, exact_rows):
+    """
+    Mean fraction of the exact top-k found by the approximate search,
+    ignoring -1 padding in the exact lists.
+    """
+    recalls = []
+    for approx, exact in zip(approx_rows, exact_rows):
+        truth = set(exact[exact >= 0].tolist())
+        if truth:
+            recalls.append(len(truth.intersection(approx.tolist())) / len(truth))
+    return float(np.mean(recalls)) if recalls else 1.0
@@ -1,30 +1,304 @@
-import pickle
+"""
+Content Model Training
+----------------------
+    python -m recommendation.train_content_model [--svd 128] [--index ivf]
+    python -m recommendation.train_content_model --incremental
+
+A full run streams the catalogue twice in batches of --batch-size rows:
+pass 1 fits the vectorizer from term counts (--vectorizer tfidf) or hashed
+document frequencies (--vectorizer hashing), pass 2 vectorises each batch.
+Documents are never held all at once. --incremental only
+transforms movies added since the live version with its saved vectorizer,
+appends them to the vectors, neighbour table and IVF lists, and publishes
+the result. It falls back to a full run (with the live version's options)
+once the new documents drift away from the fitted vocabulary:
+their out-of-vocabulary token rate exceeds the rate at fit time by
+CONTENT_DRIFT_THRESHOLD, or CONTENT_MAX_APPEND_FRACTION of the catalogue
+was appended since the last fit (IDF weights go stale).
+"""
+
+import argparse
 import os
 
-from recommendation.data_loader import load_movies
-from recommendation.preprocess import build_vectorizer
+import numpy as np
+from scipy import sparse
+
+from recommendation import artifact_store
+from recommendation.content_store import MODEL_NAME, csr_from_arrays
+from recommendation.data_loader import (
+    DEFAULT_BATCH_SIZE, iter_movie_batches, load_movies, max_movie_id
+)
+from recommendation.neighbours import (
+    DEFAULT_K, build_neighbour_table, merge_neighbours, top_k_from_scores
+)
+from recommendation.preprocess import fit_vectorizer, l2_normalise, reduce_dimensions
+from recommendation.similarity_index import (
+    DEFAULT_COMPONENTS, build_ivf, build_neighbour_table_from_index, extend_ivf_arrays
+)
+
+DRIFT_THRESHOLD = float(os.getenv("CONTENT_DRIFT_THRESHOLD", "0.10"))
+MAX_APPEND_FRACTION = float(os.getenv("CONTENT_MAX_APPEND_FRACTION", "0.25"))
+DRIFT_SAMPLE = 5000
+# Bounds the (new rows × catalogue) score block at ~64 MB of float32
+UPDATE_BLOCK_CELLS = 1 << 24
+
+
+def _prepare(matrix):
+    matrix = matrix.tocsr().astype(np.float32)
+    matrix.sum_duplicates()
+    matrix.sort_indices()
+    return matrix
+
+
+def _csr_arrays(matrix):
+    return {
+        "vectors_data": matrix.data,
+        "vectors_indices": matrix.indices.astype(np.int32),
+        "vectors_indptr": matrix.indptr.astype(np.int64),
+    }
+
+
+def oov_counts(vectorizer, documents):
+    """
+    (out-of-vocabulary tokens, total tokens) of `documents` under `vectorizer`.
+    Hashing vectorizers have no vocabulary and never drift: (0, 0).
+    """
+    vocabulary = getattr(vectorizer, "vocabulary_", None)
+    if vocabulary is None:
+        return 0, 0
+    analyzer = vectorizer.build_analyzer()
+    oov = total = 0
+    for doc in documents:
+        tokens = analyzer(doc)
+        total += len(tokens)
+        oov += sum(t not in vocabulary for t in tokens)
+    return oov, total
+
+
+def train(k=DEFAULT_K, index="exact", n_components=DEFAULT_COMPONENTS, n_lists=None,
+          svd=None, vectorizer="tfidf", batch_size=DEFAULT_BATCH_SIZE):
+    """
+    svd=d replaces the TF-IDF rows with d-dimensional LSA embeddings
+    (float32, L2-normalised, stored as embeddings.npy).
+
+    index="ivf" also publishes an IVF index and builds the neighbour table
+    through it, avoiding the exact all-pairs pass on large catalogues.
+    """
+    options = {"k": k, "index": index, "n_components": n_components,
+               "n_lists": n_lists, "svd": svd, "vectorizer": vectorizer,
+               "batch_size": batch_size}
+    kind = vectorizer
+    # Both passes see the same snapshot of the catalogue
+    until_id = max_movie_id()
+
+    print(f"Fitting {kind} vectorizer (streaming pass 1)...")
+    vectorizer = fit_vectorizer(
+        (docs for _, docs in iter_movie_batches(batch_size, until_id=until_id)), kind
+    )
+
+    print("Vectorising movies (streaming pass 2)...")
+    movie_ids, chunks = [], []
+    oov = tokens = 0
+    for ids, docs in iter_movie_batches(batch_size, until_id=until_id):
+        movie_ids.extend(ids)
+        chunks.append(_prepare(vectorizer.transform(docs)))
+        if len(movie_ids) - len(ids) < DRIFT_SAMPLE:
+            o, t = oov_counts(vectorizer, docs)
+            oov, tokens = oov + o, tokens + t
+
+    movie_vectors = _prepare(sparse.vstack(chunks, format="csr"))
+    del chunks
+
+    # Baseline for drift checks in incremental runs
+    drift = {"base_rows": len(movie_ids), "base_oov_rate": oov / max(tokens, 1),
+             "oov": 0, "tokens": 0}
+
+    movie_ids = np.asarray(movie_ids, dtype=np.int32)
+    index_arrays, index_meta = {}, {"backend": "exact"}
+
+    if svd:
+        print(f"Reducing to {svd}-d embeddings...")
+        model_vectors, projection = reduce_dimensions(movie_vectors, svd)
+        vector_arrays = {"embeddings": model_vectors, "svd_projection": projection}
+    else:
+        model_vectors = movie_vectors
+        vector_arrays = _csr_arrays(movie_vectors)
+
+    if index == "ivf":
+        print("Building IVF index...")
+        ivf = build_ivf(model_vectors, n_components=n_components, n_lists=n_lists)
+        index_arrays = ivf.to_arrays()
+        index_meta = {"backend": "ivf", "dim": ivf.embeddings.shape[1],
+                      "n_lists": len(ivf.centroids)}
+
+        print(f"Computing approximate top-{k} neighbour table...")
+        neighbour_rows, neighbour_scores = build_neighbour_table_from_index(ivf, k)
+    else:
+        print(f"Computing top-{k} neighbour table...")
+        neighbour_rows, neighbour_scores = build_neighbour_table(model_vectors, k=k)
+
+    neighbour_ids = np.where(
+        neighbour_rows >= 0, movie_ids[neighbour_rows], -1
+    ).astype(np.int32)
 
-ARTIFACT_PATH = os.path.join("recommendation", "artifacts")
-os.makedirs(ARTIFACT_PATH, exist_ok=True)
+    version = artifact_store.publish(
+        MODEL_NAME,
+        arrays={
+            **vector_arrays,
+            "movie_ids": movie_ids,
+            "neighbour_ids": neighbour_ids,
+            "neighbour_scores": neighbour_scores,
+            **index_arrays,
+        },
+        objects={"tfidf_vectorizer": vectorizer},
+        meta={"shape": list(model_vectors.shape), "k": k, "index": index_meta,
+              "representation": "svd" if svd else "tfidf",
+              "options": options, "drift": drift}
+    )
 
-def train():
-    print("Loading movies from database...")
-    movie_ids, documents = load_movies()
+    print(f"✅ Content-based model trained successfully (version {version})")
+    return version
 
-    print("Building TF-IDF vectors...")
-    vectorizer = build_vectorizer()
-    movie_vectors = vectorizer.fit_transform(documents)
 
-    with open(os.path.join(ARTIFACT_PATH, "movie_vectors.pkl"), "wb") as f:
-        pickle.dump(movie_vectors, f)
+# -------------------------------------------------
+# Incremental updates
+# -------------------------------------------------
+def _needs_refit(drift):
+    rate = drift["oov"] / drift["tokens"] if drift["tokens"] else 0.0
+    return (
+        rate - drift["base_oov_rate"] > DRIFT_THRESHOLD
+        or drift["appended"] > MAX_APPEND_FRACTION * drift["base_rows"]
+    )
 
-    with open(os.path.join(ARTIFACT_PATH, "movie_ids.pkl"), "wb") as f:
-        pickle.dump(movie_ids, f)
 
-    with open(os.path.join(ARTIFACT_PATH, "tfidf_vectorizer.pkl"), "wb") as f:
-        pickle.dump(vectorizer, f)
+def _extend_neighbours(arrays, all_vectors, new_vectors, movie_ids, new_ids):
+    old_ids, old_scores = arrays["neighbour_ids"], arrays["neighbour_scores"]
+    n_old, k = old_ids.shape
+    m = len(new_ids)
+
+    ids = np.vstack([old_ids, np.full((m, k), -1, dtype=np.int32)])
+    scores = np.vstack([old_scores, np.zeros((m, k), dtype=np.float32)])
+    all_t = all_vectors.T
+
+    step = max(1, UPDATE_BLOCK_CELLS // (n_old + m))
+    for start in range(0, m, step):
+        stop = min(start + step, m)
+        block = new_vectors[start:stop] @ all_t
+        block = block.toarray() if hasattr(block, "toarray") else np.asarray(block)
+
+        # New movies: neighbours among the whole catalogue
+        rows, scores[n_old + start:n_old + stop] = top_k_from_scores(
+            block, k, exclude=np.arange(n_old + start, n_old + stop)
+        )
+        ids[n_old + start:n_old + stop] = np.where(rows >= 0, movie_ids[rows], -1)
+
+        # Existing movies: the new ones may displace their weakest neighbours
+        ids[:n_old], scores[:n_old] = merge_neighbours(
+            ids[:n_old], scores[:n_old], new_ids[start:stop], block[:, :n_old].T, k
+        )
+
+    return ids, scores
+
+
+def update():
+    """
+    Append movies inserted since the live version.
+
+    Returns the new version, the live version when nothing changed, or
+    None when a full refit is needed (nothing published yet, or drift).
+    """
+    version = artifact_store.current_version(MODEL_NAME)
+    if version is None:
+        return None
+
+    arrays, objects, meta = artifact_store.load(MODEL_NAME, version)
+    vectorizer = objects.get("tfidf_vectorizer")
+    if vectorizer is None or "drift" not in meta:
+        return None
+
+    movie_ids = np.asarray(arrays["movie_ids"])
+    new_ids, documents = load_movies(after_id=int(movie_ids.max()) if len(movie_ids) else None)
+    if not new_ids:
+        print(f"Content model {version} is up to date")
+        return version
+
+    oov, tokens = oov_counts(vectorizer, documents)
+    drift = dict(meta["drift"])
+    drift["oov"] += oov
+    drift["tokens"] += tokens
+    drift["appended"] = drift.get("appended", 0) + len(new_ids)
+    if _needs_refit(drift):
+        print(f"Vocabulary drift after {drift['appended']} new movies; full refit needed")
+        return None
+
+    print(f"Appending {len(new_ids)} movies to {version}...")
+    new_ids = np.asarray(new_ids, dtype=np.int32)
+    new_tfidf = _prepare(vectorizer.transform(documents))
+
+    if "embeddings" in arrays:
+        projection = arrays["svd_projection"]
+        new_vectors = l2_normalise(new_tfidf @ projection)
+        all_vectors = np.vstack([arrays["embeddings"], new_vectors])
+        vector_arrays = {"embeddings": all_vectors, "svd_projection": projection}
+    else:
+        new_vectors = new_tfidf
+        old = csr_from_arrays(arrays, meta["shape"])
+        all_vectors = _prepare(sparse.vstack([old, new_tfidf]))
+        vector_arrays = _csr_arrays(all_vectors)
+
+    all_ids = np.concatenate([movie_ids, new_ids])
+    neighbour_ids, neighbour_scores = _extend_neighbours(
+        arrays, all_vectors, new_vectors, all_ids, new_ids
+    )
+
+    index_arrays = {}
+    if "ivf_centroids" in arrays:
+        index_arrays = extend_ivf_arrays(arrays, new_vectors)
+
+    new_version = artifact_store.publish(
+        MODEL_NAME,
+        arrays={
+            **vector_arrays,
+            "movie_ids": all_ids,
+            "neighbour_ids": neighbour_ids,
+            "neighbour_scores": neighbour_scores,
+            **index_arrays,
+        },
+        objects={"tfidf_vectorizer": vectorizer},
+        meta={**{k: v for k, v in meta.items() if k not in ("version", "published_at")},
+              "shape": list(all_vectors.shape), "drift": drift,
+              "base_version": meta.get("base_version", version)}
+    )
+
+    print(f"✅ Content model updated incrementally (version {new_version})")
+    return new_version
 
-    print("✅ Content-based model trained successfully")
 
 if __name__ == "__main__":
-    train()
+    parser = argparse.ArgumentParser(description="Train the content-based model")
+    parser.add_argument("--k", type=int, default=DEFAULT_K)
+    parser.add_argument("--index", choices=("exact", "ivf"), default="exact")
+    parser.add_argument("--components", type=int, default=DEFAULT_COMPONENTS)
+    parser.add_argument("--lists", type=int)
+    parser.add_argument("--svd", type=int, metavar="DIM",
+                        help="store DIM-dimensional LSA embeddings instead of TF-IDF rows")
+    parser.add_argument("--vectorizer", choices=("tfidf", "hashing"), default="tfidf")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--incremental", action="store_true",
+                        help="append new movies; refit only on vocabulary drift")
+    args = parser.parse_args()
+
+    options = {"k": args.k, "index": args.index, "n_components": args.components,
+               "n_lists": args.lists, "svd": args.svd, "vectorizer": args.vectorizer,
+               "batch_size": args.batch_size}
+
+    if args.incremental:
+        if update() is not None:
+            raise SystemExit(0)
+
+        # Refit with the live version's options when there is one
+        version = artifact_store.current_version(MODEL_NAME)
+        if version:
+            options = artifact_store.load(MODEL_NAME, version)[2].get("options", options)
+
+    train(**options)
@@ -1,6 +1,7 @@
 from backend.app import create_app
 
-app = create_app()
-
 if __name__ == "__main__":
-    app.run(debug=True)
+    # Local development: bring the database schema up to date first
+    create_app(auto_migrate=True).run(debug=True)
+else:
+    app = create_app()
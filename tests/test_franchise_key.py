@@ -0,0 +1,32 @@
+import pytest
+
+from database.models import franchise_key
+
+
+# Title -> franchise key
+CASES = {
+    "Toy Story": "toy story",
+    "Toy Story 2": "toy story",
+    "Toy Story: Part III (2019)": "toy story",
+    "The Godfather Part II": "the godfather",
+    "Kill Bill: Vol. 2": "kill bill",
+    "Kill Bill Vol. 1": "kill bill",
+    "Harry Potter and the Deathly Hallows: Part 2": "harry potter and the deathly hallows",
+    "Back to the Future Part III": "back to the future",
+    "Final Fantasy X": "final fantasy",
+    # A one-word title keeps its numeral
+    "Malcolm X": "malcolm x",
+    "Apollo 13": "apollo 13",
+    "Chapter 2": "chapter 2",
+    "Rocky II": "rocky ii",
+    "Part II": "part ii",
+    # A trailing word after "part" is not a numeral
+    "The Best Part Time": "the best part time",
+    "": None,
+    None: None,
+}
+
+
+@pytest.mark.parametrize("title, key", CASES.items())
+def test_franchise_key(title, key):
+    assert franchise_key(title) == key
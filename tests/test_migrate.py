@@ -0,0 +1,68 @@
+import logging
+
+import pytest
+from sqlalchemy import text
+
+from backend.app import create_db_app
+from database import query_plans
+from database.db import db
+from database.migrate import hot_lookup_indexes, migrate
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path}/test.db")
+    app = create_db_app()
+    with app.app_context():
+        migrate()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+# Hot query -> the index added for it by the hot_lookup_indexes step
+EXPECTED_INDEXES = {
+    "watchlist by user+movie": "uq_watchlist_user_movie",
+    "watched by user+movie": "uq_watched_user_movie",
+    "watched by user": "uq_watched_user_movie",
+    "reviews by movie": "ix_reviews_movie_id_id",
+    "reviews page": "ix_reviews_movie_id_id",
+    "reviews by user": "ix_reviews_user_id_movie_id",
+    "review version by user": "ix_reviews_user_id_movie_id",
+    "watched version by user": "uq_watched_user_movie",
+    "movies by franchise": "ix_movies_franchise_key",
+    "movies by popularity": "ix_movies_popularity",
+}
+
+
+def test_hot_queries_never_scan(app):
+    assert query_plans.check() == {}
+
+
+@pytest.mark.parametrize("name, index", sorted(EXPECTED_INDEXES.items()))
+def test_hot_query_uses_its_index(app, name, index):
+    with db.engine.connect() as conn:
+        plan = query_plans._plan(conn, query_plans.hot_queries()[name])
+    assert any(f"INDEX {index}" in line for line in plan), plan
+
+
+def test_dedupe_logs_removed_rows(app, caplog):
+    with db.engine.begin() as conn:
+        conn.execute(text("DROP INDEX uq_watched_user_movie"))
+        conn.execute(text(
+            "INSERT INTO users (id, username, email, password_hash) VALUES (1, 'u', 'u@x', '!')"
+        ))
+        conn.execute(text("INSERT INTO movies (id, tmdb_id, title) VALUES (1, 1, 'M')"))
+        conn.execute(text(
+            "INSERT INTO watched (id, user_id, movie_id) VALUES (1, 1, 1), (2, 1, 1), (3, 1, 1)"
+        ))
+
+    with caplog.at_level(logging.WARNING, logger="database.migrate"):
+        with db.engine.begin() as conn:
+            hot_lookup_indexes(conn)
+
+    with db.engine.connect() as conn:
+        assert [r[0] for r in conn.execute(text("SELECT id FROM watched"))] == [1]
+    assert "deleting 2 duplicate watched rows" in caplog.text
+    assert "watched id=2" in caplog.text and "watched id=3" in caplog.text
+    assert query_plans.check() == {}